@@ -1,6 +1,17 @@
 from nomad.config.models.plugins import AppEntryPoint
-from nomad.config.models.ui import App, Column, Columns, FilterMenu, FilterMenus
-
+from nomad.config.models.ui import (
+    App,
+    Axis,
+    Column,
+    Columns,
+    FilterMenu,
+    FilterMenus,
+    Format,
+    Menu,
+    MenuItemHistogram,
+    MenuItemTerms,
+    SearchQuantities,
+)
 
 myapp = AppEntryPoint(
     name='MyApp',
@@ -22,3 +33,130 @@ myapp = AppEntryPoint(
         ),
     ),
 )
+
+raman_schema = 'nomad_ikz_raman.schema_packages.raman.Ramanspectroscopy'
+raman_descriptors = f'data.descriptors.{{}}#{raman_schema}'
+
+ramanapp = AppEntryPoint(
+    name='RamanApp',
+    description='Search Raman measurements by their settings, samples and peaks.',
+    app=App(
+        label='Raman spectroscopy',
+        path='raman',
+        category='Experiment',
+        description='Search Raman measurements by their settings, samples and peaks.',
+        filters_locked={'section_defs.definition_qualified_name': [raman_schema]},
+        search_quantities=SearchQuantities(include=[f'*#{raman_schema}']),
+        columns=[
+            Column(quantity='entry_name', selected=True),
+            Column(quantity=raman_descriptors.format('sample_lab_id'), selected=True),
+            Column(
+                quantity=raman_descriptors.format('laser_wavelength'),
+                unit='nm',
+                selected=True,
+            ),
+            Column(quantity=raman_descriptors.format('grating')),
+            Column(quantity=raman_descriptors.format('objective')),
+            Column(quantity=raman_descriptors.format('acquisition_time'), unit='s'),
+            Column(
+                quantity=raman_descriptors.format('main_peak_position'),
+                unit='1/cm',
+                format=Format(decimals=1),
+                selected=True,
+            ),
+            Column(
+                quantity=raman_descriptors.format('main_peak_fwhm'),
+                unit='1/cm',
+                format=Format(decimals=1),
+            ),
+            Column(quantity=raman_descriptors.format('n_spectra')),
+            Column(
+                quantity=raman_descriptors.format('snr'),
+                format=Format(decimals=1),
+            ),
+            Column(quantity=raman_descriptors.format('quality_flags')),
+            Column(quantity=raman_descriptors.format('instrument_lab_id')),
+            Column(quantity='upload_create_time', selected=True),
+        ],
+        menu=Menu(
+            items=[
+                MenuItemTerms(
+                    title='Sample',
+                    search_quantity=raman_descriptors.format('sample_lab_id'),
+                ),
+                MenuItemTerms(
+                    title='Instrument',
+                    search_quantity=raman_descriptors.format('instrument_lab_id'),
+                ),
+                MenuItemHistogram(
+                    title='Laser',
+                    x=Axis(
+                        search_quantity=raman_descriptors.format('laser_wavelength'),
+                        unit='nm',
+                    ),
+                ),
+                MenuItemTerms(
+                    title='Grating',
+                    search_quantity=raman_descriptors.format('grating'),
+                ),
+                MenuItemTerms(
+                    title='Objective',
+                    search_quantity=raman_descriptors.format('objective'),
+                ),
+                MenuItemHistogram(
+                    title='Main peak position',
+                    x=Axis(
+                        search_quantity=raman_descriptors.format('main_peak_position'),
+                        unit='1/cm',
+                    ),
+                ),
+                MenuItemHistogram(
+                    title='Main peak FWHM',
+                    x=Axis(
+                        search_quantity=raman_descriptors.format('main_peak_fwhm'),
+                        unit='1/cm',
+                    ),
+                ),
+                MenuItemTerms(
+                    title='Quality flags',
+                    search_quantity=raman_descriptors.format('quality_flags'),
+                ),
+                MenuItemHistogram(
+                    title='SNR',
+                    x=Axis(search_quantity=raman_descriptors.format('snr')),
+                ),
+                MenuItemHistogram(
+                    title='Saturated fraction',
+                    x=Axis(
+                        search_quantity=raman_descriptors.format('saturation_fraction')
+                    ),
+                ),
+                MenuItemHistogram(
+                    title='Spikes',
+                    x=Axis(search_quantity=raman_descriptors.format('spike_count')),
+                ),
+                MenuItemHistogram(
+                    title='Acquisition time',
+                    x=Axis(
+                        search_quantity=raman_descriptors.format('acquisition_time'),
+                        unit='s',
+                    ),
+                ),
+                MenuItemHistogram(
+                    title='Lower end of the range',
+                    x=Axis(
+                        search_quantity=raman_descriptors.format('wavenumber_min'),
+                        unit='1/cm',
+                    ),
+                ),
+                MenuItemHistogram(
+                    title='Upper end of the range',
+                    x=Axis(
+                        search_quantity=raman_descriptors.format('wavenumber_max'),
+                        unit='1/cm',
+                    ),
+                ),
+            ]
+        ),
+    ),
+)
@@ -0,0 +1,514 @@
+"""
+Benchmarks of reading and processing Horiba XML exports.
+
+The benchmarks run on synthetic `LSX_Data` documents written by
+`synthetic_lsx_data`, which are parameterized by the number of points per spectrum,
+the number of rows (map points), the number of additional parameter blocks
+(metadata richness) and missing metadata fields. Every stage is timed and its peak
+memory is traced. Together with the import time of the plugin modules the results
+are written as JSON to compare versions:
+
+    nomad-ikz-raman benchmark --output benchmark.json
+
+The serialization of entries is benchmarked separately on spectra of 10^3 to 10^6
+points, comparing lists of Python numbers with arrays written from their buffers.
+"""
+
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from functools import partial
+from typing import Optional
+
+import numpy as np
+
+from nomad_ikz_raman.schema_packages.preprocessing import preprocess
+from nomad_ikz_raman.schema_packages.raman_horiba_xml_reader import (
+    ANY_ID,
+    ARRAY_ID,
+    AXES_ID,
+    METADATA_FIELDS,
+    NAME_ID,
+    READER_VERSION,
+    extract_intensities,
+    extract_map_axes,
+    extract_metadata,
+    extract_wavenumbers,
+    index_lsx_tree,
+    parse_raman_xml,
+)
+
+# Text of the synthetic metadata fields, similar to a LabRAM export
+SYNTHETIC_METADATA = {
+    'Title': 'synthetic',
+    'Date': '04.07.2024 11:48',
+    'Operator': 'benchmark',
+    'Sample': 'synthetic_sample',
+    'Remark': 'synthetic data',
+    'Site': 'ikz',
+    'Project': 'benchmark',
+    'AcquisitionDate': '04.07.2024 11:48:24',
+    'AcquisitionTime': '1',
+    'Accumulations': '1',
+    'Range': 'Off',
+    'Windows': '1',
+    'AutoScanning': 'Off',
+    'Autofocus': 'Off',
+    'AutoExposure': 'Off',
+    'SpikeFilter': 'Multiple accum.',
+    'DelayTime': '0.1',
+    'Binning': '1',
+    'ReadoutMode': 'Signal',
+    'DeNoise': 'Off',
+    'ICSCorrection': 'Off',
+    'DarkCorrection': 'Off',
+    'InstrumentProcess': 'Off',
+    'DetectorGain': '',
+    'DetectorADC': '',
+    'DetectorTemperature': '-63',
+    'Instrument': 'LabRAM',
+    'InstrumentID': '-825368879',
+    'Detector': 'Andor CCD',
+    'DetectorID': '1859378131',
+    'Objective': 'x100',
+    'Grating': '1800',
+    'Filter': '100%',
+    'Laser': '633',
+    'Hole': '250',
+    'StageXY': 'Marzhauser',
+    'StageZ': 'Marzhauser',
+    'X': '0',
+    'Y': '0',
+    'Z': '0',
+}
+
+# Metadata fields whose absence the reader tolerates, as they are read as text
+OPTIONAL_FIELDS = (
+    'Operator',
+    'Sample',
+    'Remark',
+    'Site',
+    'Project',
+    'AcquisitionDate',
+    'Windows',
+    'DetectorGain',
+    'DetectorADC',
+    'StageXY',
+    'StageZ',
+)
+
+# Synthetic documents that are benchmarked by default
+BENCHMARK_CASES = (
+    {'name': 'spectrum', 'n_points': 1015},
+    {'name': 'long_spectrum', 'n_points': 2**14},
+    {'name': 'rich_metadata', 'n_points': 1015, 'n_extra_parameters': 2000},
+    {'name': 'missing_fields', 'n_points': 1015, 'missing_fields': OPTIONAL_FIELDS},
+    {'name': 'map', 'n_points': 1015, 'n_rows': 400},
+)
+
+# Numbers of points of the spectra in the serialization benchmark
+SERIALIZATION_SIZES = (10**3, 10**4, 10**5, 10**6)
+
+# Modules of the plugin that NOMAD imports to parse and normalize entries
+PLUGIN_MODULES = (
+    'nomad_ikz_raman.parsers.ramanparser',
+    'nomad_ikz_raman.schema_packages.raman',
+)
+# NOMAD modules that the plugin modules build on, which are imported anyway
+NOMAD_MODULES = (
+    'nomad.datamodel.metainfo.basesections',
+    'nomad.datamodel.metainfo.plot',
+    'nomad.datamodel.hdf5',
+    'nomad.parsing',
+)
+
+# Parameter blocks of the synthetic documents
+PARAMETERS_ID = '0x6C62D4D9'
+ACQUISITION_ID = '0x8716361'
+# Index of the spectral axis in the axes of the data matrix
+SPECTRAL_AXIS_ID = '0x1'
+# Raman shifts (1/cm), widths and heights of the synthetic peaks
+SYNTHETIC_PEAKS = ((303.0, 4.0, 400.0), (520.7, 3.5, 2000.0), (950.0, 20.0, 150.0))
+
+
+def _lsx(parent, lsx_id, text=None, lsx_format='7', size=None):
+    element = ET.SubElement(parent, 'LSX', Format=lsx_format, ID=lsx_id)
+    if size is not None:
+        element.set('Size', str(size))
+    if text is not None:
+        element.text = text
+    return element
+
+
+def _node(parent, lsx_id):
+    """Returns the child block with `lsx_id`, creating it if necessary."""
+    for child in parent:
+        if child.get('ID') == lsx_id:
+            return child
+    return _lsx(parent, lsx_id, lsx_format='9')
+
+
+def _grid_shape(n_rows):
+    """Returns the most square raster (n_x, n_y) with `n_rows` points."""
+    n_x = int(np.sqrt(n_rows))
+    while n_rows % n_x:
+        n_x -= 1
+    return n_rows // n_x, n_x
+
+
+def synthetic_spectra(n_points=1015, n_rows=1, seed=0):
+    """
+    Returns the wavenumbers and `n_rows` noisy spectra with Lorentzian peaks on a
+    sloped background. The peaks shift and scale slightly from row to row.
+    """
+    rng = np.random.default_rng(seed)
+    wavenumbers = np.linspace(100.0, 1000.0, n_points)
+    shift = rng.normal(0.0, 0.5, (n_rows, 1))
+    scale = rng.uniform(0.8, 1.2, (n_rows, 1))
+    intensities = 50.0 + 0.02 * wavenumbers + np.zeros((n_rows, 1))
+    for position, width, height in SYNTHETIC_PEAKS:
+        intensities += (
+            scale * height / (1.0 + ((wavenumbers - position - shift) / width) ** 2)
+        )
+    intensities += rng.normal(0.0, np.sqrt(intensities))
+    return wavenumbers, np.round(intensities)
+
+
+def synthetic_lsx_data(
+    n_points=1015,
+    n_rows=1,
+    n_extra_parameters=0,
+    missing_fields=(),
+    seed=0,
+) -> str:
+    """
+    Writes a synthetic Horiba XML export.
+
+    Args:
+        n_points (int): The number of values per spectrum.
+        n_rows (int): The number of `LSX_Row` elements. More than one row is a map
+            on a raster with X and Y axes.
+        n_extra_parameters (int): The number of additional parameter blocks, which
+            the reader has to walk past.
+        missing_fields (Iterable[str]): Keys of `METADATA_FIELDS` that are left out.
+            Note that the reader only tolerates missing text fields, see
+            `OPTIONAL_FIELDS`.
+        seed (int): The seed of the synthetic noise.
+
+    Returns:
+        str: The XML document.
+    """
+    wavenumbers, intensities = synthetic_spectra(n_points, n_rows, seed)
+    root = ET.Element('LSX_Data')
+    tree = ET.SubElement(root, 'LSX_Tree', Format='9', ID='0x69746164')
+    _lsx(tree, NAME_ID, 'Spectrum')
+    axes = _node(_node(tree, '0x7A74D9D6'), AXES_ID)
+    spectral_axis = _node(axes, SPECTRAL_AXIS_ID)
+    _lsx(
+        spectral_axis,
+        ARRAY_ID,
+        ' '.join(f'{value:g}' for value in wavenumbers),
+        lsx_format='6',
+        size=n_points,
+    )
+    _lsx(spectral_axis, NAME_ID, 'Spectr')
+    if n_rows > 1:
+        for axis_index, (name, size) in enumerate(zip('XY', _grid_shape(n_rows))):
+            axis = _node(axes, f'0x{axis_index + 2:X}')
+            _lsx(axis, NAME_ID, name)
+            _lsx(
+                axis,
+                ARRAY_ID,
+                ' '.join(f'{value:g}' for value in np.arange(size) * 2.0),
+                lsx_format='6',
+                size=size,
+            )
+
+    parameters = _node(_node(tree, PARAMETERS_ID), ACQUISITION_ID)
+    for key, path, _ in METADATA_FIELDS:
+        if key in missing_fields:
+            continue
+        text = SYNTHETIC_METADATA[key]
+        if len(path) == 1:
+            # Top level text nodes, e.g. the title
+            tree.insert(1, ET.Element('LSX', Format='8', ID=path[0]))
+            tree[1].text = text
+            continue
+        block = parameters
+        for lsx_id in path[:-1]:
+            block = _node(block, '0x0' if lsx_id == ANY_ID else lsx_id)
+        if text:
+            _lsx(block, path[-1], text)
+    for index in range(n_extra_parameters):
+        block = _lsx(parameters, f'0x{0x10000000 + index:X}', lsx_format='9')
+        _lsx(block, '0x6D6D616E', f'Parameter {index}')
+        _lsx(block, '0x7D6C61DB', str(index), lsx_format='5')
+
+    matrix = ET.SubElement(
+        root, 'LSX_Matrix', Format='6', ID=ARRAY_ID, Size=str(n_points)
+    )
+    for index, row in enumerate(intensities):
+        row_element = ET.SubElement(
+            matrix, 'LSX_Row', Format='6', Index=str(index), Size=str(n_points)
+        )
+        row_element.text = ' '.join(f'{value:g}' for value in row)
+    ET.indent(root, space='\t')
+    return '<?xml version="1.0" encoding="UTF-8"?>\n' + ET.tostring(
+        root, encoding='unicode'
+    )
+
+
+def _extract(file_path):
+    root = ET.parse(file_path).getroot()
+    index = index_lsx_tree(root)
+    extract_metadata(index)
+    extract_wavenumbers(root, index)
+    extract_intensities(root)
+    extract_map_axes(index)
+
+
+def _entry(raman_dict):
+    from nomad.datamodel import EntryArchive, EntryMetadata
+
+    from nomad_ikz_raman.schema_packages.raman import Ramanspectroscopy
+
+    entry = Ramanspectroscopy(name='benchmark')
+    entry.fill_from_raman_dict(raman_dict)
+    return EntryArchive(data=entry, metadata=EntryMetadata())
+
+
+def _normalize(archive):
+    from nomad.utils import get_logger
+
+    archive.data.normalize(archive, get_logger(__name__))
+
+
+def _serialize(archive):
+    from nomad_ikz_raman.schema_packages.utils import dump_archive
+
+    dump_archive(archive.data, io.StringIO())
+
+
+def _serialize_lists(entry):
+    """The serialization before arrays were written from their buffers."""
+    content = io.StringIO()
+    json.dump({'data': entry.m_to_dict(with_root_def=True)}, content)
+    return content.getvalue().encode()
+
+
+def benchmark_serialization(sizes=SERIALIZATION_SIZES, repeat=3) -> list:
+    """
+    Benchmarks writing entries with a spectrum of every size in `sizes` as lists of
+    Python numbers (`lists`), from the array buffers (`arrays`) and compressed
+    (`gzip`).
+
+    Returns:
+        list: The number of points and, by method, the measurements of `measure`
+        and the size of the archive in bytes.
+    """
+    from nomad_ikz_raman.schema_packages.raman import Ramanspectroscopy, Results
+    from nomad_ikz_raman.schema_packages.utils import serialize_archive
+
+    methods = {
+        'lists': _serialize_lists,
+        'arrays': serialize_archive,
+        'gzip': partial(serialize_archive, compression='gzip'),
+    }
+    results = []
+    for n_points in sizes:
+        wavenumber, intensity = synthetic_spectra(n_points)
+        entry = Ramanspectroscopy(name='benchmark')
+        entry.results.append(Results(wavenumber=wavenumber, intensity=intensity[0]))
+        results.append(
+            {
+                'n_points': n_points,
+                'methods': {
+                    name: {
+                        **measure(method, entry, repeat=repeat),
+                        'size': len(method(entry)),
+                    }
+                    for name, method in methods.items()
+                },
+            }
+        )
+    return results
+
+
+def import_times(modules=PLUGIN_MODULES, preload=NOMAD_MODULES) -> dict:
+    """
+    Imports `modules` in a fresh interpreter with `python -X importtime`, after the
+    modules in `preload`, so that only the modules that `modules` add are measured.
+
+    Returns:
+        dict: The self and the cumulative import time in seconds by module.
+    """
+    marker = 'nomad_ikz_raman.benchmark'
+    code = '\n'.join(
+        [
+            *(f'import {module}' for module in preload),
+            'import sys',
+            f'sys.stderr.write({marker!r} + "\\n")',
+            *(f'import {module}' for module in modules),
+        ]
+    )
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    lines = process.stderr.splitlines()
+    times = {}
+    for line in lines[lines.index(marker) + 1 :]:
+        if not line.startswith('import time:'):
+            continue
+        self_time, cumulative_time, module = line[len('import time:') :].split('|')
+        if self_time.strip().isdigit():
+            times[module.strip()] = {
+                'self': int(self_time) * 1e-6,
+                'cumulative': int(cumulative_time) * 1e-6,
+            }
+    return times
+
+
+def measure(function, *args, repeat=3) -> dict:
+    """
+    Calls `function(*args)` `repeat` times and once more with `tracemalloc`.
+
+    Returns:
+        dict: The minimum and mean wall time in seconds and the peak traced memory
+        in bytes.
+    """
+    wall_times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        wall_times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        function(*args)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'wall_time_min': min(wall_times),
+        'wall_time_mean': sum(wall_times) / len(wall_times),
+        'peak_memory': peak_memory,
+    }
+
+
+def benchmark_case(file_path, repeat=3) -> dict:
+    """
+    Benchmarks the stages of processing one data file.
+
+    Returns:
+        dict: The measurements of `measure` by stage.
+    """
+    raman_dict = parse_raman_xml(file_path)
+    archive = _entry(raman_dict)
+    _normalize(archive)
+    return {
+        'parse_raman_xml': measure(parse_raman_xml, file_path, repeat=repeat),
+        'extractors': measure(_extract, file_path, repeat=repeat),
+        'preprocess': measure(
+            preprocess,
+            raman_dict['wavenumbers'],
+            raman_dict.get('map_intensities', raman_dict['intensities']),
+            repeat=repeat,
+        ),
+        'normalize': measure(_normalize, archive, repeat=repeat),
+        'serialize': measure(_serialize, archive, repeat=repeat),
+    }
+
+
+def run_benchmarks(
+    cases=BENCHMARK_CASES,
+    repeat=3,
+    output: Optional[str] = None,
+    serialization_sizes=SERIALIZATION_SIZES,
+) -> dict:
+    """
+    Benchmarks synthetic documents for every case, see `synthetic_lsx_data` for
+    the parameters of a case.
+
+    Args:
+        cases (Iterable[dict]): The cases with a `name` and the parameters of the
+            synthetic document.
+        repeat (int): The number of timed calls per stage.
+        output (str): The path of a JSON file to write the results to.
+        serialization_sizes (Iterable[int]): The numbers of points of the spectra
+            in `benchmark_serialization`.
+
+    Returns:
+        dict: The environment, the results per case and of the serialization.
+    """
+    from importlib.metadata import version
+
+    results = {
+        'created': datetime.now().isoformat(),
+        'package_version': version('nomad-ikz_raman'),
+        'reader_version': READER_VERSION,
+        'python_version': platform.python_version(),
+        'numpy_version': np.__version__,
+        'repeat': repeat,
+        'import_time': sum(
+            module_time['self'] for module_time in import_times().values()
+        ),
+        'cases': [],
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for case in cases:
+            parameters = {key: value for key, value in case.items() if key != 'name'}
+            file_path = os.path.join(directory, f'{case["name"]}.xml')
+            with open(file_path, 'w', encoding='utf-8') as file:
+                file.write(synthetic_lsx_data(**parameters))
+            results['cases'].append(
+                {
+                    'name': case['name'],
+                    'parameters': {
+                        key: list(value) if isinstance(value, tuple) else value
+                        for key, value in parameters.items()
+                    },
+                    'file_size': os.path.getsize(file_path),
+                    'stages': benchmark_case(file_path, repeat),
+                }
+            )
+    results['serialization'] = benchmark_serialization(serialization_sizes, repeat)
+    if output is not None:
+        with open(output, 'w') as file:
+            json.dump(results, file, indent=2)
+    return results
+
+
+def format_results(results: dict) -> str:
+    """Formats the results of `run_benchmarks` as a table."""
+    lines = [f'import of the plugin modules: {results["import_time"] * 1e3:.1f} ms']
+    lines.append(f'{"case":<16}{"stage":<18}{"min [ms]":>12}{"peak [MiB]":>12}')
+    for case in results['cases']:
+        for stage, measurement in case['stages'].items():
+            lines.append(
+                f'{case["name"]:<16}{stage:<18}'
+                f'{measurement["wall_time_min"] * 1e3:>12.2f}'
+                f'{measurement["peak_memory"] / 2**20:>12.2f}'
+            )
+    lines.append(
+        f'{"points":<16}{"serialization":<18}{"min [ms]":>12}{"peak [MiB]":>12}'
+        f'{"size [MiB]":>12}'
+    )
+    for size in results['serialization']:
+        for method, measurement in size['methods'].items():
+            lines.append(
+                f'{size["n_points"]:<16}{method:<18}'
+                f'{measurement["wall_time_min"] * 1e3:>12.2f}'
+                f'{measurement["peak_memory"] / 2**20:>12.2f}'
+                f'{measurement["size"] / 2**20:>12.2f}'
+            )
+    return '\n'.join(lines)
@@ -0,0 +1,444 @@
+"""
+Command line tools to prepare uploads of Horiba LabRAM data.
+
+    nomad-ikz-raman ingest <directory> [--output DIR] [--workers N] [--hdf5]
+    nomad-ikz-raman inventory <directory> [--output FILE] [--workers N]
+    nomad-ikz-raman benchmark [--output FILE] [--repeat N] [--case NAME] [--points N]
+    nomad-ikz-raman index <directory> <index> [--components N]
+    nomad-ikz-raman fit <index>
+    nomad-ikz-raman similar <index> <data file> [-k N] [--probes N]
+
+`ingest` parses all Horiba XML exports below a directory in parallel and writes one
+`.archive.json` measurement entry per data file, so that large campaigns can be
+uploaded as complete entries. `inventory` lists the metadata of all data files
+without reading their spectra, e.g. to decide which files to ingest. `benchmark`
+times the processing of synthetic data files, see `nomad_ikz_raman.benchmark`.
+`index` builds a similarity index of the spectra of all data files below a
+directory, `fit` fits an index to the spectra that normalized entries added to it
+and `similar` lists the indexed spectra closest to the spectrum of a data file.
+"""
+
+import argparse
+import csv
+import os
+import re
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+from typing import Optional
+
+from nomad_ikz_raman.parsers import HORIBA_XML_CONTENTS_RE
+
+# Number of leading bytes read to recognize a Horiba XML export
+HEAD_SIZE = 1024
+
+horiba_xml_re = re.compile(HORIBA_XML_CONTENTS_RE)
+
+
+def find_data_files(directory: str) -> list:
+    """
+    Returns the sorted paths of all Horiba XML exports below `directory`. Other XML
+    files are recognized by their first bytes and skipped.
+    """
+    data_files = []
+    for root, _, file_names in os.walk(directory):
+        for file_name in file_names:
+            if not file_name.endswith('.xml'):
+                continue
+            file_path = os.path.join(root, file_name)
+            with open(file_path, 'rb') as file:
+                head = file.read(HEAD_SIZE).decode('utf-8', errors='ignore')
+            if horiba_xml_re.match(head):
+                data_files.append(file_path)
+    return sorted(data_files)
+
+
+def ingest_file(
+    file_path: str,
+    directory: str,
+    output: str,
+    hdf5: bool = False,
+    overwrite: bool = False,
+) -> tuple:
+    """
+    Parses one data file and writes its measurement entry.
+
+    The entry is written to `<output>/<relative path>.archive.json`. Its `data_file`
+    is the path of the data file relative to `directory`, i.e. the upload root.
+    Samples and the instrument are referenced by their lab_id only and are resolved
+    when the upload is processed. An existing entry is only written again if it
+    is stale, i.e. its processing stamp differs from the data file and versions,
+    or with `overwrite`.
+
+    Returns:
+        tuple: The size of the data file in bytes, whether the entry was written and
+        the error message if the file could not be ingested.
+    """
+    from nomad.datamodel import EntryArchive
+    from nomad.datamodel.context import ClientContext
+
+    from nomad_ikz_raman.schema_packages.parse_cache import hash_file
+    from nomad_ikz_raman.schema_packages.raman import (
+        ProcessingStamp,
+        Ramanspectroscopy,
+    )
+    from nomad_ikz_raman.schema_packages.raman_horiba_xml_reader import (
+        parse_raman_xml,
+    )
+    from nomad_ikz_raman.schema_packages.utils import dump_archive, load_archive
+
+    n_bytes = os.path.getsize(file_path)
+    data_file = os.path.relpath(file_path, directory).replace(os.sep, '/')
+    archive_path = os.path.join(
+        output, f'{os.path.splitext(data_file)[0]}.archive.json'
+    )
+    try:
+        entry = Ramanspectroscopy(
+            name=os.path.splitext(os.path.basename(data_file))[0],
+            data_file=data_file,
+            hdf5_storage=True if hdf5 else None,
+        )
+        stamp = entry.stamp_processing(hash_file(file_path))
+        if os.path.exists(archive_path) and not overwrite:
+            data = load_archive(archive_path).get('data', {})
+            existing = ProcessingStamp.m_from_dict(data.get('processing_stamp') or {})
+            if existing.matches(stamp, settings=False):
+                return n_bytes, False, None
+        os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+        archive = None
+        if hdf5:
+            archive = EntryArchive(m_context=ClientContext(local_dir=output))
+        entry.fill_from_raman_dict(parse_raman_xml(file_path), archive)
+        entry.processing_stamp = entry.stamp_processing(stamp.data_file_hash)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(archive_path))
+        try:
+            with os.fdopen(fd, 'w') as outfile:
+                dump_archive(entry, outfile)
+            os.replace(tmp_path, archive_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    except Exception as e:
+        return n_bytes, False, f'{type(e).__name__}: {e}'
+    return n_bytes, True, None
+
+
+def ingest(
+    directory: str,
+    output: Optional[str] = None,
+    workers: Optional[int] = None,
+    hdf5: bool = False,
+    overwrite: bool = False,
+) -> dict:
+    """
+    Ingests all Horiba XML exports below `directory` with a pool of `workers`
+    processes, see `ingest_file`.
+
+    Returns:
+        dict: The numbers of `files`, `written`, `skipped` and `failed` files, the
+        `errors` per file, the parsed `bytes` and the wall `time` in seconds.
+    """
+    start = time.perf_counter()
+    output = output or directory
+    data_files = find_data_files(directory)
+    ingest_one = partial(
+        ingest_file, directory=directory, output=output, hdf5=hdf5, overwrite=overwrite
+    )
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(data_files) <= 1:
+        outcomes = list(map(ingest_one, data_files))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunksize = max(1, len(data_files) // (4 * workers))
+            outcomes = list(executor.map(ingest_one, data_files, chunksize=chunksize))
+    errors = {
+        file_path: error
+        for file_path, (_, _, error) in zip(data_files, outcomes)
+        if error is not None
+    }
+    written = sum(1 for _, is_written, _ in outcomes if is_written)
+    return {
+        'files': len(data_files),
+        'written': written,
+        'skipped': len(data_files) - written - len(errors),
+        'failed': len(errors),
+        'errors': errors,
+        'bytes': sum(n_bytes for n_bytes, _, _ in outcomes),
+        'time': time.perf_counter() - start,
+    }
+
+
+def read_metadata_file(file_path: str, directory: str) -> tuple:
+    """
+    Reads the metadata of one data file without its spectra, see
+    `parse_raman_metadata`.
+
+    Returns:
+        tuple: The metadata with the `data_file` relative to `directory` and the
+        error message if the file could not be read.
+    """
+    from nomad_ikz_raman.schema_packages.raman_horiba_xml_reader import (
+        parse_raman_metadata,
+    )
+
+    data_file = os.path.relpath(file_path, directory).replace(os.sep, '/')
+    try:
+        return {'data_file': data_file, **parse_raman_metadata(file_path)}, None
+    except Exception as e:
+        return {'data_file': data_file}, f'{type(e).__name__}: {e}'
+
+
+def inventory(directory: str, workers: Optional[int] = None) -> dict:
+    """
+    Reads the metadata of all Horiba XML exports below `directory` with a pool of
+    `workers` processes, see `read_metadata_file`.
+
+    Returns:
+        dict: The metadata of the readable `entries`, the `errors` per file and the
+        wall `time` in seconds.
+    """
+    start = time.perf_counter()
+    data_files = find_data_files(directory)
+    read_one = partial(read_metadata_file, directory=directory)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(data_files) <= 1:
+        outcomes = list(map(read_one, data_files))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunksize = max(1, len(data_files) // (4 * workers))
+            outcomes = list(executor.map(read_one, data_files, chunksize=chunksize))
+    return {
+        'entries': [metadata for metadata, error in outcomes if error is None],
+        'errors': {
+            file_path: error
+            for file_path, (_, error) in zip(data_files, outcomes)
+            if error is not None
+        },
+        'time': time.perf_counter() - start,
+    }
+
+
+def write_inventory(entries: list, output: Optional[str] = None) -> None:
+    """
+    Writes the metadata of `inventory` as CSV, one row per data file, to the file
+    `output` or to stdout.
+    """
+    from nomad_ikz_raman.schema_packages.raman_horiba_xml_reader import (
+        METADATA_FIELDS,
+    )
+
+    fieldnames = ['data_file', *(key for key, _, _ in METADATA_FIELDS), 'n_points']
+    outfile = open(output, 'w', newline='') if output else nullcontext(sys.stdout)
+    with outfile as outfile:
+        writer = csv.DictWriter(outfile, fieldnames=fieldnames, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(entries)
+
+
+def build_index(directory: str, index: str, n_components: int = 64) -> int:
+    """
+    Builds a similarity index of the spectra of all Horiba XML exports below
+    `directory`, identified by their path relative to `directory`.
+
+    Returns:
+        int: The number of indexed spectra.
+    """
+    from nomad_ikz_raman.schema_packages.raman_horiba_xml_reader import (
+        parse_raman_xml,
+    )
+    from nomad_ikz_raman.schema_packages.similarity import SimilarityIndex
+
+    def spectra():
+        for file_path in find_data_files(directory):
+            raman_dict = parse_raman_xml(file_path)
+            yield (
+                os.path.relpath(file_path, directory).replace(os.sep, '/'),
+                raman_dict['wavenumbers'],
+                raman_dict['intensities'],
+            )
+
+    similarity_index = SimilarityIndex(index, n_components=n_components)
+    similarity_index.build(spectra())
+    return len(similarity_index)
+
+
+def format_report(report: dict) -> str:
+    """Formats the throughput of an ingest run."""
+    megabytes = report['bytes'] / 2**20
+    duration = max(report['time'], 1e-9)
+    return (
+        f'{report["files"]} files ({megabytes:.1f} MB) in {report["time"]:.2f} s: '
+        f'{report["written"]} written, {report["skipped"]} skipped, '
+        f'{report["failed"]} failed; {report["files"] / duration:.1f} files/s, '
+        f'{megabytes / duration:.1f} MB/s'
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Returns the parser of the command line arguments."""
+    parser = argparse.ArgumentParser(
+        prog='nomad-ikz-raman', description=__doc__.split('\n\n')[0].strip()
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    ingest_parser = subparsers.add_parser(
+        'ingest', help='Write measurement entries for a directory of data files.'
+    )
+    ingest_parser.add_argument(
+        'directory', help='The directory to scan, i.e. the future upload root.'
+    )
+    ingest_parser.add_argument(
+        '--output',
+        help='The directory to write the entries to. Defaults to the scanned '
+        'directory, next to the data files.',
+    )
+    ingest_parser.add_argument(
+        '--workers',
+        type=int,
+        help='The number of worker processes. Defaults to the number of CPUs.',
+    )
+    ingest_parser.add_argument(
+        '--hdf5',
+        action='store_true',
+        help='Store the spectra in HDF5 files next to the entries.',
+    )
+    ingest_parser.add_argument(
+        '--overwrite', action='store_true', help='Replace existing entries.'
+    )
+    inventory_parser = subparsers.add_parser(
+        'inventory', help='List the metadata of all data files below a directory.'
+    )
+    inventory_parser.add_argument('directory', help='The directory to scan.')
+    inventory_parser.add_argument(
+        '--output', help='The CSV file to write. Written to stdout by default.'
+    )
+    inventory_parser.add_argument(
+        '--workers',
+        type=int,
+        help='The number of worker processes. Defaults to the number of CPUs.',
+    )
+    benchmark_parser = subparsers.add_parser(
+        'benchmark', help='Time the processing of synthetic data files.'
+    )
+    benchmark_parser.add_argument(
+        '--output', help='The JSON file to write the results to.'
+    )
+    benchmark_parser.add_argument(
+        '--repeat', type=int, default=3, help='The number of timed calls per stage.'
+    )
+    benchmark_parser.add_argument(
+        '--case',
+        action='append',
+        help='The name of a case to run, see `BENCHMARK_CASES`. All cases by default.',
+    )
+    benchmark_parser.add_argument(
+        '--points',
+        type=int,
+        action='append',
+        help='The number of points of a spectrum in the serialization benchmark, '
+        'see `SERIALIZATION_SIZES`.',
+    )
+    index_parser = subparsers.add_parser(
+        'index', help='Build a similarity index of a directory of data files.'
+    )
+    index_parser.add_argument('directory', help='The directory to scan.')
+    index_parser.add_argument('index', help='The directory of the index.')
+    index_parser.add_argument(
+        '--components', type=int, default=64, help='The length of the embeddings.'
+    )
+    fit_parser = subparsers.add_parser(
+        'fit', help='Fit a similarity index to the spectra added by entries.'
+    )
+    fit_parser.add_argument('index', help='The directory of the index.')
+    similar_parser = subparsers.add_parser(
+        'similar', help='List the indexed spectra closest to a data file.'
+    )
+    similar_parser.add_argument('index', help='The directory of the index.')
+    similar_parser.add_argument('data_file', help='The Horiba XML export to match.')
+    similar_parser.add_argument(
+        '-k', type=int, default=10, help='The number of spectra to list.'
+    )
+    similar_parser.add_argument(
+        '--probes',
+        type=int,
+        help='The number of clusters searched by an approximate query. All spectra '
+        'are compared by default.',
+    )
+    return parser
+
+
+def main(argv: Optional[list] = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    if args.command == 'inventory':
+        report = inventory(args.directory, workers=args.workers)
+        for file_path, error in report['errors'].items():
+            print(f'{file_path}: {error}', file=sys.stderr)
+        write_inventory(report['entries'], args.output)
+        return 1 if report['errors'] else 0
+
+    if args.command == 'index':
+        n_spectra = build_index(args.directory, args.index, args.components)
+        print(f'{n_spectra} spectra indexed in {args.index}')
+        return 0
+
+    if args.command == 'fit':
+        from nomad_ikz_raman.schema_packages.similarity import SimilarityIndex
+
+        n_spectra = SimilarityIndex(args.index).fit_pending()
+        print(f'{args.index} fitted to {n_spectra} spectra')
+        return 0
+
+    if args.command == 'similar':
+        from nomad_ikz_raman.schema_packages.raman_horiba_xml_reader import (
+            parse_raman_xml,
+        )
+        from nomad_ikz_raman.schema_packages.similarity import SimilarityIndex
+
+        raman_dict = parse_raman_xml(args.data_file)
+        neighbours = SimilarityIndex(args.index).query(
+            raman_dict['wavenumbers'],
+            raman_dict['intensities'],
+            k=args.k,
+            n_probe=args.probes,
+        )
+        for spectrum_id, distance in neighbours:
+            print(f'{distance:.4f}\t{spectrum_id}')
+        return 0
+
+    if args.command == 'benchmark':
+        from nomad_ikz_raman.benchmark import (
+            BENCHMARK_CASES,
+            SERIALIZATION_SIZES,
+            format_results,
+            run_benchmarks,
+        )
+
+        cases = [
+            case
+            for case in BENCHMARK_CASES
+            if args.case is None or case['name'] in args.case
+        ]
+        results = run_benchmarks(
+            cases, args.repeat, args.output, args.points or SERIALIZATION_SIZES
+        )
+        print(format_results(results))
+        return 0
+
+    report = ingest(
+        args.directory,
+        output=args.output,
+        workers=args.workers,
+        hdf5=args.hdf5,
+        overwrite=args.overwrite,
+    )
+    for file_path, error in report['errors'].items():
+        print(f'{file_path}: {error}', file=sys.stderr)
+    print(format_report(report))
+    return 1 if report['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
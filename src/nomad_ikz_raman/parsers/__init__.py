@@ -1,26 +1,27 @@
 from nomad.config.models.plugins import ParserEntryPoint
 from pydantic import Field
 
-
-class MyParserEntryPoint(ParserEntryPoint):
-    parameter: int = Field(0, description='Custom configuration parameter')
-
-    def load(self):
-        from nomad_ikz_raman.parsers.myparser import MyParser
-
-        return MyParser(**self.dict())
-
-
-myparser = MyParserEntryPoint(
-    name='RamanParser',
-    description='Parser to handle data from Horiba Ramanspectrometer.',
-    mainfile_name_re='.*\.xml',
-    mainfile_contents_re='<LSX_Data>',
-)
+# Horiba XML exports start with the XML prolog followed by the `LSX_Data` root
+# element. The match is anchored at the start of the file and bounded, so other XML
+# files are rejected after the first few hundred characters.
+HORIBA_XML_CONTENTS_RE = r'\A\ufeff?\s{0,64}<\?xml[^>]{0,256}\?>\s{0,64}<LSX_Data>'
 
 
 class RamanParserEntryPoint(ParserEntryPoint):
     parameter: int = Field(0, description='Custom configuration parameter')
+    create_eln_entry: bool = Field(
+        True,
+        description='Write the measurement into a separate, editable `.archive.json` '
+        'entry that parses the data file when it is processed. Otherwise the parser '
+        'parses the data file once and stores the measurement in the entry of the '
+        'data file itself.',
+    )
+    rebuild_stale_archives: bool = Field(
+        False,
+        description='Overwrite an existing `.archive.json` entry if the data file or '
+        'the reader or schema version changed since it was written. Edits of the '
+        'entry are lost. Otherwise existing entries are kept as they are.',
+    )
 
     def load(self):
         from nomad_ikz_raman.parsers.ramanparser import RamanParser
@@ -31,6 +32,6 @@ class RamanParserEntryPoint(ParserEntryPoint):
 ramanparser = RamanParserEntryPoint(
     name='RamanParser',
     description='Parser to handle data from Horiba Ramanspectrometer.',
-    mainfile_name_re='.*\.xml',
-    mainfile_contents_re='<LSX_Data>',
+    mainfile_name_re=r'.*\.xml',
+    mainfile_contents_re=HORIBA_XML_CONTENTS_RE,
 )
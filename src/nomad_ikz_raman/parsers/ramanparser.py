@@ -1,3 +1,5 @@
+import json
+import os.path
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -14,7 +16,8 @@ from nomad.datamodel.metainfo.annotations import ELNAnnotation
 from nomad.metainfo import Quantity
 from nomad.parsing.parser import MatchingParser
 
-from nomad_ikz_raman.schema_packages.raman import Ramanspectroscopy
+from nomad_ikz_raman.schema_packages.parse_cache import hash_file
+from nomad_ikz_raman.schema_packages.raman import ProcessingStamp, Ramanspectroscopy
 from nomad_ikz_raman.schema_packages.utils import create_archive
 
 configuration = config.get_plugin_entry_point('nomad_ikz_raman.parsers:ramanparser')
@@ -34,6 +37,42 @@ class RawFileRamanData(EntryData):
 
 
 class RamanParser(MatchingParser):
+    @staticmethod
+    def is_stale(archive: 'EntryArchive', file_name: str, stamp: ProcessingStamp):
+        """
+        Whether the entry `file_name` exists and was written for another content of
+        the data file or another reader or schema version than `stamp`.
+        """
+        try:
+            with archive.m_context.raw_file(file_name) as file:
+                data = json.load(file).get('data', {})
+        except (KeyError, OSError, ValueError):
+            return False
+        existing = ProcessingStamp.m_from_dict(data.get('processing_stamp') or {})
+        return not existing.matches(stamp, settings=False)
+
+    @staticmethod
+    def entry_file_name(archive: 'EntryArchive', data_file: str) -> str:
+        """
+        Returns the file name of the measurement entry of `data_file`, the path of
+        the data file with `.archive.json` instead of its extension.
+
+        Entries of earlier versions are named by the stem of the data file without
+        any dots at the upload root. Such an entry is reused as long as no entry
+        with the current name exists, so that reprocessing an upload does not
+        create a second entry for the same measurement.
+        """
+        file_name = f'{os.path.splitext(data_file)[0]}.archive.json'
+        stem = ''.join(os.path.basename(data_file).split('.')[:-1])
+        legacy_file_name = f'{stem}.archive.json'
+        if (
+            legacy_file_name != file_name
+            and not archive.m_context.raw_path_exists(file_name)
+            and archive.m_context.raw_path_exists(legacy_file_name)
+        ):
+            return legacy_file_name
+        return file_name
+
     def parse(
         self,
         mainfile: str,
@@ -42,15 +81,35 @@ class RamanParser(MatchingParser):
         child_archives: dict[str, 'EntryArchive'] = None,
     ) -> None:
         logger.info('RamanParser.parse', parameter=configuration.parameter)
-        data_file = mainfile.split('/')[-1]
+        # The path of the data file relative to the upload root, as written by the
+        # ingest command, so that ingested entries are not created a second time
+        data_file = archive.metadata.mainfile or mainfile
+        if os.path.isabs(data_file):
+            # Parsed outside of an upload, the directory of the file is the root
+            data_file = os.path.basename(data_file)
         entry = Ramanspectroscopy()  # .m_from_dict(Ramanspectroscopy.m_def.a_template)
         entry.data_file = data_file
-        entry.name = ''.join(data_file.split('.')[:-1])
-        file_name = f'{"".join(data_file.split(".")[:-1])}.archive.json'
+        entry.name = os.path.splitext(os.path.basename(data_file))[0]
+        if not configuration.create_eln_entry:
+            # Parse the data file once and keep the measurement in this entry, the
+            # normalizer does not read the data file again
+            entry.load_data_file(archive, logger, file_path=mainfile)
+            archive.data = entry
+            archive.metadata.entry_name = f'{os.path.basename(data_file)} measurement'
+            return
+        file_name = self.entry_file_name(archive, data_file)
+        # The data file is only hashed if the entry is written or may be stale
+        exists = archive.m_context.raw_path_exists(file_name)
+        overwrite = False
+        if not exists or configuration.rebuild_stale_archives:
+            entry.processing_stamp = entry.stamp_processing(hash_file(mainfile))
+            overwrite = exists and self.is_stale(
+                archive, file_name, entry.processing_stamp
+            )
         archive.data = RawFileRamanData(
-            measurement=create_archive(entry, archive, file_name)
+            measurement=create_archive(entry, archive, file_name, overwrite)
         )
-        archive.metadata.entry_name = f'{data_file} data file'
+        archive.metadata.entry_name = f'{os.path.basename(data_file)} data file'
 
     # def parse(
     #     self,
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from nomad.config.models.plugins import SchemaPackageEntryPoint
 from pydantic import Field
 
@@ -18,6 +20,67 @@ mypackage = MySchemaPackageEntryPoint(
 
 
 class RamanEntryPoint(SchemaPackageEntryPoint):
+    hdf5_storage: bool = Field(
+        False,
+        description='Store spectra and maps in an HDF5 file next to the raw data '
+        'instead of inline in the archive.',
+    )
+    hdf5_compression: Optional[str] = Field(
+        'gzip', description='Compression filter of the HDF5 datasets.'
+    )
+    plot_max_points: int = Field(
+        2000,
+        description='Largest number of points of a plotted spectrum. Longer spectra '
+        'are downsampled, keeping the minimum and maximum of consecutive points.',
+    )
+    peak_fit_workers: int = Field(
+        1,
+        description='Number of processes fitting the peaks of the spectra of a map.',
+    )
+    similarity_index_dir: Optional[str] = Field(
+        None,
+        description='Directory of the similarity index that every normalized '
+        'spectrum is added to. Spectra are not indexed by default.',
+    )
+    saturation_level: Optional[float] = Field(
+        None,
+        description='Intensity at which the detector saturates. By default, ranges '
+        'of equal values at the maximum of a spectrum are saturated.',
+    )
+    min_snr: float = Field(
+        10.0, description='SNR below which a spectrum is flagged as noisy.'
+    )
+    calibration_dir: Optional[str] = Field(
+        None,
+        description='Persistent directory of the wavenumber calibrations of '
+        'reference measurements, shared by all workers. Without it, calibrations are '
+        'neither stored nor applied.',
+    )
+    calibration_validity_hours: float = Field(
+        24.0,
+        description='Largest time in hours between a measurement and the reference '
+        'measurement whose calibration is applied to it.',
+    )
+    force_reprocessing: bool = Field(
+        False,
+        description='Process the data files of entries again even if their content, '
+        'the settings and the reader and schema versions are unchanged. Otherwise '
+        'entries whose processing stamp matches are not processed again.',
+    )
+    parse_cache: bool = Field(
+        True,
+        description='Cache parsed data files by content, so that unchanged files are '
+        'not parsed again when an entry is normalized.',
+    )
+    parse_cache_dir: Optional[str] = Field(
+        None,
+        description='Directory of the parse cache. Defaults to a directory in the '
+        'NOMAD `fs.tmp` directory.',
+    )
+    parse_cache_max_bytes: int = Field(
+        2**30, description='Size in bytes above which cached results are evicted.'
+    )
+
     def load(self):
         from nomad_ikz_raman.schema_packages.raman import m_package
 
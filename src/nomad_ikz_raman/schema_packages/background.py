@@ -0,0 +1,101 @@
+"""
+Subtraction of background or substrate reference spectra.
+
+Many samples share one reference, e.g. all measurements on the same substrate. The
+reference is therefore loaded and resampled onto the axis of the samples once per
+process and axis, and the resampled reference is reused for all samples and all
+points of their maps.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+from .resampling import Resampler
+
+BACKGROUND_SCALINGS = ('none', 'exposure', 'least_squares')
+
+# Number of references and axes whose resampled reference is kept
+MAX_CACHED_BACKGROUNDS = 64
+
+# Resampled references by reference key and axis
+_background_cache = OrderedDict()
+
+
+def resampled_background(key, wavenumber, load) -> tuple:
+    """
+    Returns a reference resampled onto `wavenumber`. Grid points outside of the
+    axis of the reference are NaN.
+
+    Args:
+        key (str): Identifies the reference and the version of its spectrum, e.g.
+            the reference to its entry and its processing stamp.
+        wavenumber (np.ndarray): The axis of the spectra the reference is
+            subtracted from.
+        load (Callable): Returns the axis, the spectrum and the exposure of the
+            reference, or `None` if the reference has no spectrum yet. Only called
+            if the reference is not cached for the axis.
+
+    Returns:
+        tuple: The resampled reference spectrum and the exposure of the reference,
+        or `None`.
+    """
+    cache_key = (key, np.ascontiguousarray(wavenumber, dtype=np.float64).tobytes())
+    cached = _background_cache.get(cache_key)
+    if cached is not None:
+        _background_cache.move_to_end(cache_key)
+        return cached
+    loaded = load()
+    if loaded is None:
+        return None
+    reference_x, reference, exposure = loaded
+    resampled = Resampler(wavenumber).resample(reference_x, reference)[0]
+    resampled.flags.writeable = False
+    cached = (resampled, exposure)
+    _background_cache[cache_key] = cached
+    if len(_background_cache) > MAX_CACHED_BACKGROUNDS:
+        _background_cache.popitem(last=False)
+    return cached
+
+
+def background_scales(intensity, background, scaling='exposure', exposure_ratio=1.0):
+    """
+    Returns the factor of the background of every spectrum.
+
+    Args:
+        intensity (np.ndarray): The spectra, with the spectral axis last.
+        background (np.ndarray): The reference on the axis of the spectra, NaN
+            outside of the axis of the reference.
+        scaling (str): One of `BACKGROUND_SCALINGS`. The background is scaled by
+            the ratio of the exposures of the spectra and the reference or by the
+            non-negative least squares factor of every spectrum.
+        exposure_ratio (float): The exposure of the spectra over that of the
+            reference.
+
+    Returns:
+        np.ndarray: The factors, of the shape of `intensity` without its last axis.
+    """
+    shape = np.shape(intensity)[:-1]
+    if scaling == 'none':
+        return np.ones(shape)
+    if scaling == 'exposure':
+        return np.full(shape, exposure_ratio)
+    if scaling != 'least_squares':
+        raise ValueError(f'Unknown background scaling {scaling}.')
+    inside = np.isfinite(background)
+    reference = background[inside]
+    norm = reference @ reference
+    if not norm:
+        return np.ones(shape)
+    spectra = np.asarray(intensity, dtype=np.float64)[..., inside]
+    return np.maximum(spectra @ reference / norm, 0.0)
+
+
+def subtract_background(intensity, background, scales):
+    """
+    Subtracts the scaled background from spectra. Values outside of the axis of
+    the reference are kept.
+    """
+    intensity = np.asarray(intensity, dtype=np.float64)
+    scaled = np.asarray(scales)[..., None] * np.nan_to_num(background)
+    return intensity - scaled
@@ -0,0 +1,196 @@
+"""
+Calibration of the wavenumber axis against reference lines.
+
+A reference measurement of silicon or of a neon lamp is fitted once. Its lines are
+matched to their known positions and a polynomial correction of the axis is fitted
+to the differences. The correction is stored per instrument, laser and grating and
+applied to all measurements with the same combination that were taken within the
+validity window of the reference measurement.
+"""
+
+import json
+import os
+import re
+import tempfile
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+from .peaks import fit_spectrum
+
+# Raman shift (1/cm) of the first-order phonon of silicon
+SILICON_LINE = 520.7
+# Wavelengths (nm, in air) of strong neon emission lines in the red and near infrared
+NEON_LINES = (
+    585.249,
+    588.190,
+    594.483,
+    597.553,
+    602.000,
+    607.434,
+    609.616,
+    614.306,
+    616.359,
+    621.728,
+    626.650,
+    630.479,
+    633.443,
+    638.299,
+    640.225,
+    650.653,
+    653.288,
+    659.895,
+    667.828,
+    671.704,
+    692.947,
+    703.241,
+    717.394,
+    724.517,
+    743.890,
+)
+CALIBRATION_REFERENCES = ('silicon', 'neon')
+
+# Largest distance (1/cm) between a fitted peak and the reference line it is
+# matched to
+MATCH_TOLERANCE = 15.0
+# Number of instrument, laser and grating combinations whose calibrations are kept
+MAX_CACHED_KEYS = 256
+
+# Calibrations by directory and key, with the modification time of their directory
+_calibration_cache = OrderedDict()
+
+
+def reference_lines(reference, laser_wavelength=None) -> np.ndarray:
+    """
+    Returns the Raman shifts (1/cm) of the lines of a reference. The shifts of the
+    neon lines depend on the wavelength (nm) of the laser.
+    """
+    if reference == 'silicon':
+        return np.array([SILICON_LINE])
+    if reference == 'neon':
+        if not laser_wavelength:
+            raise ValueError('The laser wavelength is needed for the neon lines.')
+        lines = np.array(NEON_LINES)
+        lines = lines[lines > laser_wavelength]
+        return 1e7 / laser_wavelength - 1e7 / lines
+    raise ValueError(f'Unknown calibration reference {reference}.')
+
+
+def fit_calibration(wavenumber, intensity, lines, degree=1) -> tuple:
+    """
+    Fits a polynomial correction of the axis that moves the peaks of a reference
+    spectrum to the positions of its reference lines. Lines outside of the axis or
+    without a peak within `MATCH_TOLERANCE` are skipped, the degree is lowered to
+    the number of matched lines minus one.
+
+    Args:
+        wavenumber (np.ndarray): The measured axis.
+        intensity (np.ndarray): The reference spectrum.
+        lines (np.ndarray): The known positions of the reference lines.
+        degree (int): The highest degree of the correction.
+
+    Returns:
+        tuple: The coefficients of the correction, lowest degree first, the matched
+        lines and the measured positions of their peaks.
+
+    Raises:
+        ValueError: If no line is matched.
+    """
+    x = np.asarray(wavenumber, dtype=np.float64)
+    lines = np.asarray(lines, dtype=np.float64)
+    lines = lines[(lines >= x.min()) & (lines <= x.max())]
+    positions = fit_spectrum(x, intensity, max_peaks=max(1, 2 * len(lines)))[:, 0]
+    if not positions.size or not lines.size:
+        raise ValueError('No reference line was found in the spectrum.')
+    distances = np.abs(positions[None, :] - lines[:, None])
+    nearest = distances.argmin(axis=1)
+    matched = distances[np.arange(len(lines)), nearest] <= MATCH_TOLERANCE
+    if not matched.any():
+        raise ValueError('No reference line was found in the spectrum.')
+    lines, measured = lines[matched], positions[nearest[matched]]
+    degree = min(degree, len(lines) - 1)
+    coefficients = np.polynomial.polynomial.polyfit(measured, lines - measured, degree)
+    return coefficients, lines, measured
+
+
+def apply_calibration(wavenumber, coefficients) -> np.ndarray:
+    """Corrects wavenumbers of any shape with the coefficients of a correction."""
+    x = np.asarray(wavenumber, dtype=np.float64)
+    return x + np.polynomial.polynomial.polyval(x, coefficients)
+
+
+def calibration_key(instrument, laser_wavelength, grating) -> str:
+    """Returns the file name safe key of an instrument, laser and grating."""
+    return re.sub(r'[^\w.-]', '_', f'{instrument}_{laser_wavelength:g}_{grating}')
+
+
+class CalibrationStore:
+    """
+    Calibrations stored as one JSON file each in a directory per key, see
+    `calibration_key`. The calibrations of a key are read once per process and
+    again only after a calibration was added to the key.
+
+    Args:
+        directory (str): The directory of the store.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def put(self, key, calibration) -> None:
+        """
+        Adds a calibration, a JSON serializable dict with the `measured_at`
+        datetime and the `coefficients` of the correction.
+        """
+        directory = os.path.join(self.directory, key)
+        os.makedirs(directory, exist_ok=True)
+        content = {**calibration, 'measured_at': calibration['measured_at'].isoformat()}
+        # Write to a temporary file first, so that readers never see a partially
+        # written calibration
+        descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(descriptor, 'w') as file:
+            json.dump(content, file)
+        name = calibration['measured_at'].strftime('%Y%m%dT%H%M%S')
+        os.replace(temporary_path, os.path.join(directory, f'{name}.json'))
+
+    def get(self, key) -> list:
+        """Returns the calibrations of `key` ordered by their time of measurement."""
+        directory = os.path.join(self.directory, key)
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except FileNotFoundError:
+            return []
+        cache_key = (self.directory, key)
+        cached = _calibration_cache.get(cache_key)
+        if cached is not None and cached[0] == mtime:
+            _calibration_cache.move_to_end(cache_key)
+            return cached[1]
+        calibrations = []
+        for file_name in sorted(os.listdir(directory)):
+            if not file_name.endswith('.json'):
+                continue
+            with open(os.path.join(directory, file_name)) as file:
+                calibration = json.load(file)
+            calibration['measured_at'] = datetime.fromisoformat(
+                calibration['measured_at']
+            )
+            calibrations.append(calibration)
+        _calibration_cache[cache_key] = (mtime, calibrations)
+        if len(_calibration_cache) > MAX_CACHED_KEYS:
+            _calibration_cache.popitem(last=False)
+        return calibrations
+
+    def find(self, key, when, validity):
+        """
+        Returns the calibration of `key` measured closest to the datetime `when`
+        and not more than the timedelta `validity` apart, or `None`.
+        """
+        candidates = [
+            calibration
+            for calibration in self.get(key)
+            if abs(calibration['measured_at'] - when) <= validity
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda c: abs(c['measured_at'] - when))
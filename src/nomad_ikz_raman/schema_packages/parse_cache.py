@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime
+
+import numpy as np
+
+from .raman_horiba_xml_reader import READER_VERSION, parse_raman_xml
+
+# Name of the array holding the non-array entries of a cached result
+METADATA_KEY = '__metadata__'
+# Size of the blocks in which raw files are hashed
+HASH_BLOCK_SIZE = 2**20
+
+
+def hash_file(file_path) -> str:
+    """
+    Returns the SHA-256 hex digest of the content of a file.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {'datetime': value.isoformat()}
+    raise TypeError(f'Cannot cache a value of type {type(value).__name__}.')
+
+
+def _decode(value):
+    if 'datetime' in value:
+        return datetime.fromisoformat(value['datetime'])
+    return value
+
+
+class ParseCache:
+    """
+    Persistent cache of `parse_raman_xml` results.
+
+    Results are stored as `.npz` files keyed by the hash of the raw file, the
+    reader version and the float type of the arrays, so an unchanged file is only
+    parsed once. When the cache outgrows `max_bytes`, the least recently used
+    results are evicted.
+
+    Args:
+        directory (str): The directory of the cached results.
+        max_bytes (int): The size the cache is reduced to after adding a result.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def key(self, file_path, dtype=np.float64, file_hash=None) -> str:
+        file_hash = file_hash or hash_file(file_path)
+        return f'{file_hash}-{READER_VERSION}-{np.dtype(dtype).name}'
+
+    def _path(self, key) -> str:
+        return os.path.join(self.directory, f'{key}.npz')
+
+    def get(self, key):
+        """
+        Returns the cached result for `key` or `None` if there is none.
+        """
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                raman_dict = json.loads(str(data[METADATA_KEY]), object_hook=_decode)
+                raman_dict.update(
+                    (name, data[name]) for name in data.files if name != METADATA_KEY
+                )
+        except (OSError, ValueError, KeyError):
+            return None
+        os.utime(path)
+        return raman_dict
+
+    def put(self, key, raman_dict) -> None:
+        """
+        Stores a result under `key` and evicts results beyond `max_bytes`.
+        """
+        arrays = {
+            name: value
+            for name, value in raman_dict.items()
+            if isinstance(value, np.ndarray)
+        }
+        metadata = {
+            name: value for name, value in raman_dict.items() if name not in arrays
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        # Write to a temporary file first, so that concurrent readers never see a
+        # partially written result
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(descriptor, 'wb') as file:
+            np.savez(
+                file,
+                **{METADATA_KEY: np.array(json.dumps(metadata, default=_encode))},
+                **arrays,
+            )
+        os.replace(temporary_path, self._path(key))
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        Removes the least recently used results until the cache fits `max_bytes`.
+        """
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.name.endswith('.npz'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        size = sum(entry_size for _, entry_size, _ in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+
+    def parse(self, file_path, dtype=np.float64, file_hash=None) -> dict:
+        """
+        Returns the result of `parse_raman_xml` for a file, parsing it only if the
+        file content is not cached yet. `file_hash` is the `hash_file` of the file
+        if it is already known.
+        """
+        key = self.key(file_path, dtype, file_hash)
+        raman_dict = self.get(key)
+        if raman_dict is None:
+            raman_dict = parse_raman_xml(file_path, dtype)
+            self.put(key, raman_dict)
+        return raman_dict
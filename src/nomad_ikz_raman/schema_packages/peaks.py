@@ -0,0 +1,210 @@
+"""
+Detection and fitting of Raman peaks.
+
+Peaks are detected by their prominence and all peaks of a spectrum are fitted
+together with Lorentzian or Voigt profiles on a linear background. Maps are fitted
+spectrum by spectrum, optionally in a pool of processes.
+"""
+
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+# Version of the fit results, to be increased whenever they change
+PEAKS_VERSION = '1'
+
+PROFILES = ('lorentzian', 'voigt')
+
+# Columns of a peak table
+PEAK_COLUMNS = ('position', 'fwhm', 'height', 'area')
+
+# FWHM of a Gaussian in units of its standard deviation
+GAUSSIAN_FWHM = 2.0 * np.sqrt(2.0 * np.log(2.0))
+
+
+def lorentzian(x, position, fwhm, area):
+    """Lorentzian profile with the given position, FWHM and area."""
+    half_width = fwhm / 2.0
+    return area / np.pi * half_width / ((x - position) ** 2 + half_width**2)
+
+
+def voigt(x, position, sigma, gamma, area):
+    """Voigt profile with Gaussian width `sigma`, Lorentzian `gamma` and area."""
+    from scipy.special import voigt_profile
+
+    return area * voigt_profile(x - position, sigma, gamma)
+
+
+def voigt_fwhm(sigma, gamma):
+    """FWHM of a Voigt profile (Olivero and Longbothum)."""
+    lorentzian_fwhm = 2.0 * gamma
+    gaussian_fwhm = GAUSSIAN_FWHM * sigma
+    return 0.5346 * lorentzian_fwhm + np.sqrt(
+        0.2166 * lorentzian_fwhm**2 + gaussian_fwhm**2
+    )
+
+
+def detect_peaks(wavenumber, intensity, min_prominence=0.05, max_peaks=10):
+    """
+    Detects the `max_peaks` most prominent peaks of a spectrum.
+
+    Args:
+        wavenumber (np.ndarray): The spectral axis.
+        intensity (np.ndarray): The spectrum.
+        min_prominence (float): The smallest prominence of a peak relative to the
+            range of the intensities.
+        max_peaks (int): The largest number of peaks.
+
+    Returns:
+        np.ndarray: A (n_peaks x 4) table of the estimated position, FWHM, height and
+        area of the peaks, ordered by position.
+    """
+    from scipy.signal import find_peaks, peak_widths
+
+    intensity = np.asarray(intensity, dtype=np.float64)
+    span = np.ptp(intensity) if intensity.size else 0.0
+    if not span or not np.isfinite(span):
+        return np.empty((0, len(PEAK_COLUMNS)))
+    indices, properties = find_peaks(intensity, prominence=min_prominence * span)
+    # The strongest peaks, kept in the order of their position
+    strongest = np.sort(np.argsort(properties['prominences'])[::-1][:max_peaks])
+    indices = indices[strongest]
+    heights = properties['prominences'][strongest]
+    widths = peak_widths(intensity, indices, rel_height=0.5)[0]
+    step = np.abs(np.gradient(np.asarray(wavenumber, dtype=np.float64)))[indices]
+    fwhm = np.maximum(widths * step, step)
+    table = np.column_stack(
+        [np.asarray(wavenumber)[indices], fwhm, heights, heights * np.pi * fwhm / 2.0]
+    )
+    return table.reshape(-1, len(PEAK_COLUMNS))
+
+
+def fit_spectrum(
+    wavenumber, intensity, profile='lorentzian', min_prominence=0.05, max_peaks=10
+):
+    """
+    Fits the peaks detected by `detect_peaks` together with profiles on a linear
+    background. If the fit does not converge, the estimates of the detection are
+    returned.
+
+    Args:
+        wavenumber (np.ndarray): The spectral axis.
+        intensity (np.ndarray): The spectrum.
+        profile (str): The peak profile, one of `PROFILES`.
+        min_prominence (float): See `detect_peaks`.
+        max_peaks (int): See `detect_peaks`.
+
+    Returns:
+        np.ndarray: A (n_peaks x 4) table of the position, FWHM, height and area of
+        the peaks, see `PEAK_COLUMNS`.
+    """
+    from scipy.optimize import curve_fit
+
+    x = np.asarray(wavenumber, dtype=np.float64)
+    y = np.asarray(intensity, dtype=np.float64)
+    estimates = detect_peaks(x, y, min_prominence, max_peaks)
+    if not len(estimates):
+        return estimates
+    center = x.mean()
+    lowest, highest = x.min(), x.max()
+    smallest = np.abs(np.diff(x)).min() / 10.0
+    if profile == 'voigt':
+        function = voigt
+        # Every peak as position, sigma, gamma and area
+        initial = [
+            [position, fwhm / GAUSSIAN_FWHM / 2.0, fwhm / 4.0, area]
+            for position, fwhm, _, area in estimates
+        ]
+        lower = [lowest, smallest, smallest, 0.0]
+        upper = [highest, np.inf, np.inf, np.inf]
+    else:
+        function = lorentzian
+        # Every peak as position, fwhm and area
+        initial = [[position, fwhm, area] for position, fwhm, _, area in estimates]
+        lower = [lowest, smallest, 0.0]
+        upper = [highest, np.inf, np.inf]
+    n_parameters = len(lower)
+
+    def model(x, offset, slope, *peaks):
+        values = offset + slope * (x - center)
+        for peak in np.reshape(peaks, (-1, n_parameters)):
+            values = values + function(x, *peak)
+        return values
+
+    try:
+        parameters, _ = curve_fit(
+            model,
+            x,
+            y,
+            p0=[np.percentile(y, 10), 0.0, *np.ravel(initial)],
+            bounds=(
+                [-np.inf, -np.inf, *lower * len(estimates)],
+                [np.inf, np.inf, *upper * len(estimates)],
+            ),
+        )
+    except (RuntimeError, ValueError):
+        return estimates
+    peaks = np.reshape(parameters[2:], (-1, n_parameters))
+    if profile == 'voigt':
+        fwhm = voigt_fwhm(peaks[:, 1], peaks[:, 2])
+        heights = np.array([voigt(peak[0], *peak) for peak in peaks])
+    else:
+        fwhm = peaks[:, 1]
+        heights = 2.0 * peaks[:, 2] / (np.pi * fwhm)
+    return np.column_stack([peaks[:, 0], fwhm, heights, peaks[:, -1]])
+
+
+def fit_spectra(  # noqa: PLR0913
+    wavenumber,
+    intensity,
+    *,
+    profile='lorentzian',
+    min_prominence=0.05,
+    max_peaks=10,
+    workers=1,
+):
+    """
+    Fits the peaks of a spectrum or of all spectra of a map with `fit_spectrum`.
+
+    Args:
+        wavenumber (np.ndarray): The shared spectral axis.
+        intensity (np.ndarray): A spectrum or a map with one spectrum per row.
+        workers (int): The number of processes fitting the spectra of a map.
+
+    Returns:
+        tuple: The index of the spectrum of every peak and the table of all peaks.
+    """
+    spectra = np.atleast_2d(np.asarray(intensity, dtype=np.float64))
+    fit = partial(
+        fit_spectrum,
+        wavenumber,
+        profile=profile,
+        min_prominence=min_prominence,
+        max_peaks=max_peaks,
+    )
+    if workers > 1 and len(spectra) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunksize = max(1, len(spectra) // (4 * workers))
+            tables = list(executor.map(fit, spectra, chunksize=chunksize))
+    else:
+        tables = [fit(spectrum) for spectrum in spectra]
+    spectrum_index = np.repeat(np.arange(len(tables)), [len(t) for t in tables])
+    table = np.concatenate([np.empty((0, len(PEAK_COLUMNS))), *tables])
+    return spectrum_index, table
+
+
+def fit_signature(wavenumber, intensity, **parameters) -> str:
+    """
+    Returns a hash of the spectra and the fit parameters, which identifies the
+    results of `fit_spectra`.
+    """
+    digest = hashlib.sha256(PEAKS_VERSION.encode())
+    digest.update(json.dumps(parameters, sort_keys=True).encode())
+    for values in (wavenumber, intensity):
+        array = np.ascontiguousarray(values, dtype=np.float64)
+        digest.update(str(array.shape).encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
@@ -0,0 +1,62 @@
+import numpy as np
+
+
+def minmax_downsample(x, y, max_points):
+    """
+    Reduces a curve to at most `max_points` points by keeping the minimum and the
+    maximum of `y` in each of `max_points // 2` buckets of consecutive points. Peaks
+    and spikes are preserved, unlike with decimation.
+
+    Args:
+        x (np.ndarray): The x values of the curve.
+        y (np.ndarray): The y values of the curve.
+        max_points (int): The largest number of points that is returned.
+
+    Returns:
+        tuple: The x and y values of the downsampled curve in their original order.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    n_buckets = max_points // 2
+    if y.size <= max_points or n_buckets < 1:
+        return x, y
+    edges = np.linspace(0, y.size, n_buckets + 1).astype(np.intp)
+    # All buckets are indexed with the width of the largest one and padded
+    indices = edges[:-1, None] + np.arange(np.diff(edges).max())
+    padding = indices >= edges[1:, None]
+    indices = np.minimum(indices, y.size - 1)
+    values = y[indices]
+    buckets = np.arange(n_buckets)
+    low = indices[buckets, np.where(padding, np.inf, values).argmin(axis=1)]
+    high = indices[buckets, np.where(padding, -np.inf, values).argmax(axis=1)]
+    keep = np.sort(np.stack([low, high], axis=1), axis=1).ravel()
+    return x[keep], y[keep]
+
+
+def spectrum_figure(
+    wavenumber, intensity, title='Raman Spectrum', max_points=2000
+) -> dict:
+    """
+    Builds a compact Plotly figure of a spectrum, downsampled with
+    `minmax_downsample` to at most `max_points` points.
+
+    Returns:
+        dict: The Plotly JSON of the figure.
+    """
+    x, y = minmax_downsample(wavenumber, intensity, max_points)
+    return {
+        'data': [
+            {
+                'type': 'scatter',
+                'mode': 'lines',
+                'x': x.tolist(),
+                'y': y.tolist(),
+                'showlegend': False,
+            }
+        ],
+        'layout': {
+            'title': {'text': title},
+            'xaxis': {'title': {'text': 'Wavenumber [1/cm]'}},
+            'yaxis': {'title': {'text': 'Intensity [a.u.]'}},
+        },
+    }
@@ -0,0 +1,275 @@
+"""
+Vectorized preprocessing of Raman spectra.
+
+All steps take the intensities as an array whose last axis is the spectral axis,
+i.e. a single spectrum or a whole map with one row per point, and process all
+spectra at once.
+"""
+
+import numpy as np
+
+# Scale of the median absolute deviation of normally distributed values
+MAD_SCALE = 0.6745
+# Number of spectra whose baselines are solved together, which bounds the memory of
+# the factorization
+ALS_CHUNK_SIZE = 2048
+
+BASELINE_METHODS = ('none', 'als', 'polynomial')
+NORMALIZATION_METHODS = ('none', 'max', 'area', 'snv')
+
+
+def _as_spectra(intensity):
+    """Returns the intensities as a float (n_spectra x n_values) array."""
+    intensity = np.asarray(intensity, dtype=np.float64)
+    return intensity.reshape(-1, intensity.shape[-1]) if intensity.ndim else intensity
+
+
+def spike_mask(intensity, threshold=7.0, width=3):
+    """
+    Flags cosmic-ray spikes by the modified z-score of the differences between
+    neighbouring values (Whitaker and Hayes). Both values next to an outlying
+    difference are flagged. The flanks of sharp Raman bands have outlying
+    differences as well, so a run of flagged values is only a spike if it rises
+    and falls and is not wider than a spike of `width` values.
+
+    Args:
+        intensity (np.ndarray): The spectra, with the spectral axis last.
+        threshold (float): The modified z-score above which a difference is a spike.
+        width (int): The largest number of values of a spike.
+
+    Returns:
+        np.ndarray: A boolean array of the shape of `intensity`.
+    """
+    spectra = _as_spectra(intensity)
+    differences = np.diff(spectra, axis=-1)
+    median = np.median(differences, axis=-1, keepdims=True)
+    mad = np.median(np.abs(differences - median), axis=-1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z_score = np.where(mad > 0, MAD_SCALE * (differences - median) / mad, 0.0)
+    # Every spectrum is padded with an unflagged value, so that runs of flagged
+    # values end with their spectrum and can be found in the flattened array
+    shape = (len(spectra), spectra.shape[-1] + 1)
+    rising = np.zeros(shape, dtype=bool)
+    rising[:, :-2] = z_score > threshold
+    falling = np.zeros(shape, dtype=bool)
+    falling[:, :-2] = z_score < -threshold
+    outliers = rising | falling
+    candidates = outliers.copy()
+    candidates[:, 1:] |= outliers[:, :-1]
+    edges = np.flatnonzero(np.diff(candidates.ravel().astype(np.int8), prepend=0))
+    mask = np.zeros(candidates.size + 1, dtype=np.int64)
+    if edges.size:
+        starts, ends = edges[::2], edges[1::2]
+        spikes = (
+            (ends - starts <= width + 2)
+            & (np.add.reduceat(rising.ravel(), edges)[::2] > 0)
+            & (np.add.reduceat(falling.ravel(), edges)[::2] > 0)
+        )
+        np.add.at(mask, starts[spikes], 1)
+        np.add.at(mask, ends[spikes], -1)
+    mask = np.cumsum(mask[:-1]).reshape(shape)[:, :-1] > 0
+    return mask.reshape(np.shape(intensity))
+
+
+def despike(intensity, threshold=7.0, width=3):
+    """
+    Replaces the values flagged by `spike_mask` with the median of the `width`
+    values on either side.
+    """
+    from scipy.ndimage import median_filter
+
+    spectra = _as_spectra(intensity)
+    mask = spike_mask(spectra, threshold, width)
+    if not mask.any():
+        return spectra.reshape(np.shape(intensity))
+    median = median_filter(spectra, size=(1, 2 * width + 1), mode='nearest')
+    return np.where(mask, median, spectra).reshape(np.shape(intensity))
+
+
+def solve_pentadiagonal(diagonal, first, second, rhs):
+    """
+    Solves symmetric positive definite pentadiagonal systems `A x = rhs` for many
+    right-hand sides at once by a banded Cholesky decomposition. The loop runs
+    over the values, every step is vectorized over the systems.
+
+    Args:
+        diagonal (np.ndarray): The main diagonals, (n_values x n_systems).
+        first (np.ndarray): The first off-diagonal, (n_values - 1) values that are
+            shared by all systems or (n_values - 1 x n_systems).
+        second (np.ndarray): The second off-diagonal, like `first`.
+        rhs (np.ndarray): The right-hand sides, (n_values x n_systems).
+
+    Returns:
+        np.ndarray: The solutions, (n_values x n_systems).
+    """
+    n_values, n_systems = diagonal.shape
+    first = np.broadcast_to(
+        np.reshape(first, (n_values - 1, -1)), (n_values - 1, n_systems)
+    )
+    second = np.broadcast_to(
+        np.reshape(second, (max(n_values - 2, 0), -1)),
+        (max(n_values - 2, 0), n_systems),
+    )
+    # The factor L has the diagonal g and the sub-diagonals h and k. The arrays are
+    # C-contiguous, so that every step works on contiguous rows.
+    g = np.array(diagonal, dtype=np.float64, order='C')
+    h = np.zeros((n_values, n_systems))
+    k = np.zeros((n_values, n_systems))
+    x = np.array(rhs, dtype=np.float64, order='C')
+    product = np.empty(n_systems)
+    for i in range(n_values):
+        if i >= 1:
+            g[i] -= np.multiply(h[i - 1], h[i - 1], out=product)
+            x[i] -= np.multiply(h[i - 1], x[i - 1], out=product)
+        if i >= 2:  # noqa: PLR2004
+            g[i] -= np.multiply(k[i - 2], k[i - 2], out=product)
+            x[i] -= np.multiply(k[i - 2], x[i - 2], out=product)
+        np.sqrt(g[i], out=g[i])
+        x[i] /= g[i]
+        if i + 1 < n_values:
+            h[i] = first[i]
+            if i >= 1:
+                h[i] -= np.multiply(k[i - 1], h[i - 1], out=product)
+            h[i] /= g[i]
+        if i + 2 < n_values:
+            np.divide(second[i], g[i], out=k[i])
+    for i in range(n_values - 1, -1, -1):
+        if i + 1 < n_values:
+            x[i] -= np.multiply(h[i], x[i + 1], out=product)
+        if i + 2 < n_values:
+            x[i] -= np.multiply(k[i], x[i + 2], out=product)
+        x[i] /= g[i]
+    return x
+
+
+def als_baseline(intensity, smoothness=1e5, asymmetry=0.01, n_iterations=10):
+    """
+    Estimates the baseline of spectra by asymmetric least squares (Eilers and
+    Boelens). The penalized systems of all spectra are solved together with
+    `solve_pentadiagonal`.
+
+    Args:
+        intensity (np.ndarray): The spectra, with the spectral axis last.
+        smoothness (float): The weight of the second-difference penalty.
+        asymmetry (float): The weight of values above the baseline.
+        n_iterations (int): The number of reweighting iterations.
+
+    Returns:
+        np.ndarray: The baselines, of the shape of `intensity`.
+    """
+    spectra = _as_spectra(intensity)
+    n_values = spectra.shape[-1]
+    if n_values < 3:  # noqa: PLR2004
+        return spectra.copy().reshape(np.shape(intensity))
+    # Diagonals of D'D for the second-difference matrix D
+    ones = np.ones(n_values - 2)
+    penalty = smoothness * np.convolve(ones, [1.0, 4.0, 1.0])
+    first = smoothness * np.convolve(ones, [-2.0, -2.0])
+    second = smoothness * ones
+    baselines = np.empty_like(spectra)
+    for start in range(0, len(spectra), ALS_CHUNK_SIZE):
+        values = np.ascontiguousarray(spectra[start : start + ALS_CHUNK_SIZE].T)
+        weights = np.ones_like(values)
+        for _ in range(n_iterations):
+            baseline = solve_pentadiagonal(
+                weights + penalty[:, None], first, second, weights * values
+            )
+            weights = np.where(values > baseline, asymmetry, 1.0 - asymmetry)
+        baselines[start : start + ALS_CHUNK_SIZE] = baseline.T
+    return baselines.reshape(np.shape(intensity))
+
+
+def polynomial_baseline(wavenumber, intensity, degree=3, n_iterations=20):
+    """
+    Estimates the baseline of spectra by iteratively fitting a polynomial and
+    clipping the spectra to it, so that peaks stop pulling the fit up. All spectra
+    are fitted at once with one pseudo-inverse of the Vandermonde matrix.
+    """
+    spectra = _as_spectra(intensity)
+    x = np.asarray(wavenumber, dtype=np.float64)
+    span = np.ptp(x) if x.size else 0.0
+    x = 2.0 * (x - x.min()) / span - 1.0 if span else np.zeros_like(x)
+    vandermonde = np.polynomial.polynomial.polyvander(x, degree)
+    pseudo_inverse = np.linalg.pinv(vandermonde)
+    clipped = spectra
+    for _ in range(n_iterations):
+        baseline = (clipped @ pseudo_inverse.T) @ vandermonde.T
+        clipped = np.minimum(clipped, baseline)
+    return baseline.reshape(np.shape(intensity))
+
+
+def smooth(intensity, window=9, order=3):
+    """
+    Smooths spectra with a Savitzky-Golay filter. Windows that are too short for
+    the order or longer than the spectra leave the spectra unchanged.
+    """
+    from scipy.signal import savgol_filter
+
+    spectra = _as_spectra(intensity)
+    window = window if window % 2 else window + 1
+    if window <= order or window > spectra.shape[-1]:
+        return spectra.reshape(np.shape(intensity))
+    return savgol_filter(spectra, window, order, axis=-1).reshape(np.shape(intensity))
+
+
+def normalize(wavenumber, intensity, method='max'):
+    """
+    Normalizes spectra to their largest absolute value (`max`), to the absolute
+    area under the spectrum (`area`) or to zero mean and unit variance (`snv`).
+    """
+    spectra = _as_spectra(intensity)
+    if method == 'snv':
+        spectra = spectra - spectra.mean(axis=-1, keepdims=True)
+        scale = spectra.std(axis=-1, keepdims=True)
+    elif method == 'area':
+        widths = np.abs(np.diff(np.asarray(wavenumber, dtype=np.float64)))
+        heights = np.abs(spectra[:, 1:] + spectra[:, :-1]) / 2.0
+        scale = (heights * widths).sum(axis=-1, keepdims=True)
+    elif method == 'max':
+        scale = np.abs(spectra).max(axis=-1, keepdims=True)
+    else:
+        return spectra.reshape(np.shape(intensity))
+    scale = np.where(scale > 0, scale, 1.0)
+    return (spectra / scale).reshape(np.shape(intensity))
+
+
+def preprocess(  # noqa: PLR0913
+    wavenumber,
+    intensity,
+    *,
+    despike_threshold=7.0,
+    despike_width=3,
+    baseline='als',
+    smoothness=1e5,
+    asymmetry=0.01,
+    n_iterations=10,
+    polynomial_degree=3,
+    smoothing_window=9,
+    smoothing_order=3,
+    normalization='none',
+):
+    """
+    Runs despiking, baseline subtraction, smoothing and normalization on spectra.
+    Steps are skipped with a `despike_threshold` or `smoothing_window` of 0 and a
+    `baseline` or `normalization` of `none`.
+
+    Args:
+        wavenumber (np.ndarray): The shared spectral axis.
+        intensity (np.ndarray): A spectrum or a map with one spectrum per row.
+
+    Returns:
+        np.ndarray: The processed spectra, of the shape of `intensity`.
+    """
+    spectra = _as_spectra(intensity)
+    if despike_threshold:
+        spectra = despike(spectra, despike_threshold, despike_width)
+    if baseline == 'als':
+        spectra = spectra - als_baseline(spectra, smoothness, asymmetry, n_iterations)
+    elif baseline == 'polynomial':
+        spectra = spectra - polynomial_baseline(
+            wavenumber, spectra, polynomial_degree, n_iterations
+        )
+    if smoothing_window:
+        spectra = smooth(spectra, smoothing_window, smoothing_order)
+    spectra = normalize(wavenumber, spectra, normalization)
+    return spectra.reshape(np.shape(intensity))
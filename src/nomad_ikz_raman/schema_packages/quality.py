@@ -0,0 +1,95 @@
+"""
+Quality metrics of measured Raman spectra.
+
+The metrics of a spectrum or of all spectra of a map are computed at once from the
+measured intensities, before any correction, so that saturated, noisy and spiked
+spectra can be found by their scalar metrics without reading the spectra.
+"""
+
+import numpy as np
+
+from .preprocessing import MAD_SCALE, spike_mask
+
+# Columns of a table of quality metrics
+QUALITY_COLUMNS = (
+    'snr',
+    'saturation_fraction',
+    'spike_count',
+    'dynamic_range',
+    'noise_floor',
+)
+QUALITY_FLAGS = ('saturated', 'low_snr', 'spikes')
+
+# Smallest number of values at the maximum of a spectrum that are a clipped, i.e.
+# saturated, range if no saturation level is given
+MIN_SATURATED_VALUES = 3
+
+
+def quality_metrics(intensity, saturation_level=None, spike_threshold=7.0, width=3):
+    """
+    Computes the quality metrics of spectra, see `QUALITY_COLUMNS`.
+
+    The noise floor is the standard deviation of the noise, estimated from the
+    median absolute deviation of the differences between neighbouring values, which
+    is insensitive to the bands. The SNR is the height of the maximum above the
+    median over the noise floor, the dynamic range the range of the values over the
+    noise floor. Values at or above `saturation_level` are saturated. Without a
+    level, the values at the maximum of a spectrum are saturated if there are at
+    least `MIN_SATURATED_VALUES` of them. Spikes are counted with `spike_mask`.
+
+    Args:
+        intensity (np.ndarray): The spectra, with the spectral axis last.
+        saturation_level (float): The intensity at which the detector saturates.
+        spike_threshold (float): See `spike_mask`.
+        width (int): See `spike_mask`.
+
+    Returns:
+        np.ndarray: The metrics, of the shape of `intensity` with the last axis
+        replaced by one column per metric.
+    """
+    n_values = np.shape(intensity)[-1]
+    spectra = np.asarray(intensity, dtype=np.float64).reshape(-1, n_values)
+    maximum = spectra.max(axis=-1)
+    minimum = spectra.min(axis=-1)
+    median = np.median(spectra, axis=-1)
+
+    differences = np.diff(spectra, axis=-1)
+    deviation = np.abs(differences - np.median(differences, axis=-1, keepdims=True))
+    # The differences of white noise have twice the variance of the noise
+    noise = np.median(deviation, axis=-1) / MAD_SCALE / np.sqrt(2.0)
+
+    ceiling = maximum
+    if saturation_level is not None:
+        ceiling = np.full_like(maximum, saturation_level)
+    saturated = np.count_nonzero(spectra >= ceiling[:, None], axis=-1)
+    if saturation_level is None:
+        saturated = np.where(saturated >= MIN_SATURATED_VALUES, saturated, 0)
+
+    mask = spike_mask(spectra, spike_threshold, width)
+    spikes = np.count_nonzero(mask[:, 1:] & ~mask[:, :-1], axis=-1) + mask[:, 0]
+
+    metrics = np.zeros((len(spectra), len(QUALITY_COLUMNS)))
+    np.divide(maximum - median, noise, out=metrics[:, 0], where=noise > 0)
+    metrics[:, 1] = saturated / n_values
+    metrics[:, 2] = spikes
+    np.divide(maximum - minimum, noise, out=metrics[:, 3], where=noise > 0)
+    metrics[:, 4] = noise
+    return metrics.reshape(*np.shape(intensity)[:-1], len(QUALITY_COLUMNS))
+
+
+def quality_flags(metrics, min_snr=10.0) -> np.ndarray:
+    """
+    Flags spectra by their metrics, see `QUALITY_FLAGS`.
+
+    Returns:
+        np.ndarray: A boolean array with one column per flag.
+    """
+    metrics = np.asarray(metrics)
+    return np.stack(
+        [
+            metrics[..., 1] > 0,
+            metrics[..., 0] < min_snr,
+            metrics[..., 2] > 0,
+        ],
+        axis=-1,
+    )
@@ -16,12 +16,17 @@
 # limitations under the License.
 #
 
-from typing import TYPE_CHECKING
+import hashlib
+import json
+import os
+from datetime import timedelta
+from functools import partial
+from typing import TYPE_CHECKING, Optional
 
 import numpy as np
-import plotly.express as px
 from nomad.config import config
 from nomad.datamodel.data import ArchiveSection, EntryData
+from nomad.datamodel.hdf5 import HDF5Reference
 from nomad.datamodel.metainfo.annotations import ELNAnnotation, SectionProperties
 from nomad.datamodel.metainfo.basesections import (
     CompositeSystemReference,
@@ -31,11 +36,48 @@ from nomad.datamodel.metainfo.basesections import (
     MeasurementResult,
 )
 from nomad.datamodel.metainfo.plot import PlotlyFigure, PlotSection
-from nomad.metainfo import Datetime, MEnum, Quantity, SchemaPackage, Section, SubSection
+from nomad.metainfo import (
+    Datetime,
+    MEnum,
+    MetainfoReferenceError,
+    Quantity,
+    Reference,
+    SchemaPackage,
+    Section,
+    SectionProxy,
+    SubSection,
+)
 
-from nomad_ikz_raman.schema_packages.utils import create_archive
+from nomad_ikz_raman.schema_packages.utils import (
+    create_archive,
+    load_processed_archive,
+    read_hdf5_dataset,
+    read_hdf5_shape,
+    resolve_reference,
+    write_hdf5_datasets,
+)
 
-from .raman_horiba_xml_reader import parse_raman_xml
+from .background import (
+    BACKGROUND_SCALINGS,
+    background_scales,
+    resampled_background,
+    subtract_background,
+)
+from .calibration import (
+    CALIBRATION_REFERENCES,
+    CalibrationStore,
+    apply_calibration,
+    calibration_key,
+    fit_calibration,
+    reference_lines,
+)
+from .parse_cache import ParseCache, hash_file
+from .peaks import PROFILES, fit_signature, fit_spectra
+from .plotting import spectrum_figure
+from .preprocessing import BASELINE_METHODS, NORMALIZATION_METHODS, preprocess
+from .quality import QUALITY_FLAGS, quality_flags, quality_metrics
+from .raman_horiba_xml_reader import READER_VERSION, parse_raman_xml
+from .stitching import detect_windows, stitch
 
 if TYPE_CHECKING:
     from nomad.datamodel.datamodel import EntryArchive
@@ -46,6 +88,73 @@ configuration = config.get_plugin_entry_point('nomad_ikz_raman.schema_packages:r
 
 m_package = SchemaPackage()
 
+# Version of the results derived from a data file, to be increased whenever the
+# schema or the processing changes them
+SCHEMA_VERSION = '3'
+# Properties of a measurement that are derived from its data file
+PROCESSED_PROPERTIES = (
+    'title',
+    'datetime',
+    'project',
+    'description',
+    'operator',
+    'location',
+    'method',
+    'samples',
+    'instruments',
+    'manual_settings',
+    'measurement_settings',
+    'wavenumber_calibration',
+    'results',
+    'map_results',
+)
+
+
+def read_data_file(file_path: str, file_hash: Optional[str] = None) -> dict:
+    """
+    Parses a Horiba XML file, through the parse cache if it is enabled. The hash
+    of the file content is computed by the cache unless it is given.
+    """
+    if not configuration.parse_cache:
+        return parse_raman_xml(file_path)
+    return ParseCache(
+        configuration.parse_cache_dir
+        or os.path.join(config.fs.tmp, 'nomad_ikz_raman_parse_cache'),
+        configuration.parse_cache_max_bytes,
+    ).parse(file_path, file_hash=file_hash)
+
+
+def calibration_store() -> Optional[CalibrationStore]:
+    """
+    Returns the store of the wavenumber calibrations of all instruments, or `None`
+    if no `calibration_dir` is configured. The calibrations must outlive the
+    processing, so there is no temporary default.
+    """
+    if not configuration.calibration_dir:
+        return None
+    return CalibrationStore(configuration.calibration_dir)
+
+
+def find_calibration(instrument, laser_wavelength, grating, when) -> Optional[dict]:
+    """
+    Returns the stored calibration of an instrument, laser (nm) and grating that is
+    valid at the datetime `when`, or `None`.
+    """
+    store = calibration_store()
+    if (
+        store is None
+        or not instrument
+        or laser_wavelength is None
+        or grating is None
+        or when is None
+    ):
+        return None
+    return store.find(
+        calibration_key(instrument, laser_wavelength, grating),
+        when.replace(tzinfo=None),
+        timedelta(hours=configuration.calibration_validity_hours),
+    )
+
 
 class Filters(ArchiveSection):
     """
@@ -270,388 +379,1867 @@ class MeasurementSettings(ArchiveSection):
     )
 
 
-class Results(MeasurementResult, PlotSection):
+class PreprocessingSettings(ArchiveSection):
     """
-    Class autogenerated from yaml schema.
+    Settings of the preprocessing of the measured spectra. The spectra are
+    despiked, baseline corrected, smoothed and normalized in this order.
     """
 
-    m_def = Section()
-    wavenumber = Quantity(
+    m_def = Section(a_eln=dict(overview=True))
+    despike_threshold = Quantity(
         type=np.float64,
-        description='Wavenumbers measured in 1/cm.',
-        # a_eln={'component': 'NumberEditQuantity'},
-        shape=['*'],
-        unit='1/cm',
-        a_eln={'defaultDisplayUnit': '1/cm'},
+        description='Modified z-score of neighbouring differences above which '
+        'values are replaced as cosmic-ray spikes. 0 disables despiking.',
+        default=7.0,
+        a_eln={'component': 'NumberEditQuantity'},
     )
-    intensity = Quantity(
+    despike_width = Quantity(
+        type=int,
+        description='Number of values on either side whose median replaces a spike.',
+        default=3,
+        a_eln={'component': 'NumberEditQuantity'},
+    )
+    baseline = Quantity(
+        type=MEnum(*BASELINE_METHODS),
+        description='Method of the baseline correction: asymmetric least squares '
+        '(als) or an iteratively clipped polynomial.',
+        default='als',
+        a_eln={'component': 'EnumEditQuantity'},
+    )
+    als_smoothness = Quantity(
         type=np.float64,
-        description='Intensity of the measured spectrum.',
-        # a_eln={'component': 'NumberEditQuantity'},
-        shape=['*'],
-        a_plot={'x': 'wavenumbers', 'y': 'intensity'},
+        description='Weight of the smoothness penalty of the als baseline.',
+        default=1e5,
+        a_eln={'component': 'NumberEditQuantity'},
     )
-
-
-class Sample(CompositeSystemReference):
-    m_def = Section(
-        a_eln=ELNAnnotation(
-            properties=SectionProperties(
-                order=[
-                    'name',
-                    'reference',
-                    'lab_id',
-                    'pointing_vector_direction',
-                    'crystallographic_direction_of_E_vector',
-                ],
-            ),
-            overview=True,
-        )
+    als_asymmetry = Quantity(
+        type=np.float64,
+        description='Weight of values above the als baseline.',
+        default=0.01,
+        a_eln={'component': 'NumberEditQuantity'},
     )
-    pointing_vector_direction = Quantity(
-        type=str,
-        description='Pointing vector referenced to surface normal in h k l, e.g. (100).',
-        a_eln={'component': 'StringEditQuantity'},
+    baseline_iterations = Quantity(
+        type=int,
+        description='Number of iterations of the baseline estimation.',
+        default=10,
+        a_eln={'component': 'NumberEditQuantity'},
     )
-    crystallographic_direction_of_E_vector = Quantity(
-        type=str,
-        description='E vector corresponding to crystallographic direction, e.g. {111}',
-        a_eln={'component': 'StringEditQuantity'},
+    polynomial_degree = Quantity(
+        type=int,
+        description='Degree of the polynomial baseline.',
+        default=3,
+        a_eln={'component': 'NumberEditQuantity'},
+    )
+    smoothing_window = Quantity(
+        type=int,
+        description='Number of values in the Savitzky-Golay window. 0 disables '
+        'smoothing.',
+        default=9,
+        a_eln={'component': 'NumberEditQuantity'},
+    )
+    smoothing_order = Quantity(
+        type=int,
+        description='Order of the Savitzky-Golay polynomial.',
+        default=3,
+        a_eln={'component': 'NumberEditQuantity'},
     )
+    normalization = Quantity(
+        type=MEnum(*NORMALIZATION_METHODS),
+        description='Normalization to the largest value, to the area or to zero '
+        'mean and unit variance (snv).',
+        default='none',
+        a_eln={'component': 'EnumEditQuantity'},
+    )
+
+    def apply(self, wavenumber, intensity):
+        """
+        Preprocesses a spectrum or all spectra of a map at once.
+        """
+        return preprocess(
+            wavenumber,
+            intensity,
+            despike_threshold=self.despike_threshold,
+            despike_width=self.despike_width,
+            baseline=self.baseline,
+            smoothness=self.als_smoothness,
+            asymmetry=self.als_asymmetry,
+            n_iterations=self.baseline_iterations,
+            polynomial_degree=self.polynomial_degree,
+            smoothing_window=self.smoothing_window,
+            smoothing_order=self.smoothing_order,
+            normalization=self.normalization,
+        )
+
+    def process_datasets(self, datasets: dict) -> None:
+        """
+        Adds the processed intensities of the spectrum and of the map, if any, to
+        the `datasets` of an entry, e.g. `/results/processed/intensity`.
+        """
+        for path in ['/results', '/map']:
+            if f'{path}/intensity' in datasets:
+                datasets[f'{path}/processed/intensity'] = self.apply(
+                    datasets['/wavenumber'], datasets[f'{path}/intensity']
+                )
 
 
-class RamanSpectrometer(Instrument, EntryData, ArchiveSection):
+class WavenumberCalibration(ArchiveSection):
     """
-    Class autogenerated from yaml schema.
+    Correction of the wavenumber axis fitted to a reference measurement. It holds
+    for the measurements with the same instrument, laser and grating within the
+    validity window around the time of the reference measurement.
     """
 
     m_def = Section()
-    instrument_name = Quantity(
-        type=str,
-        description='Name of the instrument used.',
-        default='LabRAM',
+    reference = Quantity(
+        type=MEnum(*CALIBRATION_REFERENCES),
+        description='Reference whose lines were measured.',
     )
-    lab_id = Quantity(
+    reference_data_file = Quantity(
         type=str,
-        description='Identifier for the instrument.',
-        default=-825368879,
-        label='serial_number',
+        description='Data file of the reference measurement.',
     )
-    detector = Quantity(
+    instrument_lab_id = Quantity(
         type=str,
-        description='Type of detector used.',
-        default='Andor CCD',
+        description='The lab_id of the instrument.',
     )
-    detector_id = Quantity(
+    laser_wavelength = Quantity(
+        type=np.float64,
+        description='Wavelength of the laser.',
+        unit='nm',
+    )
+    grating = Quantity(
         type=int,
-        description='Identifier for the detector.',
-        default=1859378131,
+        description='Grating in grooves per millimeter.',
     )
-    stage_xy = Quantity(
-        type=str,
-        description='XY stage model used.',
-        default='Marzhauser',
+    measured_at = Quantity(
+        type=Datetime,
+        description='Time of the reference measurement.',
     )
-    stage_z = Quantity(
-        type=str,
-        description='Z stage model used.',
-        default='Marzhauser',
+    coefficients = Quantity(
+        type=np.float64,
+        description='Coefficients of the polynomial correction that is added to the '
+        'wavenumbers, lowest degree first.',
+        shape=['*'],
+    )
+    reference_positions = Quantity(
+        type=np.float64,
+        description='Known positions of the matched reference lines.',
+        shape=['*'],
+        unit='1/cm',
+    )
+    measured_positions = Quantity(
+        type=np.float64,
+        description='Measured positions of the matched reference lines.',
+        shape=['*'],
+        unit='1/cm',
     )
 
-    def normalize(self, archive: 'EntryArchive', logger: 'BoundLogger') -> None:
-        """
-        The normalizer for the `RamanSpectrometer` class.
 
-        Args:
-            archive (EntryArchive): The archive containing the section that is being
-            normalized.
-            logger (BoundLogger): A structlog logger.
+class CalibrationSettings(ArchiveSection):
+    """
+    Marks a measurement as a reference measurement of the wavenumber calibration.
+    """
+
+    m_def = Section(a_eln=dict(overview=True))
+    reference = Quantity(
+        type=MEnum(*CALIBRATION_REFERENCES),
+        description='Reference whose lines are measured, silicon (520.7 1/cm) or a '
+        'neon lamp.',
+        default='silicon',
+        a_eln={'component': 'EnumEditQuantity'},
+    )
+    degree = Quantity(
+        type=int,
+        description='Degree of the polynomial correction, lowered to the number of '
+        'matched lines minus one.',
+        default=1,
+        a_eln={'component': 'NumberEditQuantity'},
+    )
+
+    def fit(
+        self, wavenumber, intensity, laser_wavelength
+    ) -> Optional[WavenumberCalibration]:
         """
-        super().normalize(archive, logger)
+        Fits the correction of the axis to the reference spectrum, see
+        `fit_calibration`. Returns `None` if no reference line is found.
+        """
+        try:
+            lines = reference_lines(self.reference, laser_wavelength)
+            coefficients, lines, measured = fit_calibration(
+                wavenumber, intensity, lines, self.degree
+            )
+        except ValueError:
+            return None
+        return WavenumberCalibration(
+            reference=self.reference,
+            coefficients=coefficients,
+            reference_positions=lines,
+            measured_positions=measured,
+        )
 
 
-class RamanSpectrometerReference(InstrumentReference):
+class BackgroundSettings(ArchiveSection):
     """
-    Class autogenerated from yaml schema.
+    Subtraction of the spectrum of another measurement, e.g. of the substrate, as
+    background. The reference is resampled onto the wavenumbers of the
+    measurement and scaled before it is subtracted from the spectrum and from
+    every point of the map.
     """
 
-    m_def = Section()
+    m_def = Section(a_eln=dict(overview=True))
     reference = Quantity(
-        type=RamanSpectrometer,
-        a_eln={'component': 'ReferenceEditQuantity', 'label': 'raman_spectrometer'},
+        type=Reference(SectionProxy('Ramanspectroscopy')),
+        description='The measurement of the background, whose measured spectrum is '
+        'subtracted.',
+        a_eln={'component': 'ReferenceEditQuantity'},
+    )
+    scaling = Quantity(
+        type=MEnum(*BACKGROUND_SCALINGS),
+        description='Scaling of the background by the ratio of the exposures '
+        '(acquisition time times accumulations), by the least squares factor of '
+        'every spectrum, or not at all.',
+        default='exposure',
+        a_eln={'component': 'EnumEditQuantity'},
     )
 
-    def normalize(self, archive: 'EntryArchive', logger: 'BoundLogger') -> None:
+    def loaded_reference(self) -> Optional['Ramanspectroscopy']:
         """
-        The normalizer for the `RamanSpectrometerReference` class.
+        Returns the reference if its entry can be loaded and has results, otherwise
+        `None`.
+        """
+        try:
+            reference = self.reference
+            if reference is None or not reference.results:
+                return None
+        except MetainfoReferenceError:
+            return None
+        return reference
 
-        Args:
-            archive (EntryArchive): The archive containing the section that is being
-            normalized.
-            logger (BoundLogger): A structlog logger.
+    @staticmethod
+    def reference_archive(
+        reference: 'Ramanspectroscopy', archive: 'Optional[EntryArchive]' = None
+    ) -> 'Optional[EntryArchive]':
         """
-        super().normalize(archive, logger)
+        Returns the archive of the entry of the reference, whose context resolves
+        its HDF5 files, or `archive` for a reference that is not in an archive.
+        """
+        root = reference.m_root()
+        return root if getattr(root, 'm_context', None) is not None else archive
 
+    def reference_version(self) -> Optional[str]:
+        """
+        Returns the hash of the processing stamp of the reference or, without a
+        stamp, of its spectrum, or `None` while the reference has no results.
+        """
+        reference = self.loaded_reference()
+        if reference is None:
+            return None
+        digest = hashlib.sha256()
+        if reference.processing_stamp is not None:
+            stamp = reference.processing_stamp.m_to_dict()
+            digest.update(json.dumps(stamp, sort_keys=True).encode())
+        else:
+            for array in reference.results[0].get_spectra(
+                self.reference_archive(reference)
+            ):
+                digest.update(np.ascontiguousarray(array, dtype=np.float64).tobytes())
+        return digest.hexdigest()
 
-class Ramanspectroscopy(Measurement, PlotSection, EntryData, ArchiveSection):
+    def reference_key(self) -> Optional[str]:
+        """
+        Identifies the reference and its spectrum, by the reference to its entry or
+        by the data file of a reference that is not in an archive and by
+        `reference_version`. The key changes when the reference is processed again,
+        so that measurements and resampled references derived from it are stale.
+        """
+        reference = self.reference
+        if reference is None:
+            return None
+        key = getattr(reference, 'm_proxy_value', None)
+        if not isinstance(key, str):
+            key = reference.data_file
+        return f'{key}@{self.reference_version()}'
+
+    def load(self, archive: 'Optional[EntryArchive]') -> Optional[tuple]:
+        """
+        Returns the wavenumbers, the measured spectrum and the exposure of the
+        reference, or `None` if the reference cannot be loaded or has no results
+        yet. HDF5 files are read through the archive of the reference.
+        """
+        reference = self.loaded_reference()
+        if reference is None:
+            return None
+        wavenumber, intensity = reference.results[0].get_spectra(
+            self.reference_archive(reference, archive)
+        )
+        settings = reference.measurement_settings
+        exposure = None
+        if settings is not None and settings.acquisition_time is not None:
+            exposure = settings.acquisition_time.to('second').magnitude * (
+                settings.accumulations or 1
+            )
+        return wavenumber, intensity, exposure
+
+
+class PeakTable(ArchiveSection):
     """
-    Class autogenerated from yaml schema.
+    The fitted peaks of a spectrum or of all spectra of a map, one entry per peak.
     """
 
-    m_def = Section(
-        a_eln=ELNAnnotation(
-            properties=SectionProperties(
-                order=[
-                    'name',
-                    'datetime',
-                    'title',
-                    'lab_id',
-                    'data_file',
-                    'project',
-                    'operator',
-                    'location',
-                    'method',
-                    'description',
-                ],
-            )
-        ),
-        a_template={
-            'manualsettings': {},
-        },
-    )
-    datetime = Quantity(
-        type=Datetime,
-        description='Start time of Raman measurement',
-        a_eln={'component': 'DateTimeEditQuantity'},
-    )
-    title = Quantity(
+    m_def = Section()
+    profile = Quantity(
         type=str,
-        description='Title of the experiment.',
-        a_eln={'component': 'StringEditQuantity'},
+        description='Profile of the fitted peaks.',
     )
-    project = Quantity(
+    fit_signature = Quantity(
         type=str,
-        description='Project under which the experiment was conducted.',
-        a_eln={'component': 'StringEditQuantity'},
+        description='Hash of the fitted spectra and the fit settings. The peaks are '
+        'only fitted again if it changes.',
     )
-    operator = Quantity(
-        type=str,
-        description='Operator who conducted the experiment.',
-        a_eln={'component': 'StringEditQuantity'},
+    n_peaks = Quantity(
+        type=int,
+        description='Number of fitted peaks.',
     )
-    location = Quantity(
-        type=str,
-        description='Site where the experiment was conducted.',
-        default='IKZ Berlin',
-        a_eln={'component': 'StringEditQuantity'},
+    spectrum_index = Quantity(
+        type=np.int64,
+        description='Index of the spectrum of each peak, i.e. the point of a map.',
+        shape=['n_peaks'],
     )
-    method = Quantity(
-        type=str,
-        description='Method used for the experiment.',
-        default='Raman',
+    position = Quantity(
+        type=np.float64,
+        description='Position of each peak.',
+        shape=['n_peaks'],
+        unit='1/cm',
     )
-
-    data_file = Quantity(
-        type=str,
-        description='Data file *.xml containing the Raman data.',
-        a_eln={'component': 'FileEditQuantity'},
+    fwhm = Quantity(
+        type=np.float64,
+        description='Full width at half maximum of each peak.',
+        shape=['n_peaks'],
+        unit='1/cm',
     )
-    samples = SubSection(section_def=Sample)
-    instruments = SubSection(
-        section_def=RamanSpectrometerReference,
+    height = Quantity(
+        type=np.float64,
+        description='Height of each peak above the background.',
+        shape=['n_peaks'],
     )
-    manual_settings = SubSection(
-        section_def=ManualSettings,
+    area = Quantity(
+        type=np.float64,
+        description='Area of each peak.',
+        shape=['n_peaks'],
     )
-    measurement_settings = SubSection(
-        section_def=MeasurementSettings,
+    main_peak_position = Quantity(
+        type=np.float64,
+        description='Position of the highest peak. For maps, the median over all '
+        'spectra.',
+        unit='1/cm',
     )
-    results = SubSection(
-        section_def=Results,
-        repeats=True,
-        base_sections=['nomad.datamodel.metainfo.basesections.Instrument'],
-        quantities={
-            'ramanspectrometer': {
-                'type': '#/RamanSpectrometer',
-                'm_annotations': {'eln': {'component': 'ReferenceEditQuantity'}},
-            }
-        },
+    main_peak_fwhm = Quantity(
+        type=np.float64,
+        description='Full width at half maximum of the highest peak. For maps, the '
+        'median over all spectra.',
+        unit='1/cm',
+    )
+
+
+class PeakFitSettings(ArchiveSection):
+    """
+    Settings of the detection and fitting of peaks in the spectra. The processed
+    spectra are fitted if the measurement is preprocessed.
+    """
+
+    m_def = Section(a_eln=dict(overview=True))
+    profile = Quantity(
+        type=MEnum(*PROFILES),
+        description='Profile of the fitted peaks.',
+        default='lorentzian',
+        a_eln={'component': 'EnumEditQuantity'},
+    )
+    min_prominence = Quantity(
+        type=np.float64,
+        description='Smallest prominence of a peak relative to the intensity range '
+        'of its spectrum.',
+        default=0.05,
+        a_eln={'component': 'NumberEditQuantity'},
+    )
+    max_peaks = Quantity(
+        type=int,
+        description='Largest number of peaks fitted per spectrum.',
+        default=10,
+        a_eln={'component': 'NumberEditQuantity'},
+    )
+
+    def fit(
+        self, wavenumber, intensity, previous: Optional['PeakTable'] = None
+    ) -> PeakTable:
+        """
+        Fits the peaks of a spectrum or of all spectra of a map. The `previous`
+        peak table is returned as is if it was fitted with the same spectra and
+        settings.
+        """
+        parameters = dict(
+            profile=self.profile,
+            min_prominence=self.min_prominence,
+            max_peaks=self.max_peaks,
+        )
+        signature = fit_signature(wavenumber, intensity, **parameters)
+        if previous is not None and previous.fit_signature == signature:
+            return previous.m_copy(deep=True)
+        spectrum_index, table = fit_spectra(
+            wavenumber,
+            intensity,
+            **parameters,
+            workers=configuration.peak_fit_workers,
+        )
+        peaks = PeakTable(
+            profile=self.profile,
+            fit_signature=signature,
+            n_peaks=len(table),
+            spectrum_index=spectrum_index,
+            position=table[:, 0],
+            fwhm=table[:, 1],
+            height=table[:, 2],
+            area=table[:, 3],
+        )
+        if len(table):
+            # The highest peak of every spectrum
+            order = np.argsort(-table[:, 2], kind='stable')
+            _, first = np.unique(spectrum_index[order], return_index=True)
+            main_peaks = table[order[first]]
+            peaks.main_peak_position = np.median(main_peaks[:, 0])
+            peaks.main_peak_fwhm = np.median(main_peaks[:, 1])
+        return peaks
+
+
+class SpectrumStorage(ArchiveSection):
+    """
+    Holds the `wavenumber` and `intensity` arrays of a section either inline or as
+    references into an HDF5 file, together with summary statistics of the arrays.
+    """
+
+    wavenumber_hdf5 = Quantity(
+        type=HDF5Reference,
+        description='Reference to the wavenumbers in the HDF5 file of the entry.',
+    )
+    intensity_hdf5 = Quantity(
+        type=HDF5Reference,
+        description='Reference to the intensities in the HDF5 file of the entry.',
+    )
+    wavenumber_min = Quantity(
+        type=np.float64,
+        description='Smallest measured wavenumber.',
+        unit='1/cm',
+    )
+    wavenumber_max = Quantity(
+        type=np.float64,
+        description='Largest measured wavenumber.',
+        unit='1/cm',
+    )
+    intensity_min = Quantity(
+        type=np.float64,
+        description='Smallest measured intensity.',
+    )
+    intensity_max = Quantity(
+        type=np.float64,
+        description='Largest measured intensity.',
+    )
+    intensity_mean = Quantity(
+        type=np.float64,
+        description='Mean of the measured intensities.',
+    )
+
+    def set_spectra(
+        self, wavenumber, intensity, wavenumber_hdf5=None, intensity_hdf5=None
+    ) -> None:
+        """
+        Sets the arrays and their summary statistics. If HDF5 references are given,
+        the arrays are only referenced and not stored inline.
+        """
+        if len(wavenumber):
+            self.wavenumber_min = np.min(wavenumber)
+            self.wavenumber_max = np.max(wavenumber)
+        if np.size(intensity):
+            self.intensity_min = np.min(intensity)
+            self.intensity_max = np.max(intensity)
+            self.intensity_mean = np.mean(intensity)
+        self.wavenumber_hdf5 = wavenumber_hdf5
+        self.intensity_hdf5 = intensity_hdf5
+        self.wavenumber = wavenumber if wavenumber_hdf5 is None else None
+        self.intensity = intensity if intensity_hdf5 is None else None
+
+    def get_spectra(self, archive: 'EntryArchive', selection=()) -> tuple:
+        """
+        Returns the wavenumbers and the intensities, or a slice of the intensities,
+        as NumPy arrays. Arrays stored in HDF5 are read lazily from the file.
+        """
+        if self.wavenumber_hdf5 is not None:
+            wavenumber = read_hdf5_dataset(archive, self.wavenumber_hdf5)
+        else:
+            wavenumber = getattr(self.wavenumber, 'magnitude', self.wavenumber)
+        if self.intensity_hdf5 is not None:
+            intensity = read_hdf5_dataset(archive, self.intensity_hdf5, selection)
+        else:
+            intensity = np.asarray(self.intensity)[selection]
+        return np.asarray(wavenumber), np.asarray(intensity)
+
+    def get_n_spectra(self, archive: 'EntryArchive') -> int:
+        """
+        Returns the number of spectra, i.e. the rows of the intensities, without
+        reading intensities stored in HDF5.
+        """
+        if self.intensity_hdf5 is not None:
+            shape = read_hdf5_shape(archive, self.intensity_hdf5)
+        else:
+            shape = np.shape(self.intensity)
+        return shape[0] if len(shape) > 1 else 1
+
+
+class ProcessedSpectrum(SpectrumStorage):
+    """
+    The measured spectrum after the preprocessing of the measurement.
+    """
+
+    m_def = Section()
+    wavenumber = Quantity(
+        type=np.float64,
+        description='Wavenumbers of the processed spectrum.',
+        shape=['*'],
+        unit='1/cm',
+        a_eln={'defaultDisplayUnit': '1/cm'},
+    )
+    intensity = Quantity(
+        type=np.float64,
+        description='Intensity of the processed spectrum.',
+        shape=['*'],
+    )
+
+
+class ProcessedMap(SpectrumStorage):
+    """
+    The spectra of a map after the preprocessing of the measurement.
+    """
+
+    m_def = Section()
+    wavenumber = Quantity(
+        type=np.float64,
+        description='Wavenumbers shared by the processed spectra.',
+        shape=['*'],
+        unit='1/cm',
+        a_eln={'defaultDisplayUnit': '1/cm'},
+    )
+    intensity = Quantity(
+        type=np.float64,
+        description='Processed intensities, one row per point of the map.',
+        shape=['*', '*'],
+    )
+
+
+class QualityMetrics(ArchiveSection):
+    """
+    Quality metrics of the measured spectrum, see `quality_metrics`.
+    """
+
+    m_def = Section()
+    snr = Quantity(
+        type=np.float64,
+        description='Height of the maximum above the median over the noise floor.',
+    )
+    saturation_fraction = Quantity(
+        type=np.float64,
+        description='Fraction of the values at the saturation level of the detector '
+        'or in a clipped range at the maximum.',
+    )
+    spike_count = Quantity(
+        type=int,
+        description='Number of cosmic-ray spikes.',
+    )
+    dynamic_range = Quantity(
+        type=np.float64,
+        description='Range of the intensities over the noise floor.',
+    )
+    noise_floor = Quantity(
+        type=np.float64,
+        description='Standard deviation of the noise.',
+    )
+    flags = Quantity(
+        type=MEnum(*QUALITY_FLAGS),
+        description='Problems of the spectrum: saturated values, an SNR below '
+        '`min_snr` of the plugin or spikes.',
+        shape=['*'],
+    )
+
+
+class MapQualityMetrics(ArchiveSection):
+    """
+    Quality metrics of every point of a map and their summary, see
+    `QualityMetrics`.
+    """
+
+    m_def = Section()
+    snr = Quantity(
+        type=np.float64,
+        description='SNR of each point.',
+        shape=['*'],
+    )
+    saturation_fraction = Quantity(
+        type=np.float64,
+        description='Fraction of saturated values of each point.',
+        shape=['*'],
+    )
+    spike_count = Quantity(
+        type=np.int64,
+        description='Number of spikes of each point.',
+        shape=['*'],
+    )
+    dynamic_range = Quantity(
+        type=np.float64,
+        description='Dynamic range of each point.',
+        shape=['*'],
+    )
+    noise_floor = Quantity(
+        type=np.float64,
+        description='Noise floor of each point.',
+        shape=['*'],
+    )
+    median_snr = Quantity(
+        type=np.float64,
+        description='Median of the SNR of the points.',
+    )
+    min_snr = Quantity(
+        type=np.float64,
+        description='Lowest SNR of the points.',
+    )
+    max_saturation_fraction = Quantity(
+        type=np.float64,
+        description='Largest fraction of saturated values of the points.',
+    )
+    total_spike_count = Quantity(
+        type=int,
+        description='Number of spikes of all points.',
+    )
+    n_flagged = Quantity(
+        type=int,
+        description='Number of points with at least one flag.',
+    )
+    flags = Quantity(
+        type=MEnum(*QUALITY_FLAGS),
+        description='Problems of at least one point, see `QualityMetrics.flags`.',
+        shape=['*'],
+    )
+
+
+class SpectralWindow(ArchiveSection):
+    """
+    One window of a multi-window (extended range) acquisition, which was stitched
+    with the other windows into one spectrum.
+    """
+
+    m_def = Section()
+    wavenumber_start = Quantity(
+        type=np.float64,
+        description='Lowest wavenumber of the window.',
+        unit='1/cm',
+    )
+    wavenumber_end = Quantity(
+        type=np.float64,
+        description='Highest wavenumber of the window.',
+        unit='1/cm',
+    )
+    n_points = Quantity(
+        type=int,
+        description='Number of points of the window.',
+    )
+    overlap = Quantity(
+        type=np.float64,
+        description='Width of the overlap with the preceding windows.',
+        unit='1/cm',
+    )
+    scale = Quantity(
+        type=np.float64,
+        description='Factor by which the intensities of the window were scaled to '
+        'match the preceding windows in the overlap.',
+    )
+
+
+class Results(MeasurementResult, PlotSection, SpectrumStorage):
+    """
+    Class autogenerated from yaml schema.
+    """
+
+    m_def = Section()
+    wavenumber = Quantity(
+        type=np.float64,
+        description='Wavenumbers measured in 1/cm.',
+        # a_eln={'component': 'NumberEditQuantity'},
+        shape=['*'],
+        unit='1/cm',
+        a_eln={'defaultDisplayUnit': '1/cm'},
+    )
+    intensity = Quantity(
+        type=np.float64,
+        description='Intensity of the measured spectrum.',
+        # a_eln={'component': 'NumberEditQuantity'},
+        shape=['*'],
+        a_plot={'x': 'wavenumbers', 'y': 'intensity'},
+    )
+    processed = SubSection(section_def=ProcessedSpectrum)
+    peaks = SubSection(section_def=PeakTable)
+    windows = SubSection(
+        section_def=SpectralWindow,
+        repeats=True,
+        description='The windows of a multi-window acquisition, ordered by '
+        'wavenumber. Empty for single-window acquisitions.',
+    )
+    background_scale = Quantity(
+        type=np.float64,
+        description='Factor of the background that was subtracted, see '
+        '`BackgroundSettings`.',
+    )
+    quality = SubSection(section_def=QualityMetrics)
+
+
+class MapResults(MeasurementResult, SpectrumStorage):
+    """
+    Spectra of a map measurement on a shared wavenumber axis.
+    """
+
+    m_def = Section()
+    n_points = Quantity(
+        type=int,
+        description='Number of measured points of the map.',
+    )
+    wavenumber = Quantity(
+        type=np.float64,
+        description='Wavenumbers shared by all spectra of the map.',
+        shape=['*'],
+        unit='1/cm',
+        a_eln={'defaultDisplayUnit': '1/cm'},
+    )
+    intensity = Quantity(
+        type=np.float64,
+        description='Intensities of the map, one row per point and one column per '
+        'wavenumber.',
+        shape=['n_points', '*'],
+    )
+    row_index = Quantity(
+        type=np.int64,
+        description='Index of the `LSX_Row` holding the spectrum of each point.',
+        shape=['n_points'],
+    )
+    x = Quantity(
+        type=np.float64,
+        description='X-coordinate position of each point.',
+        shape=['n_points'],
+        unit='µm',
+        a_eln={'defaultDisplayUnit': 'µm'},
+    )
+    y = Quantity(
+        type=np.float64,
+        description='Y-coordinate position of each point.',
+        shape=['n_points'],
+        unit='µm',
+        a_eln={'defaultDisplayUnit': 'µm'},
+    )
+    z = Quantity(
+        type=np.float64,
+        description='Z-coordinate position of each point.',
+        shape=['n_points'],
+        unit='µm',
+        a_eln={'defaultDisplayUnit': 'µm'},
+    )
+    window_scales = Quantity(
+        type=np.float64,
+        description='Factors by which the intensities of the windows of a '
+        'multi-window acquisition were scaled, one row per point and one column per '
+        'window, see `Results.windows`.',
+        shape=['n_points', '*'],
+    )
+    background_scales = Quantity(
+        type=np.float64,
+        description='Factor of the background that was subtracted from each point.',
+        shape=['n_points'],
+    )
+    quality = SubSection(section_def=MapQualityMetrics)
+    processed = SubSection(section_def=ProcessedMap)
+    peaks = SubSection(section_def=PeakTable)
+
+
+class Sample(CompositeSystemReference):
+    m_def = Section(
+        a_eln=ELNAnnotation(
+            properties=SectionProperties(
+                order=[
+                    'name',
+                    'reference',
+                    'lab_id',
+                    'pointing_vector_direction',
+                    'crystallographic_direction_of_E_vector',
+                ],
+            ),
+            overview=True,
+        )
+    )
+    pointing_vector_direction = Quantity(
+        type=str,
+        description='Pointing vector referenced to surface normal in h k l, e.g. (100).',
+        a_eln={'component': 'StringEditQuantity'},
+    )
+    crystallographic_direction_of_E_vector = Quantity(
+        type=str,
+        description='E vector corresponding to crystallographic direction, e.g. {111}',
+        a_eln={'component': 'StringEditQuantity'},
+    )
+
+
+class RamanSpectrometer(Instrument, EntryData, ArchiveSection):
+    """
+    Class autogenerated from yaml schema.
+    """
+
+    m_def = Section()
+    instrument_name = Quantity(
+        type=str,
+        description='Name of the instrument used.',
+        default='LabRAM',
+    )
+    lab_id = Quantity(
+        type=str,
+        description='Identifier for the instrument.',
+        default=-825368879,
+        label='serial_number',
+    )
+    detector = Quantity(
+        type=str,
+        description='Type of detector used.',
+        default='Andor CCD',
+    )
+    detector_id = Quantity(
+        type=int,
+        description='Identifier for the detector.',
+        default=1859378131,
+    )
+    stage_xy = Quantity(
+        type=str,
+        description='XY stage model used.',
+        default='Marzhauser',
+    )
+    stage_z = Quantity(
+        type=str,
+        description='Z stage model used.',
+        default='Marzhauser',
+    )
+
+    def normalize(self, archive: 'EntryArchive', logger: 'BoundLogger') -> None:
+        """
+        The normalizer for the `RamanSpectrometer` class.
+
+        Args:
+            archive (EntryArchive): The archive containing the section that is being
+            normalized.
+            logger (BoundLogger): A structlog logger.
+        """
+        super().normalize(archive, logger)
+
+
+class RamanSpectrometerReference(InstrumentReference):
+    """
+    Class autogenerated from yaml schema.
+    """
+
+    m_def = Section()
+    reference = Quantity(
+        type=RamanSpectrometer,
+        a_eln={'component': 'ReferenceEditQuantity', 'label': 'raman_spectrometer'},
     )
 
     def normalize(self, archive: 'EntryArchive', logger: 'BoundLogger') -> None:
         """
-        The normalizer for the `Ramanspectroscopy` class.
+        The normalizer for the `RamanSpectrometerReference` class.
+
+        Args:
+            archive (EntryArchive): The archive containing the section that is being
+            normalized.
+            logger (BoundLogger): A structlog logger.
+        """
+        super().normalize(archive, logger)
+
+
+class SpectralDescriptors(ArchiveSection):
+    """
+    Scalar summary of a measurement, written during normalization so that entries
+    can be searched by their settings and spectra without opening the archives.
+    """
+
+    m_def = Section()
+    sample_lab_id = Quantity(
+        type=str,
+        description='The lab_id of the first measured sample.',
+    )
+    instrument_lab_id = Quantity(
+        type=str,
+        description='The lab_id of the spectrometer.',
+    )
+    laser_wavelength = Quantity(
+        type=np.float64,
+        description='Wavelength of the excitation laser.',
+        unit='nanometer',
+    )
+    grating = Quantity(
+        type=int,
+        description='Grating in grooves per mm.',
+    )
+    objective = Quantity(
+        type=str,
+        description='Objective of the microscope.',
+    )
+    acquisition_time = Quantity(
+        type=np.float64,
+        description='Acquisition time of one accumulation.',
+        unit='second',
+    )
+    accumulations = Quantity(
+        type=int,
+        description='Number of accumulations.',
+    )
+    wavenumber_min = Quantity(
+        type=np.float64,
+        description='Lower end of the spectral range.',
+        unit='1/cm',
+    )
+    wavenumber_max = Quantity(
+        type=np.float64,
+        description='Upper end of the spectral range.',
+        unit='1/cm',
+    )
+    n_spectra = Quantity(
+        type=int,
+        description='Number of spectra, i.e. the points of a map or 1.',
+    )
+    main_peak_position = Quantity(
+        type=np.float64,
+        description='Position of the highest peak. Taken from the peak fit if the '
+        'peaks are fitted, otherwise the wavenumber of the highest intensity of the '
+        '(processed) spectrum.',
+        unit='1/cm',
+    )
+    main_peak_fwhm = Quantity(
+        type=np.float64,
+        description='Full width at half maximum of the highest peak, if the peaks '
+        'are fitted.',
+        unit='1/cm',
+    )
+    snr = Quantity(
+        type=np.float64,
+        description='SNR of the spectrum, the median SNR of the points of a map.',
+    )
+    saturation_fraction = Quantity(
+        type=np.float64,
+        description='Fraction of saturated values of the spectrum, the largest '
+        'fraction of the points of a map.',
+    )
+    spike_count = Quantity(
+        type=int,
+        description='Number of spikes of the spectrum or of all points of a map.',
+    )
+    quality_flags = Quantity(
+        type=MEnum(*QUALITY_FLAGS),
+        description='Problems of the spectrum or of at least one point of a map.',
+        shape=['*'],
+    )
+
+
+class ProcessingStamp(ArchiveSection):
+    """
+    Identifies the inputs and the code that the results of a measurement were
+    derived from, so that unchanged measurements are not processed again.
+    """
+
+    m_def = Section()
+    data_file_hash = Quantity(
+        type=str,
+        description='SHA-256 hash of the content of the data file.',
+    )
+    settings_hash = Quantity(
+        type=str,
+        description='SHA-256 hash of the preprocessing, peak fit and storage settings.',
+    )
+    reader_version = Quantity(
+        type=str,
+        description='Version of the reader of the data file.',
+    )
+    schema_version = Quantity(
+        type=str,
+        description='Version of the schema and the processing of the results.',
+    )
+
+    def matches(self, other: 'ProcessingStamp', settings: bool = True) -> bool:
+        """
+        Whether both stamps have the same data file and versions and, if `settings`
+        is set, the same settings.
+        """
+        names = ['data_file_hash', 'reader_version', 'schema_version']
+        if settings:
+            names.append('settings_hash')
+        return all(getattr(self, name) == getattr(other, name) for name in names)
+
+
+class Ramanspectroscopy(Measurement, PlotSection, EntryData, ArchiveSection):
+    """
+    Class autogenerated from yaml schema.
+    """
+
+    m_def = Section(
+        a_eln=ELNAnnotation(
+            properties=SectionProperties(
+                order=[
+                    'name',
+                    'datetime',
+                    'title',
+                    'lab_id',
+                    'data_file',
+                    'project',
+                    'operator',
+                    'location',
+                    'method',
+                    'description',
+                ],
+            )
+        ),
+        a_template={
+            'manualsettings': {},
+        },
+    )
+    datetime = Quantity(
+        type=Datetime,
+        description='Start time of Raman measurement',
+        a_eln={'component': 'DateTimeEditQuantity'},
+    )
+    title = Quantity(
+        type=str,
+        description='Title of the experiment.',
+        a_eln={'component': 'StringEditQuantity'},
+    )
+    project = Quantity(
+        type=str,
+        description='Project under which the experiment was conducted.',
+        a_eln={'component': 'StringEditQuantity'},
+    )
+    operator = Quantity(
+        type=str,
+        description='Operator who conducted the experiment.',
+        a_eln={'component': 'StringEditQuantity'},
+    )
+    location = Quantity(
+        type=str,
+        description='Site where the experiment was conducted.',
+        default='IKZ Berlin',
+        a_eln={'component': 'StringEditQuantity'},
+    )
+    method = Quantity(
+        type=str,
+        description='Method used for the experiment.',
+        default='Raman',
+    )
+
+    data_file = Quantity(
+        type=str,
+        description='Data file *.xml containing the Raman data.',
+        a_eln={'component': 'FileEditQuantity'},
+    )
+    hdf5_storage = Quantity(
+        type=bool,
+        description='Whether the spectra are stored in an HDF5 file next to the data '
+        'file instead of inline in the archive. Defaults to the plugin '
+        'configuration.',
+        a_eln={'component': 'BoolEditQuantity'},
+    )
+    samples = SubSection(section_def=Sample)
+    instruments = SubSection(
+        section_def=RamanSpectrometerReference,
+    )
+    manual_settings = SubSection(
+        section_def=ManualSettings,
+    )
+    measurement_settings = SubSection(
+        section_def=MeasurementSettings,
+    )
+    preprocessing_settings = SubSection(
+        section_def=PreprocessingSettings,
+        description='Preprocessing of the spectra. The spectra are only processed '
+        'if this section is present.',
+    )
+    peak_fit_settings = SubSection(
+        section_def=PeakFitSettings,
+        description='Fitting of the peaks of the spectra. The peaks are only fitted '
+        'if this section is present.',
+    )
+    calibration_settings = SubSection(
+        section_def=CalibrationSettings,
+        description='Makes the measurement a reference measurement, whose correction '
+        'of the wavenumbers is applied to the measurements with the same instrument, '
+        'laser and grating.',
+    )
+    wavenumber_calibration = SubSection(
+        section_def=WavenumberCalibration,
+        description='The correction that was applied to the wavenumbers.',
+    )
+    background_settings = SubSection(
+        section_def=BackgroundSettings,
+        description='Subtraction of the spectrum of another measurement as '
+        'background. The background is only subtracted if this section is present.',
+    )
+    processing_stamp = SubSection(
+        section_def=ProcessingStamp,
+        description='The data file, settings and versions that the results were '
+        'derived from. Entries with the same stamp are not processed again.',
+    )
+    descriptors = SubSection(
+        section_def=SpectralDescriptors,
+        description='Searchable summary of the settings and spectra, which is '
+        'derived from the other sections during normalization.',
+    )
+    map_results = SubSection(
+        section_def=MapResults,
+    )
+    results = SubSection(
+        section_def=Results,
+        repeats=True,
+        base_sections=['nomad.datamodel.metainfo.basesections.Instrument'],
+        quantities={
+            'ramanspectrometer': {
+                'type': '#/RamanSpectrometer',
+                'm_annotations': {'eln': {'component': 'ReferenceEditQuantity'}},
+            }
+        },
+    )
+
+    def load_data_file(
+        self,
+        archive: 'EntryArchive',
+        logger: 'BoundLogger',
+        file_path: Optional[str] = None,
+    ) -> None:
+        """
+        Fills the section from the Horiba XML file `data_file`.
 
         Args:
-            archive (EntryArchive): The archive containing the section that is being
-            normalized.
+            archive (EntryArchive): The archive containing the section.
             logger (BoundLogger): A structlog logger.
+            file_path (str): The local path of the data file if it is already known,
+            e.g. the mainfile of a parser. Otherwise it is resolved in the upload.
         """
-        # super().normalize(archive, logger)
-
-        if self.data_file is not None:
-            read_function = parse_raman_xml
-
+        if file_path is None:
             with archive.m_context.raw_file(self.data_file) as file:
-                raman_dict = read_function(file.name)
+                file_path = file.name
+        if not self.results and not configuration.force_reprocessing:
+            self.restore_processing(archive)
+        stamp = self.stamp_processing(hash_file(file_path))
+        if (
+            self.results
+            and self.processing_stamp is not None
+            and self.processing_stamp.matches(stamp)
+            and not configuration.force_reprocessing
+        ):
+            logger.info('skipped the unchanged data file', data_file=self.data_file)
+        else:
+            raman_dict = read_data_file(file_path, stamp.data_file_hash)
+            self.name = file_path.split('/')[-1].split('.xml')[0]
+            self.fill_from_raman_dict(raman_dict, archive)
+            self.check_calibration(logger)
+            # The settings are complete once the data file is read. A measurement
+            # whose background is missing is not stamped, so that it is processed
+            # again
+            self.processing_stamp = (
+                self.stamp_processing(stamp.data_file_hash)
+                if self.check_background(logger)
+                else None
+            )
+        self.link_references(archive, logger)
+        self.m_cache['loaded_data_file'] = self.data_file
 
-                self.name = file.name.split('/')[-1].split('.xml')[0]
-                self.title = raman_dict.get(
-                    'Title',
-                )
-                self.datetime = raman_dict.get('Date')
-                self.project = raman_dict.get(
-                    'Project',
-                )
-                self.description = raman_dict.get('Remark')
-                self.operator = raman_dict.get('Operator')
-                self.location = raman_dict.get(
-                    'Site',
-                )
-                self.method = raman_dict.get('Method', 'Raman')
-                results = Results()
-                results.name = 'Raman Spectrum'
-                results.wavenumber = raman_dict.get(
-                    'wavenumbers',
-                )
-                results.intensity = raman_dict.get(
-                    'intensities',
-                )
-                self.results = [results]
-                if raman_dict.get('Sample') != '':
-                    ramansample = Sample()
-                    ramansample.lab_id = raman_dict.get('Sample')
-                    ramansample.normalize(archive, logger)
-                    self.samples = [ramansample]
-                if not self.samples:
-                    self.samples = [Sample()]
-
-                measurementsettings = MeasurementSettings()
-                measurementsettings.acquisition_time = raman_dict.get(
-                    'AcquisitionTime',
-                )
-                measurementsettings.accumulations = raman_dict.get(
-                    'Accumulations',
-                )
-                measurementsettings.range = raman_dict.get(
-                    'Range',
-                )
-                if (
-                    raman_dict.get(
-                        'Windows',
-                    )
-                    != ''  #'N/A'
-                ):
-                    measurementsettings.windows = int(
-                        raman_dict.get(
-                            'Windows',
-                        )
-                    )
-                measurementsettings.auto_scanning = (
-                    True if raman_dict.get('AutoScanning') == 'On' else False
-                )
-                measurementsettings.autofocus = (
-                    True if raman_dict.get('Autofocus') == 'On' else False
-                )
-                measurementsettings.auto_exposure = (
-                    True if raman_dict.get('AutoExposure') == 'On' else False
-                )
-                measurementsettings.spike_filter = raman_dict.get(
-                    'SpikeFilter',
-                )
-                measurementsettings.delay_time = raman_dict.get(
-                    'DelayTime',
-                )
-                measurementsettings.binning = raman_dict.get(
-                    'Binning',
-                )
-                measurementsettings.readout_mode = raman_dict.get(
-                    'ReadoutMode',
-                )
-                measurementsettings.denoise = raman_dict.get('Denoise', False)
-                ics_correction = raman_dict.get('ICSCorrection', False)
-                measurementsettings.ics_correction = (
-                    True if ics_correction == 'On' else False
-                )
-                measurementsettings.dark_correction = (
-                    True if raman_dict.get('DarkCorrection') == 'On' else False
+    def check_calibration(self, logger: 'BoundLogger') -> None:
+        """
+        Logs why the wavenumbers of the measurement are not calibrated although
+        calibrations of its instrument, laser and grating are stored, or why the
+        calibration of a reference measurement is not stored.
+        """
+        store = calibration_store()
+        if store is None:
+            if self.calibration_settings is not None:
+                logger.warning(
+                    'the calibration is not stored without a calibration_dir',
+                    data_file=self.data_file,
                 )
+            return
+        settings = self.measurement_settings
+        if (
+            self.wavenumber_calibration is not None
+            or not self.instruments
+            or not self.instruments[0].lab_id
+            or settings is None
+            or settings.laser is None
+            or settings.grating is None
+        ):
+            return
+        key = calibration_key(
+            self.instruments[0].lab_id,
+            settings.laser.to('nanometer').magnitude,
+            settings.grating,
+        )
+        calibrations = store.get(key)
+        if calibrations:
+            logger.info(
+                'no stored calibration is valid at the time of the measurement',
+                calibration_key=key,
+                n_calibrations=len(calibrations),
+                validity_hours=configuration.calibration_validity_hours,
+            )
 
-                measurementsettings.instrument_process = (
-                    True if raman_dict.get('InstrumentProcess') == 'On' else False
-                )
-                # measurementsettings.detector_gain = raman_dict.get(
-                #     'DetectorGain',
-                # )
-                # measurementsettings.detector_adc = raman_dict.get(
-                #     'DetectorADC',
-                # )
-                measurementsettings.detector_temperature = raman_dict.get(
-                    'DetectorTemperature',
-                )
-                measurementsettings.objective = raman_dict.get(
-                    'Objective',
-                )
-                measurementsettings.grating = raman_dict.get(
-                    'Grating',
-                )
-                measurementsettings.filter = raman_dict.get(
-                    'Filter',
-                )
-                measurementsettings.laser = raman_dict.get(
-                    'Laser',
-                )
-                measurementsettings.hole = raman_dict.get(
-                    'Hole',
-                )
-                measurementsettings.x = raman_dict.get(
-                    'X',
+    def check_background(self, logger: 'BoundLogger') -> bool:
+        """
+        Logs a warning and returns `False` if the background reference of the
+        measurement cannot be loaded or has no results yet, so that its background
+        was not subtracted.
+        """
+        settings = self.background_settings
+        if settings is None or settings.reference is None:
+            return True
+        if settings.loaded_reference() is not None:
+            return True
+        logger.warning(
+            'the background reference has no results, the background is not subtracted',
+            data_file=self.data_file,
+            reference=settings.reference_key(),
+        )
+        return False
+
+    def restore_processing(self, archive: 'EntryArchive') -> None:
+        """
+        Restores the results and the properties read from the data file from the
+        previous processing of the entry. Entries created by the parser keep them in
+        the processed archive only, not in their `.archive.json` file. Properties
+        that are set in the entry, e.g. edited ones, are kept.
+        """
+        processed = load_processed_archive(archive)
+        previous = processed.data if processed is not None else None
+        if (
+            not isinstance(previous, Ramanspectroscopy)
+            or not previous.results
+            or previous.processing_stamp is None
+        ):
+            return
+        for name in PROCESSED_PROPERTIES:
+            definition = self.m_def.all_properties[name]
+            # Repeating sub-sections are empty lists if not set
+            if previous.m_is_set(definition) and not self.m_get(definition):
+                self.m_set(definition, previous.m_get(definition))
+        self.processing_stamp = previous.processing_stamp
+
+    def stamp_processing(self, data_file_hash: str) -> ProcessingStamp:
+        """
+        Returns the stamp of processing the data file with the hash
+        `data_file_hash` with the current settings and versions.
+        """
+        settings = {
+            name: section.m_to_dict() if section is not None else None
+            for name, section in [
+                ('preprocessing_settings', self.preprocessing_settings),
+                ('peak_fit_settings', self.peak_fit_settings),
+            ]
+        }
+        settings['hdf5_storage'] = self.hdf5_storage
+        settings['quality'] = [configuration.saturation_level, configuration.min_snr]
+        if self.calibration_settings is not None:
+            settings['calibration_settings'] = self.calibration_settings.m_to_dict()
+        if self.background_settings is not None:
+            settings['background_settings'] = [
+                self.background_settings.reference_key(),
+                self.background_settings.scaling,
+            ]
+        # The calibration that would be applied to the current measurement
+        measurement_settings = self.measurement_settings
+        if measurement_settings is not None and measurement_settings.laser is not None:
+            calibration = find_calibration(
+                self.instruments[0].lab_id if self.instruments else None,
+                measurement_settings.laser.to('nanometer').magnitude,
+                measurement_settings.grating,
+                self.datetime,
+            )
+            if calibration is not None:
+                settings['calibration'] = calibration['coefficients']
+        return ProcessingStamp(
+            data_file_hash=data_file_hash,
+            settings_hash=hashlib.sha256(
+                json.dumps(settings, sort_keys=True).encode()
+            ).hexdigest(),
+            reader_version=READER_VERSION,
+            schema_version=SCHEMA_VERSION,
+        )
+
+    def fill_from_raman_dict(
+        self, raman_dict: dict, archive: 'Optional[EntryArchive]' = None
+    ) -> None:
+        """
+        Fills the metadata, results and settings from a parsed data file. The
+        samples and the instrument are only identified by their lab_id, see
+        `link_references`.
+
+        Args:
+            raman_dict (dict): The output of `parse_raman_xml`.
+            archive (EntryArchive): The archive containing the section. Without an
+            archive, e.g. when building entries outside of NOMAD, the spectra are
+            always stored inline.
+        """
+        self.title = raman_dict.get(
+            'Title',
+        )
+        self.datetime = raman_dict.get('Date')
+        self.project = raman_dict.get(
+            'Project',
+        )
+        self.description = raman_dict.get('Remark')
+        self.operator = raman_dict.get('Operator')
+        self.location = raman_dict.get(
+            'Site',
+        )
+        self.method = raman_dict.get('Method', 'Raman')
+        wavenumber = raman_dict.get('wavenumbers')
+        datasets = {
+            '/wavenumber': wavenumber,
+            '/results/intensity': raman_dict.get('intensities'),
+        }
+        if raman_dict.get('map_intensities') is not None:
+            datasets['/map/intensity'] = raman_dict['map_intensities']
+        quality, map_quality = self.assess_quality(datasets)
+        windows, scales = self.stitch_windows(raman_dict, datasets)
+        self.wavenumber_calibration = self.calibrate(raman_dict, datasets)
+        wavenumber = datasets['/wavenumber']
+        background_scale, map_background_scales = self.subtract_background(
+            raman_dict, datasets, archive
+        )
+        if self.preprocessing_settings is not None:
+            self.preprocessing_settings.process_datasets(datasets)
+        references = dict.fromkeys(datasets)
+        previous_peaks = {
+            '/results': self.results[0].peaks if self.results else None,
+            '/map': self.map_results.peaks if self.map_results else None,
+        }
+        if archive is not None and (
+            self.hdf5_storage
+            if self.hdf5_storage is not None
+            else configuration.hdf5_storage
+        ):
+            references = write_hdf5_datasets(
+                archive,
+                f'{os.path.splitext(self.data_file)[0]}.h5',
+                datasets,
+                configuration.hdf5_compression,
+            )
+        results = Results()
+        results.name = 'Raman Spectrum'
+        results.windows = windows
+        results.background_scale = background_scale
+        results.quality = quality
+        results.set_spectra(
+            wavenumber,
+            datasets['/results/intensity'],
+            references['/wavenumber'],
+            references['/results/intensity'],
+        )
+        if '/results/processed/intensity' in datasets:
+            results.processed = ProcessedSpectrum()
+            results.processed.set_spectra(
+                wavenumber,
+                datasets['/results/processed/intensity'],
+                references['/wavenumber'],
+                references['/results/processed/intensity'],
+            )
+        self.results = [results]
+        if '/map/intensity' in datasets:
+            coordinates = raman_dict['map_coordinates']
+            self.map_results = MapResults(
+                name='Raman Map',
+                n_points=len(raman_dict['map_row_indices']),
+                row_index=raman_dict['map_row_indices'],
+                x=coordinates[:, 0],
+                y=coordinates[:, 1],
+                z=coordinates[:, 2],
+                window_scales=scales,
+                background_scales=map_background_scales,
+                quality=map_quality,
+            )
+            self.map_results.set_spectra(
+                wavenumber,
+                datasets['/map/intensity'],
+                references['/wavenumber'],
+                references['/map/intensity'],
+            )
+            if '/map/processed/intensity' in datasets:
+                self.map_results.processed = ProcessedMap()
+                self.map_results.processed.set_spectra(
+                    wavenumber,
+                    datasets['/map/processed/intensity'],
+                    references['/wavenumber'],
+                    references['/map/processed/intensity'],
                 )
-                measurementsettings.y = raman_dict.get(
-                    'Y',
+        else:
+            self.map_results = None
+        if self.peak_fit_settings is not None:
+            self.fit_peaks(datasets, previous_peaks)
+        if raman_dict.get('Sample') != '':
+            self.samples = [Sample(lab_id=raman_dict.get('Sample'))]
+        if not self.samples:
+            self.samples = [Sample()]
+
+        self.fill_measurement_settings(raman_dict)
+        if not self.manual_settings:
+            self.manual_settings = ManualSettings()
+            self.manual_settings.polarization = Polarization()
+            self.manual_settings.filters = Filters()
+        self.instruments = [
+            RamanSpectrometerReference(lab_id=raman_dict.get('InstrumentID'))
+        ]
+
+    def fill_measurement_settings(self, raman_dict: dict) -> None:
+        """
+        Fills the measurement settings from a parsed data file.
+
+        Args:
+            raman_dict (dict): The output of `parse_raman_xml`.
+        """
+        measurementsettings = MeasurementSettings()
+        measurementsettings.acquisition_time = raman_dict.get(
+            'AcquisitionTime',
+        )
+        measurementsettings.accumulations = raman_dict.get(
+            'Accumulations',
+        )
+        measurementsettings.range = raman_dict.get(
+            'Range',
+        )
+        if (
+            raman_dict.get(
+                'Windows',
+            )
+            != ''  #'N/A'
+        ):
+            measurementsettings.windows = int(
+                raman_dict.get(
+                    'Windows',
                 )
-                measurementsettings.z = raman_dict.get(
-                    'Z',
+            )
+        measurementsettings.auto_scanning = (
+            True if raman_dict.get('AutoScanning') == 'On' else False
+        )
+        measurementsettings.autofocus = (
+            True if raman_dict.get('Autofocus') == 'On' else False
+        )
+        measurementsettings.auto_exposure = (
+            True if raman_dict.get('AutoExposure') == 'On' else False
+        )
+        measurementsettings.spike_filter = raman_dict.get(
+            'SpikeFilter',
+        )
+        measurementsettings.delay_time = raman_dict.get(
+            'DelayTime',
+        )
+        measurementsettings.binning = raman_dict.get(
+            'Binning',
+        )
+        measurementsettings.readout_mode = raman_dict.get(
+            'ReadoutMode',
+        )
+        measurementsettings.denoise = raman_dict.get('Denoise', False)
+        ics_correction = raman_dict.get('ICSCorrection', False)
+        measurementsettings.ics_correction = True if ics_correction == 'On' else False
+        measurementsettings.dark_correction = (
+            True if raman_dict.get('DarkCorrection') == 'On' else False
+        )
+
+        measurementsettings.instrument_process = (
+            True if raman_dict.get('InstrumentProcess') == 'On' else False
+        )
+        # measurementsettings.detector_gain = raman_dict.get(
+        #     'DetectorGain',
+        # )
+        # measurementsettings.detector_adc = raman_dict.get(
+        #     'DetectorADC',
+        # )
+        measurementsettings.detector_temperature = raman_dict.get(
+            'DetectorTemperature',
+        )
+        measurementsettings.objective = raman_dict.get(
+            'Objective',
+        )
+        measurementsettings.grating = raman_dict.get(
+            'Grating',
+        )
+        measurementsettings.filter = raman_dict.get(
+            'Filter',
+        )
+        measurementsettings.laser = raman_dict.get(
+            'Laser',
+        )
+        measurementsettings.hole = raman_dict.get(
+            'Hole',
+        )
+        measurementsettings.x = raman_dict.get(
+            'X',
+        )
+        measurementsettings.y = raman_dict.get(
+            'Y',
+        )
+        measurementsettings.z = raman_dict.get(
+            'Z',
+        )
+        self.measurement_settings = measurementsettings
+
+    def assess_quality(self, datasets: dict) -> tuple:
+        """
+        Computes the quality metrics of the measured spectrum and of all points of
+        the map, if any, in one pass, see `quality_metrics`. Spikes are detected
+        with the despiking settings of the preprocessing, if any.
+
+        Returns:
+            tuple: The `QualityMetrics` of the spectrum and the `MapQualityMetrics`
+            of the map, or `None`.
+        """
+        spectrum = datasets['/results/intensity']
+        if spectrum is None or not np.size(spectrum):
+            return None, None
+        spectra = [np.atleast_2d(spectrum)]
+        if '/map/intensity' in datasets:
+            spectra.append(datasets['/map/intensity'])
+        spike_settings = {}
+        if self.preprocessing_settings is not None:
+            spike_settings = dict(
+                spike_threshold=self.preprocessing_settings.despike_threshold,
+                width=self.preprocessing_settings.despike_width,
+            )
+        metrics = quality_metrics(
+            np.concatenate(spectra), configuration.saturation_level, **spike_settings
+        )
+        flags = quality_flags(metrics, configuration.min_snr)
+        snr, saturation, spikes, dynamic_range, noise = metrics.T
+        quality = QualityMetrics(
+            snr=snr[0],
+            saturation_fraction=saturation[0],
+            spike_count=int(spikes[0]),
+            dynamic_range=dynamic_range[0],
+            noise_floor=noise[0],
+            flags=[flag for flag, on in zip(QUALITY_FLAGS, flags[0]) if on],
+        )
+        if len(spectra) == 1:
+            return quality, None
+        map_quality = MapQualityMetrics(
+            snr=snr[1:],
+            saturation_fraction=saturation[1:],
+            spike_count=spikes[1:].astype(np.int64),
+            dynamic_range=dynamic_range[1:],
+            noise_floor=noise[1:],
+            median_snr=np.median(snr[1:]),
+            min_snr=snr[1:].min(),
+            max_saturation_fraction=saturation[1:].max(),
+            total_spike_count=int(spikes[1:].sum()),
+            n_flagged=int(flags[1:].any(axis=-1).sum()),
+            flags=[
+                flag for flag, on in zip(QUALITY_FLAGS, flags[1:].any(axis=0)) if on
+            ],
+        )
+        return quality, map_quality
+
+    @staticmethod
+    def window_starts(raman_dict: dict, wavenumber) -> Optional[np.ndarray]:
+        """
+        Returns the first point of every window of a multi-window spectrum, see
+        `detect_windows`, or `None` if the spectrum is not stitched. If the data
+        file declares its number of windows, the spectrum is only stitched if it
+        declares several windows and as many are detected.
+        """
+        if wavenumber is None:
+            return None
+        starts = detect_windows(wavenumber)
+        declared = raman_dict.get('Windows')
+        if declared not in (None, ''):
+            return starts if 1 < int(declared) == len(starts) else None
+        return starts if len(starts) > 1 else None
+
+    def stitch_windows(self, raman_dict: dict, datasets: dict) -> tuple:
+        """
+        Stitches the windows of the spectrum and of the map, if any, in one pass,
+        see `stitch`, and replaces the wavenumbers and intensities in `datasets`.
+        Spectra with one window are kept, see `window_starts`.
+
+        Returns:
+            tuple: The windows of the spectrum and the scales of the windows of the
+            map, one row per point, or `None` without a map. No windows and `None`
+            if the spectrum is not stitched.
+        """
+        starts = self.window_starts(raman_dict, datasets['/wavenumber'])
+        if starts is None:
+            return [], None
+        spectra = [np.atleast_2d(datasets['/results/intensity'])]
+        if '/map/intensity' in datasets:
+            spectra.append(datasets['/map/intensity'])
+        wavenumber, stitched, table, scales = stitch(
+            datasets['/wavenumber'], np.concatenate(spectra), starts
+        )
+        datasets['/wavenumber'] = wavenumber
+        datasets['/results/intensity'] = stitched[0]
+        if '/map/intensity' in datasets:
+            datasets['/map/intensity'] = stitched[1:]
+        windows = [
+            SpectralWindow(
+                wavenumber_start=start,
+                wavenumber_end=end,
+                n_points=int(n_points),
+                overlap=overlap,
+                scale=scale,
+            )
+            for (start, end, n_points, overlap), scale in zip(table, scales[0])
+        ]
+        return windows, scales[1:] if len(spectra) > 1 else None
+
+    def calibrate(
+        self, raman_dict: dict, datasets: dict
+    ) -> Optional[WavenumberCalibration]:
+        """
+        Corrects the wavenumbers in `datasets` with the calibration of the
+        instrument, laser and grating that is valid at the time of the measurement.
+        A reference measurement first fits its correction and stores it, see
+        `CalibrationSettings`.
+
+        Returns:
+            WavenumberCalibration: The applied calibration or `None`.
+        """
+        if datasets['/wavenumber'] is None:
+            return None
+        instrument = raman_dict.get('InstrumentID')
+        laser, grating = raman_dict.get('Laser'), raman_dict.get('Grating')
+        when = raman_dict.get('Date')
+        if self.calibration_settings is not None and None not in (laser, grating, when):
+            calibration = self.calibration_settings.fit(
+                datasets['/wavenumber'], datasets['/results/intensity'], laser
+            )
+            store = calibration_store()
+            if calibration is not None and instrument and store is not None:
+                content = calibration.m_to_dict()
+                content.update(measured_at=when, reference_data_file=self.data_file)
+                store.put(calibration_key(instrument, laser, grating), content)
+        found = find_calibration(instrument, laser, grating, when)
+        if found is None:
+            return None
+        datasets['/wavenumber'] = apply_calibration(
+            datasets['/wavenumber'], found['coefficients']
+        )
+        return WavenumberCalibration(
+            instrument_lab_id=instrument,
+            laser_wavelength=laser,
+            grating=grating,
+            **found,
+        )
+
+    def subtract_background(
+        self,
+        raman_dict: dict,
+        datasets: dict,
+        archive: 'Optional[EntryArchive]' = None,
+    ) -> tuple:
+        """
+        Subtracts the background of `BackgroundSettings` from the spectrum and from
+        the map, if any, in `datasets`. The reference is loaded and resampled onto
+        the wavenumbers once per process and reused by all measurements sharing it,
+        see `resampled_background`.
+
+        Returns:
+            tuple: The factor of the background of the spectrum and the factors of
+            the points of the map, or `None` without a map. Both are `None` if no
+            background was subtracted.
+        """
+        settings = self.background_settings
+        key = settings.reference_key() if settings is not None else None
+        if key is None or datasets['/wavenumber'] is None:
+            return None, None
+        loaded = resampled_background(
+            key, datasets['/wavenumber'], partial(settings.load, archive)
+        )
+        if loaded is None:
+            return None, None
+        background, exposure = loaded
+        exposure_ratio = 1.0
+        if exposure and raman_dict.get('AcquisitionTime'):
+            exposure_ratio = (
+                raman_dict['AcquisitionTime']
+                * (raman_dict.get('Accumulations') or 1)
+                / exposure
+            )
+        scales = []
+        for path in ['/results/intensity', '/map/intensity']:
+            if path in datasets:
+                scale = background_scales(
+                    datasets[path], background, settings.scaling, exposure_ratio
                 )
-                self.measurement_settings = measurementsettings
-                if not self.manual_settings:
-                    self.manual_settings = ManualSettings()
-                    self.manual_settings.polarization = Polarization()
-                    self.manual_settings.filters = Filters()
-                ramanspectrometerref = RamanSpectrometerReference()
-                ramanspectrometerref.lab_id = raman_dict.get('InstrumentID')
-                ramanspectrometerref.normalize(archive, logger)
-                if ramanspectrometerref.reference is None:
-                    ramanspectrometer = RamanSpectrometer(
-                        lab_id=ramanspectrometerref.lab_id
-                    )
-                    #    self.instruments = [ramanspectrometer]
-
-                    ramanspectrometerref.reference = create_archive(
-                        ramanspectrometer,
-                        archive,
-                        f'lab_ram_{ramanspectrometerref.lab_id}.archive.json',
-                    )
-                self.instruments = [ramanspectrometerref]
+                datasets[path] = subtract_background(datasets[path], background, scale)
+                scales.append(scale)
+        return float(scales[0]), scales[1] if len(scales) > 1 else None
+
+    def fit_peaks(self, datasets: dict, previous: dict) -> None:
+        """
+        Fits the peaks of the spectrum and of the map, if any, using the processed
+        intensities if available.
+
+        Args:
+            datasets (dict): The arrays of the entry by dataset path.
+            previous (dict): The peak tables of an earlier fit by dataset path, which
+            are kept if the spectra and the fit settings are unchanged.
+        """
+        for path, section in [
+            ('/results', self.results[0]),
+            ('/map', self.map_results),
+        ]:
+            if section is None:
+                continue
+            intensity = datasets.get(
+                f'{path}/processed/intensity', datasets[f'{path}/intensity']
+            )
+            section.peaks = self.peak_fit_settings.fit(
+                datasets['/wavenumber'], intensity, previous.get(path)
+            )
+
+    def set_descriptors(self, wavenumber, intensity) -> None:
+        """
+        Writes the `descriptors` from the settings, references and results.
+
+        Args:
+            wavenumber (np.ndarray): The wavenumbers of the spectrum.
+            intensity (np.ndarray): The (processed) intensities of the spectrum.
+        """
+        descriptors = SpectralDescriptors(n_spectra=1)
+        if self.samples:
+            descriptors.sample_lab_id = self.samples[0].lab_id
+        if self.instruments:
+            descriptors.instrument_lab_id = self.instruments[0].lab_id
+        settings = self.measurement_settings
+        if settings is not None:
+            descriptors.laser_wavelength = settings.laser
+            descriptors.grating = settings.grating
+            descriptors.objective = settings.objective
+            descriptors.acquisition_time = settings.acquisition_time
+            descriptors.accumulations = settings.accumulations
+        results = self.results[0]
+        descriptors.wavenumber_min = results.wavenumber_min
+        descriptors.wavenumber_max = results.wavenumber_max
+        peaks = results.peaks
+        quality = results.quality
+        if quality is not None:
+            descriptors.snr = quality.snr
+            descriptors.saturation_fraction = quality.saturation_fraction
+            descriptors.spike_count = quality.spike_count
+            descriptors.quality_flags = quality.flags
+        if self.map_results is not None:
+            descriptors.n_spectra = self.map_results.n_points
+            peaks = self.map_results.peaks
+            quality = self.map_results.quality
+            if quality is not None:
+                descriptors.snr = quality.median_snr
+                descriptors.saturation_fraction = quality.max_saturation_fraction
+                descriptors.spike_count = quality.total_spike_count
+                descriptors.quality_flags = quality.flags
+        if peaks is not None:
+            descriptors.main_peak_position = peaks.main_peak_position
+            descriptors.main_peak_fwhm = peaks.main_peak_fwhm
+        elif intensity is not None and np.size(intensity):
+            descriptors.main_peak_position = np.asarray(wavenumber)[
+                np.argmax(intensity)
+            ]
+        self.descriptors = descriptors
+
+    def add_to_similarity_index(
+        self,
+        archive: 'EntryArchive',
+        logger: 'BoundLogger',
+        wavenumber,
+        intensity,
+    ) -> None:
+        """
+        Adds the spectrum to the similarity index in `similarity_index_dir` under
+        the entry ID, replacing an earlier version of the entry. Until the index is
+        fitted with `nomad-ikz-raman fit`, the spectra are only stored.
+        """
+        from .similarity import SimilarityIndex
+
+        entry_id = archive.metadata.entry_id or archive.metadata.mainfile
+        try:
+            # The projection is fitted by the `fit` command, not in the normalizer
+            SimilarityIndex(configuration.similarity_index_dir).add(
+                [entry_id], wavenumber, intensity, fit=False
+            )
+        except (OSError, ValueError) as e:
+            logger.warning(
+                'could not add the spectrum to the similarity index', exc_info=e
+            )
+
+    def link_references(self, archive: 'EntryArchive', logger: 'BoundLogger') -> None:
+        """
+        Resolves the samples and the instrument by their lab_id. An instrument entry
+        is created in the upload if the instrument is not known yet.
+
+        Args:
+            archive (EntryArchive): The archive containing the section.
+            logger (BoundLogger): A structlog logger.
+        """
+        for ramansample in self.samples:
+            if ramansample.lab_id:
+                resolve_reference(ramansample, archive, logger)
+        for ramanspectrometerref in self.instruments:
+            resolve_reference(
+                ramanspectrometerref,
+                archive,
+                logger,
+                create=partial(
+                    create_archive,
+                    RamanSpectrometer(lab_id=ramanspectrometerref.lab_id),
+                    archive,
+                    f'lab_ram_{ramanspectrometerref.lab_id}.archive.json',
+                ),
+            )
+
+    def normalize(self, archive: 'EntryArchive', logger: 'BoundLogger') -> None:
+        """
+        The normalizer for the `Ramanspectroscopy` class.
+
+        Args:
+            archive (EntryArchive): The archive containing the section that is being
+            normalized.
+            logger (BoundLogger): A structlog logger.
+        """
+        if (
+            self.data_file is not None
+            and self.m_cache.get('loaded_data_file') != self.data_file
+        ):
+            self.load_data_file(archive, logger)
 
         super().normalize(archive, logger)
 
         if not self.results:
             return
-        figure1 = px.line(
-            x=self.results[0].wavenumber,
-            y=self.results[0].intensity,
-            title='Raman Spectrum',
-            labels={
-                'x': 'Wavenumber [1/cm]',
-                'y': 'Intensity [a.u.]',
-                'species': 'Species of Iris',
-            },
+        wavenumber, intensity = self.results[0].get_spectra(archive)
+        if configuration.similarity_index_dir:
+            self.add_to_similarity_index(archive, logger, wavenumber, intensity)
+        figure1 = spectrum_figure(
+            wavenumber, intensity, max_points=configuration.plot_max_points
         )
         self.figures = []
-        self.figures.append(
-            PlotlyFigure(label='figure 1', index=1, figure=figure1.to_plotly_json())
-        )
+        self.figures.append(PlotlyFigure(label='figure 1', index=1, figure=figure1))
+        if self.results[0].processed is not None:
+            wavenumber, intensity = self.results[0].processed.get_spectra(archive)
+            figure2 = spectrum_figure(
+                wavenumber,
+                intensity,
+                title='Processed Raman Spectrum',
+                max_points=configuration.plot_max_points,
+            )
+            self.figures.append(PlotlyFigure(label='figure 2', index=2, figure=figure2))
+        self.set_descriptors(wavenumber, intensity)
 
         # super().normalize(archive, logger)
 
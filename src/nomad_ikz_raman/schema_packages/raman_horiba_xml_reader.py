@@ -5,181 +5,416 @@ import numpy as np
 
 date_format = '%d.%m.%Y %H:%M'
 
+# Version of the output of `parse_raman_xml`, to be increased whenever it changes
+READER_VERSION = '1'
+
+
+# ID of the LSX node holding the value of a parameter block
+VALUE_ID = '0x7D6C61DB'
+# ID of the LSX node holding the numeric identifier of a hardware component
+HARDWARE_ID = '0x8736F70'
+# ID of the LSX node holding the name of an axis
+NAME_ID = '0x6D707974'
+# ID of the LSX node holding the values of an axis
+ARRAY_ID = '0x7D6CD4DB'
+# ID of the LSX node holding the axes of the data matrix
+AXES_ID = '0x7B697861'
+# Wildcard matching any LSX ID in a metadata ID path
+ANY_ID = '*'
+
 
 # Helper function to get text from an element if it exists
 def get_text(element):
     return element.text if element is not None else ''  #'N/A'
 
 
-# Helper function to extract wavenumbers
-def extract_wavenumbers(root):
-    wavenumbers = []
-    wavenumbers_element = root.find(".//LSX[@ID='0x1']") or root.find(
-        ".//LSX[@ID='0x7D6CD4DB']"
-    )
-    if wavenumbers_element is not None:
-        wavenumbers_text = (
-            wavenumbers_element.find(".//LSX[@Format='6']") or wavenumbers_element
+def _date(text):
+    return datetime.strptime(text, date_format)
+
+
+def _optional_float(text):
+    return np.nan if text == '' else float(text)  #'N/A'
+
+
+# Metadata fields as (key, LSX ID path, converter). An ID path matches an LSX
+# node whose own ID and the IDs of its closest ancestors equal the path, i.e. the
+# XPath `.//LSX[@ID=path[0]]/.../LSX[@ID=path[-1]]`.
+METADATA_FIELDS = (
+    ('Title', ('0x6C7469D9',), str),
+    ('Date', ('0x6D746164', VALUE_ID), _date),
+    ('Operator', ('0xECD4E4D0', VALUE_ID), str),
+    ('Sample', ('0x786DC6DF', VALUE_ID), str),
+    ('Remark', ('0x696DD0E4', VALUE_ID), str),
+    ('Site', ('0x6D746973', VALUE_ID), str),
+    ('Project', ('0x6AE3D5D5', VALUE_ID), str),
+    ('AcquisitionDate', ('0x7CECDBD7', ANY_ID, VALUE_ID), str),
+    ('AcquisitionTime', ('0x6F707865', VALUE_ID), float),
+    ('Accumulations', ('0x7D6363CE', VALUE_ID), int),
+    ('Range', ('0x6F6E61D7', VALUE_ID), str),
+    ('Windows', ('0x6CE1E0E6', VALUE_ID), str),
+    ('AutoScanning', ('0x3F415756', VALUE_ID), str),
+    ('Autofocus', ('0xECD7E53A', VALUE_ID), str),
+    ('AutoExposure', ('0x4C576339', VALUE_ID), str),
+    ('SpikeFilter', ('0x4F350544', VALUE_ID), str),
+    ('DelayTime', ('0x696C65DD', VALUE_ID), float),
+    ('Binning', ('0x6ED5D7CB', VALUE_ID), float),
+    ('ReadoutMode', ('0xEA3A4A4E', VALUE_ID), str),
+    ('DeNoise', ('0x6FD3D8CD', VALUE_ID), str),
+    ('ICSCorrection', ('0xFC5AA4A0', VALUE_ID), str),
+    ('DarkCorrection', ('0x5AB3995F', VALUE_ID), str),
+    ('InstrumentProcess', ('0x5A48F279', VALUE_ID), str),
+    ('DetectorGain', ('0x49454155', VALUE_ID), _optional_float),
+    ('DetectorADC', ('0x3B483AE7', VALUE_ID), _optional_float),
+    ('DetectorTemperature', ('0x6EDE5114', VALUE_ID), float),
+    ('Instrument', ('0xD9E15849', VALUE_ID), str),
+    ('InstrumentID', ('0xD9E15849', HARDWARE_ID), str),
+    ('Detector', ('0xDFE3D9C7', VALUE_ID), str),
+    ('DetectorID', ('0xDFE3D9C7', HARDWARE_ID), str),
+    ('Objective', ('0xDBD3D737', VALUE_ID), str),
+    ('Grating', ('0x7CC8E0D0', VALUE_ID), int),
+    ('Filter', ('0x7C6CDBCB', VALUE_ID), str),
+    ('Laser', ('0x6D7361DE', VALUE_ID), float),
+    ('Hole', ('0x6D6C6F68', VALUE_ID), float),
+    ('StageXY', ('0x6FDAECD8', VALUE_ID), str),
+    ('StageZ', ('0x6F61EED8', VALUE_ID), str),
+    ('X', ('0x8000078', VALUE_ID), float),
+    ('Y', ('0x8000079', VALUE_ID), float),
+    ('Z', ('0x800007A', VALUE_ID), float),
+)
+
+# ID paths of the spectral axis, tried in order
+WAVENUMBER_PATHS = (('0x1', ARRAY_ID), (ARRAY_ID,))
+
+# Names of the stage axes of a map, equal to the metadata keys of the position
+MAP_AXES = ('X', 'Y', 'Z')
+
+# Longest ID path that is indexed
+MAX_PATH_LENGTH = max(len(path) for _, path, _ in METADATA_FIELDS)
+
+
+def index_lsx_tree(root, max_path_length=MAX_PATH_LENGTH):
+    """
+    Walks the LSX nodes below `root` once and indexes them by ID path. The
+    spectral data in `LSX_Matrix` is not visited.
+
+    Every node is stored under all trailing ID paths of up to `max_path_length`
+    IDs, e.g. a value node is reachable as `(VALUE_ID,)` and as
+    `(block_id, VALUE_ID)`. As with `find`, the first node in document order wins.
+
+    Args:
+        root (Element): The root element of the LSX document.
+        max_path_length (int): The longest ID path that is indexed.
+
+    Returns:
+        dict: Mapping of ID path tuples to elements.
+    """
+    index = {}
+    stack = [(child, ()) for child in reversed(root)]
+    while stack:
+        element, path = stack.pop()
+        if element.tag == 'LSX_Matrix':
+            continue
+        if element.tag == 'LSX':
+            path = (*path, element.get('ID'))[-max_path_length:]
+            for start in range(len(path)):
+                index.setdefault(path[start:], element)
+        stack.extend((child, path) for child in reversed(element))
+    return index
+
+
+def resolve_lsx_path(index, path):
+    """
+    Looks up the LSX node of an ID path in an index built by `index_lsx_tree`.
+    `ANY_ID` entries in the path match any child below the preceding node.
+    """
+    if ANY_ID not in path:
+        return index.get(tuple(path))
+    wildcard = path.index(ANY_ID)
+    nodes = [index.get(tuple(path[:wildcard]))]
+    for lsx_id in path[wildcard:]:
+        nodes = [
+            child
+            for node in nodes
+            if node is not None
+            for child in node
+            if lsx_id == ANY_ID or child.get('ID') == lsx_id
+        ]
+    return nodes[0] if nodes else None
+
+
+def extract_metadata(index, fields=METADATA_FIELDS):
+    """
+    Resolves the metadata `fields` from an LSX index and converts their text.
+    """
+    return {
+        key: converter(get_text(resolve_lsx_path(index, path)))
+        for key, path, converter in fields
+    }
+
+
+def decode_lsx_array(element, dtype=np.float64):
+    """
+    Decodes the whitespace-separated values of an LSX array element in bulk.
+
+    Args:
+        element (Element): An LSX or LSX_Row element with `Format="6"`.
+        dtype (type): The float type of the returned array.
+
+    Returns:
+        np.ndarray: A contiguous 1-D array with the values of the element.
+
+    Raises:
+        ValueError: If the number of values differs from the `Size` attribute.
+    """
+    text = element.text
+    if not text or text.isspace():
+        values = np.empty(0, dtype=dtype)
+    else:
+        values = np.fromstring(text, dtype=dtype, sep=' ')
+    size = element.get('Size')
+    if size is not None and values.size != int(size):
+        raise ValueError(
+            f'{element.tag} {element.get("ID", "")} declares {size} values '
+            f'but {values.size} were decoded.'
         )
-        if wavenumbers_text is not None and wavenumbers_text.text:
-            wavenumbers = wavenumbers_text.text.strip().split()
-            wavenumbers = [float(value) for value in wavenumbers]
-    return wavenumbers
+    return values
+
+
+# Helper function to extract wavenumbers
+def extract_wavenumbers(root, index=None, dtype=np.float64):
+    if index is None:
+        index = index_lsx_tree(root)
+    for path in WAVENUMBER_PATHS:
+        wavenumbers_element = resolve_lsx_path(index, path)
+        if wavenumbers_element is not None:
+            return decode_lsx_array(wavenumbers_element, dtype)
+    return np.empty(0, dtype=dtype)
 
 
 # Helper function to extract intensities
-def extract_intensities(root):
-    intensities = []
-    # intensities_element = root.find('.//LSX_Matrix') or root.find(
-    #     ".//LSX[@ID='0x696DDCE0']"
-    # )
-    # if intensities_element is not None:
-    #     intensities_row = intensities_element.find('.//LSX_Row') or intensities_element
-    #     if intensities_row is not None and intensities_row.text:
-    #         intensities = intensities_row.text.strip().split()
-
-    intensities_element = root.find('.//LSX_Matrix')
-    if intensities_element is not None:
-        intensities_row = intensities_element.find('.//LSX_Row')
-        if intensities_row is not None and intensities_row.text:
-            intensities = intensities_row.text.strip().split()
-            intensities = [float(value) for value in intensities]
-    return intensities
+def extract_intensities(root, dtype=np.float64):
+    intensities_row = root.find('LSX_Matrix/LSX_Row')
+    if intensities_row is not None:
+        return decode_lsx_array(intensities_row, dtype)
+    return np.empty(0, dtype=dtype)
+
+
+def extract_map_axes(index, dtype=np.float64):
+    """
+    Extracts the stage axes of a map from the axes of the data matrix.
+
+    Returns:
+        dict: Mapping of axis names in `MAP_AXES` to their values.
+    """
+    axes = {}
+    axes_element = index.get((AXES_ID,))
+    if axes_element is None:
+        return axes
+    for axis in axes_element:
+        name = get_text(axis.find(f"LSX[@ID='{NAME_ID}']")).strip()
+        values = axis.find(f"LSX[@ID='{ARRAY_ID}']")
+        if name in MAP_AXES and values is not None:
+            axes[name] = decode_lsx_array(values, dtype)
+    return axes
+
+
+def map_coordinates(axes, position, n_points):
+    """
+    Builds the (n_points x 3) table of X, Y and Z stage coordinates of a map.
+
+    An axis with one value per point is used as is. Axes that span a raster, i.e.
+    whose sizes multiply to `n_points`, are expanded with the first axis varying
+    fastest. Missing axes are filled with the stage position of the measurement.
+
+    Args:
+        axes (dict): The stage axes as returned by `extract_map_axes`.
+        position (dict): The stage position by axis name, e.g. the metadata.
+        n_points (int): The number of spectra in the map.
+    """
+    coordinates = np.empty((n_points, len(MAP_AXES)))
+    raster = [name for name in MAP_AXES if name in axes and axes[name].size != n_points]
+    if raster and np.prod([axes[name].size for name in raster]) == n_points:
+        grid = np.meshgrid(*(axes[name] for name in reversed(raster)), indexing='ij')
+        expanded = dict(zip(reversed(raster), (values.ravel() for values in grid)))
+    else:
+        expanded = {}
+    for column, name in enumerate(MAP_AXES):
+        if name in expanded:
+            coordinates[:, column] = expanded[name]
+        elif name in axes and axes[name].size == n_points:
+            coordinates[:, column] = axes[name]
+        else:
+            coordinates[:, column] = position.get(name, np.nan)
+    return coordinates
+
+
+def iterparse_raman_xml(file_path, dtype=np.float64, metadata_only=False):
+    """
+    Streams a Horiba XML export with `iterparse`.
+
+    Yields `('LSX_Tree', element)` once the metadata tree is complete and then
+    `('LSX_Row', (index, values))` for every row of `LSX_Matrix` as soon as its
+    closing tag is read. Yielded elements are removed from the document
+    afterwards, so the memory held by the reader is bounded by one row.
+
+    Args:
+        file_path (str): The path of the XML file.
+        dtype (type): The float type of the decoded rows.
+        metadata_only (bool): Stops reading the file after the metadata tree,
+            which precedes `LSX_Matrix`, so that the spectra are not read.
+    """
+    with open(file_path, 'rb') as file:
+        root = None
+        matrix = None
+        n_rows = 0
+        for event, element in ET.iterparse(file, events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = element
+                elif element.tag == 'LSX_Matrix':
+                    matrix = element
+            elif element.tag == 'LSX_Tree':
+                yield 'LSX_Tree', element
+                if metadata_only:
+                    return
+                root.remove(element)
+            elif element.tag == 'LSX_Row':
+                # Rows without an index are numbered in document order
+                row_index = int(element.get('Index', n_rows))
+                if row_index < 0:
+                    raise ValueError(f'LSX_Row has the negative Index {row_index}.')
+                n_rows += 1
+                yield 'LSX_Row', (row_index, decode_lsx_array(element, dtype))
+                matrix.remove(element)
+
+
+def iter_intensity_rows(file_path, dtype=np.float64):
+    """
+    Yields `(index, intensities)` for every `LSX_Row` of a Horiba XML export
+    without keeping previously read rows in memory.
+    """
+    for tag, content in iterparse_raman_xml(file_path, dtype):
+        if tag == 'LSX_Row':
+            yield content
+
+
+def expected_rows(axes) -> int:
+    """
+    Estimates the number of rows of a map from its stage axes, see
+    `map_coordinates`: the size of axes with one value per point or of the raster
+    that the axes span.
+    """
+    sizes = [values.size for values in axes.values() if values.size > 1]
+    if not sizes:
+        return 1
+    # Axes of equal size are taken as one value per point rather than a raster
+    return max(sizes) if len(set(sizes)) == 1 else int(np.prod(sizes))
+
+
+class RowBuffer:
+    """
+    Collects the rows of `LSX_Matrix` in one preallocated array at the position of
+    their `Index`, so that a map is held in memory only once. The array grows
+    geometrically if there are more rows than expected.
+
+    Args:
+        capacity (int): The expected number of rows.
+        dtype (type): The float type of the rows.
+    """
+
+    def __init__(self, capacity, dtype=np.float64):
+        self.capacity = max(1, capacity)
+        self.dtype = dtype
+        self.array = None
+        self.filled = np.zeros(self.capacity, dtype=bool)
+
+    def add(self, row_index, values) -> None:
+        """Stores the row with `row_index`."""
+        if self.array is None:
+            self.array = np.empty((self.capacity, values.size), dtype=self.dtype)
+        if values.size != self.array.shape[1]:
+            raise ValueError(
+                f'LSX_Row {row_index} has {values.size} values instead of '
+                f'{self.array.shape[1]}.'
+            )
+        if row_index >= self.capacity:
+            self.capacity = max(2 * self.capacity, row_index + 1)
+            # Grows the array in place where possible
+            self.array.resize((self.capacity, values.size), refcheck=False)
+            self.filled.resize(self.capacity, refcheck=False)
+        if self.filled[row_index]:
+            raise ValueError(f'LSX_Row {row_index} is defined twice.')
+        self.array[row_index] = values
+        self.filled[row_index] = True
+
+    def rows(self) -> tuple:
+        """
+        Returns the indices of the stored rows and the (n_rows x n_values) array of
+        the rows, ordered by index.
+        """
+        indices = np.flatnonzero(self.filled)
+        if self.array is None:
+            return indices, np.empty((0, 0), dtype=self.dtype)
+        if indices.size == indices[-1] + 1:
+            # Shrinks the array in place
+            self.array.resize((indices.size, self.array.shape[1]), refcheck=False)
+            return indices, self.array
+        return indices, self.array[indices]
 
 
 # Function to parse the XML file and extract data
-def parse_raman_xml(file_path):
-    tree = ET.parse(file_path)
-    root = tree.getroot()
-
-    # Extract metadata
-    metadata = {
-        'Title': get_text(root.find(".//LSX[@ID='0x6C7469D9']")),
-        'Date': datetime.strptime(
-            get_text(root.find(".//LSX[@ID='0x6D746164']/LSX[@ID='0x7D6C61DB']")),
-            date_format,
-        ),
-        'Operator': get_text(
-            root.find(".//LSX[@ID='0xECD4E4D0']/LSX[@ID='0x7D6C61DB']")
-        ),
-        'Sample': get_text(root.find(".//LSX[@ID='0x786DC6DF']/LSX[@ID='0x7D6C61DB']")),
-        'Remark': get_text(root.find(".//LSX[@ID='0x696DD0E4']/LSX[@ID='0x7D6C61DB']")),
-        'Site': get_text(root.find(".//LSX[@ID='0x6D746973']/LSX[@ID='0x7D6C61DB']")),
-        'Project': get_text(
-            root.find(".//LSX[@ID='0x6AE3D5D5']/LSX[@ID='0x7D6C61DB']")
-        ),
-        'AcquisitionDate':  # datetime.strptime(
-        get_text(root.find(".//LSX[@ID='0x7CECDBD7']/LSX/LSX[@ID='0x7D6C61DB']")),
-        # date_format,
-        # ,
-        'AcquisitionTime': float(
-            get_text(root.find(".//LSX[@ID='0x6F707865']/LSX[@ID='0x7D6C61DB']"))
-        ),
-        'Accumulations': int(
-            get_text(root.find(".//LSX[@ID='0x7D6363CE']/LSX[@ID='0x7D6C61DB']"))
-        ),
-        'Range': get_text(root.find(".//LSX[@ID='0x6F6E61D7']/LSX[@ID='0x7D6C61DB']")),
-        'Windows': (
-            get_text(root.find(".//LSX[@ID='0x6CE1E0E6']/LSX[@ID='0x7D6C61DB']"))
-        ),
-        'AutoScanning': get_text(
-            root.find(".//LSX[@ID='0x3F415756']/LSX[@ID='0x7D6C61DB']")
-        ),
-        'Autofocus': get_text(
-            root.find(".//LSX[@ID='0xECD7E53A']/LSX[@ID='0x7D6C61DB']")
-        ),
-        'AutoExposure': get_text(
-            root.find(".//LSX[@ID='0x4C576339']/LSX[@ID='0x7D6C61DB']")
-        ),
-        'SpikeFilter': get_text(
-            root.find(".//LSX[@ID='0x4F350544']/LSX[@ID='0x7D6C61DB']")
-        ),
-        'DelayTime': float(
-            get_text(root.find(".//LSX[@ID='0x696C65DD']/LSX[@ID='0x7D6C61DB']"))
-        ),
-        'Binning': float(
-            get_text(root.find(".//LSX[@ID='0x6ED5D7CB']/LSX[@ID='0x7D6C61DB']"))
-        ),
-        'ReadoutMode': get_text(
-            root.find(".//LSX[@ID='0xEA3A4A4E']/LSX[@ID='0x7D6C61DB']")
-        ),
-        'DeNoise': get_text(
-            root.find(".//LSX[@ID='0x6FD3D8CD']/LSX[@ID='0x7D6C61DB']")
-        ),
-        'ICSCorrection': get_text(
-            root.find(".//LSX[@ID='0xFC5AA4A0']/LSX[@ID='0x7D6C61DB']")
-        ),
-        'DarkCorrection': get_text(
-            root.find(".//LSX[@ID='0x5AB3995F']/LSX[@ID='0x7D6C61DB']")
-        ),
-        'InstrumentProcess': get_text(
-            root.find(".//LSX[@ID='0x5A48F279']/LSX[@ID='0x7D6C61DB']")
-        ),
-        'DetectorGain': np.nan
-        if get_text(root.find(".//LSX[@ID='0x49454155']/LSX[@ID='0x7D6C61DB']"))
-        == ''  #'N/A'
-        else float(
-            get_text(root.find(".//LSX[@ID='0x49454155']/LSX[@ID='0x7D6C61DB']"))
-        ),
-        # float(
-        #     get_text(root.find(".//LSX[@ID='0x49454155']/LSX[@ID='0x7D6C61DB']"))
-        # ),
-        'DetectorADC': np.nan
-        if get_text(root.find(".//LSX[@ID='0x3B483AE7']/LSX[@ID='0x7D6C61DB']"))
-        == ''  #'N/A'
-        else float(
-            get_text(root.find(".//LSX[@ID='0x3B483AE7']/LSX[@ID='0x7D6C61DB']"))
-        ),
-        'DetectorTemperature': float(
-            get_text(root.find(".//LSX[@ID='0x6EDE5114']/LSX[@ID='0x7D6C61DB']"))
-        ),
-        'Instrument': get_text(
-            root.find(".//LSX[@ID='0xD9E15849']/LSX[@ID='0x7D6C61DB']")
-        ),
-        'InstrumentID': get_text(
-            root.find(".//LSX[@ID='0xD9E15849']/LSX[@ID='0x8736F70']")
-        ),
-        'Detector': get_text(
-            root.find(".//LSX[@ID='0xDFE3D9C7']/LSX[@ID='0x7D6C61DB']")
-        ),
-        'DetectorID': get_text(
-            root.find(".//LSX[@ID='0xDFE3D9C7']/LSX[@ID='0x8736F70']")
-        ),
-        'Objective': get_text(
-            root.find(".//LSX[@ID='0xDBD3D737']/LSX[@ID='0x7D6C61DB']")
-        ),
-        'Grating': int(
-            get_text(root.find(".//LSX[@ID='0x7CC8E0D0']/LSX[@ID='0x7D6C61DB']"))
-        ),
-        'Filter': get_text(root.find(".//LSX[@ID='0x7C6CDBCB']/LSX[@ID='0x7D6C61DB']")),
-        'Laser': float(
-            get_text(root.find(".//LSX[@ID='0x6D7361DE']/LSX[@ID='0x7D6C61DB']"))
-        ),
-        'Hole': float(
-            get_text(root.find(".//LSX[@ID='0x6D6C6F68']/LSX[@ID='0x7D6C61DB']"))
-        ),
-        'StageXY': get_text(
-            root.find(".//LSX[@ID='0x6FDAECD8']/LSX[@ID='0x7D6C61DB']")
-        ),
-        'StageZ': get_text(root.find(".//LSX[@ID='0x6F61EED8']/LSX[@ID='0x7D6C61DB']")),
-        'X': float(
-            get_text(root.find(".//LSX[@ID='0x8000078']/LSX[@ID='0x7D6C61DB']"))
-        ),
-        'Y': float(
-            get_text(root.find(".//LSX[@ID='0x8000079']/LSX[@ID='0x7D6C61DB']"))
-        ),
-        'Z': float(
-            get_text(root.find(".//LSX[@ID='0x800007A']/LSX[@ID='0x7D6C61DB']"))
-        ),
-        'wavenumbers': extract_wavenumbers(root),
-        'intensities': extract_intensities(root),
-    }
+def parse_raman_xml(file_path, dtype=np.float64):
+    metadata = {}
+    axes = {}
+    buffer = RowBuffer(1, dtype)
+    for tag, content in iterparse_raman_xml(file_path, dtype):
+        if tag == 'LSX_Tree':
+            # Index the LSX tree once and resolve all metadata from the index
+            index = index_lsx_tree(content)
+            metadata.update(extract_metadata(index))
+            metadata['wavenumbers'] = extract_wavenumbers(content, index, dtype)
+            axes = extract_map_axes(index, dtype)
+            # The metadata precedes the matrix, so the rows are preallocated
+            buffer = RowBuffer(expected_rows(axes), dtype)
+        else:
+            buffer.add(*content)
+    row_indices, rows = buffer.rows()
+    # The spectrum is the row with the lowest index, i.e. the first point of a map
+    metadata['intensities'] = rows[0].copy() if len(rows) else np.empty(0, dtype)
+
+    # Maps hold one row per point, ordered by the row index
+    if len(rows) > 1:
+        metadata['map_row_indices'] = row_indices
+        metadata['map_intensities'] = rows
+        # The coordinates of the full raster are selected by the row index, so that
+        # the points of an incomplete map keep their coordinates
+        n_points = max(expected_rows(axes), int(row_indices[-1]) + 1)
+        metadata['map_coordinates'] = map_coordinates(axes, metadata, n_points)[
+            row_indices
+        ]
+
+    return metadata
+
 
-    # Extract measured data
-    # wavenumbers = extract_wavenumbers(root)
-    # intensities = extract_intensities(root)
+def parse_raman_metadata(file_path):
+    """
+    Reads only the metadata of a Horiba XML export, see `iterparse_raman_xml`. The
+    spectral axis is not decoded, `n_points` is its declared size.
 
-    return metadata  # , wavenumbers, intensities
+    Returns:
+        dict: The metadata of `parse_raman_xml` without the spectra.
+    """
+    metadata = {}
+    for _, content in iterparse_raman_xml(file_path, metadata_only=True):
+        index = index_lsx_tree(content)
+        metadata.update(extract_metadata(index))
+        for path in WAVENUMBER_PATHS:
+            wavenumbers_element = resolve_lsx_path(index, path)
+            if wavenumbers_element is not None:
+                size = wavenumbers_element.get('Size')
+                metadata['n_points'] = int(size) if size is not None else None
+                break
+    return metadata
 
 
 # # Example usage with the provided file paths
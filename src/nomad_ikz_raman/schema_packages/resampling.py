@@ -0,0 +1,183 @@
+"""
+Resampling of spectra with different wavenumber axes onto a shared grid.
+
+The axes of measurements differ slightly with the grating, range, windows and
+calibration, but many spectra share the same axis, e.g. all points of a map or
+all measurements with the same settings. The interpolation weights are therefore
+computed once per distinct axis and reused.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+# Number of distinct axes whose interpolation weights are kept
+MAX_CACHED_AXES = 256
+# Number of spectra that are resampled together
+RESAMPLE_CHUNK_SIZE = 1024
+
+
+class Resampler:
+    """
+    Linearly interpolates spectra onto `grid`. Grid points outside of the axis of
+    a spectrum are set to `fill_value`.
+
+    Args:
+        grid (np.ndarray): The shared wavenumber grid.
+        fill_value (float): The value of grid points outside of a spectrum.
+    """
+
+    def __init__(self, grid, fill_value=np.nan):
+        self.grid = np.asarray(grid, dtype=np.float64)
+        self.fill_value = fill_value
+        self._weights = OrderedDict()
+
+    def weights(self, wavenumber) -> tuple:
+        """
+        Returns the sparse (n_grid x n_values) matrix of the interpolation weights,
+        with the weights of the two neighbours of every grid point, and the mask of
+        the grid points outside of the axis. The weights are cached per distinct
+        axis.
+        """
+        from scipy.sparse import csr_matrix
+
+        x = np.ascontiguousarray(wavenumber, dtype=np.float64)
+        key = x.tobytes()
+        weights = self._weights.get(key)
+        if weights is not None:
+            self._weights.move_to_end(key)
+            return weights
+        order = np.argsort(x, kind='stable')
+        sorted_x = x[order]
+        right = np.clip(np.searchsorted(sorted_x, self.grid), 1, len(x) - 1)
+        left = right - 1
+        span = sorted_x[right] - sorted_x[left]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weight = np.where(span > 0, (self.grid - sorted_x[left]) / span, 0.0)
+        rows = np.arange(len(self.grid))
+        matrix = csr_matrix(
+            (
+                np.concatenate([1.0 - weight, weight]),
+                (
+                    np.concatenate([rows, rows]),
+                    np.concatenate([order[left], order[right]]),
+                ),
+            ),
+            shape=(len(self.grid), len(x)),
+        )
+        outside = (self.grid < sorted_x[0]) | (self.grid > sorted_x[-1])
+        weights = (matrix, outside)
+        self._weights[key] = weights
+        if len(self._weights) > MAX_CACHED_AXES:
+            self._weights.popitem(last=False)
+        return weights
+
+    def resample(self, wavenumber, intensity, out=None):
+        """
+        Resamples spectra that share the axis `wavenumber`.
+
+        Args:
+            wavenumber (np.ndarray): The axis of the spectra.
+            intensity (np.ndarray): A spectrum or one spectrum per row.
+            out (np.ndarray): An optional (n_spectra x n_grid) array to write to.
+
+        Returns:
+            np.ndarray: The resampled spectra, (n_spectra x n_grid).
+        """
+        matrix, outside = self.weights(wavenumber)
+        spectra = np.atleast_2d(np.asarray(intensity, dtype=np.float64))
+        if out is None:
+            out = np.empty((len(spectra), len(self.grid)))
+        # Blocks of spectra bound the memory of the intermediate arrays
+        for start in range(0, len(spectra), RESAMPLE_CHUNK_SIZE):
+            resampled = matrix @ spectra[start : start + RESAMPLE_CHUNK_SIZE].T
+            resampled[outside] = self.fill_value
+            out[start : start + RESAMPLE_CHUNK_SIZE] = resampled.T
+        return out
+
+    def resample_many(
+        self, spectra, n_spectra=None, output=None, dtype=np.float64
+    ) -> np.ndarray:
+        """
+        Resamples spectra with different axes into one matrix.
+
+        Args:
+            spectra (Iterable): Pairs of an axis and a spectrum or spectra that
+            share it, e.g. the points of a map.
+            n_spectra (int): The total number of spectra. Required with `output`.
+            output (str): The path of a `.npy` file that the matrix is written to
+            and memory-mapped from, for matrices that do not fit into memory.
+            dtype (np.dtype): The type of the matrix.
+
+        Returns:
+            np.ndarray: The (n_spectra x n_grid) matrix, the rows in the order of
+            `spectra`.
+        """
+        if n_spectra is None:
+            if output is not None:
+                raise ValueError('The number of spectra is needed to write to a file.')
+            spectra = list(spectra)
+            n_spectra = sum(len(np.atleast_2d(intensity)) for _, intensity in spectra)
+        if output is None:
+            matrix = np.empty((n_spectra, len(self.grid)), dtype=dtype)
+        else:
+            matrix = np.lib.format.open_memmap(
+                output, mode='w+', dtype=dtype, shape=(n_spectra, len(self.grid))
+            )
+        # Spectra are grouped by their axis and every group is resampled at once
+        groups = {}
+
+        def flush(key):
+            wavenumber, blocks, positions = groups.pop(key)
+            matrix[np.concatenate(positions)] = self.resample(
+                wavenumber, np.concatenate(blocks)
+            )
+
+        start = 0
+        for wavenumber, intensity in spectra:
+            block = np.atleast_2d(intensity)
+            if start + len(block) > n_spectra:
+                raise ValueError(f'There are more than {n_spectra} spectra.')
+            key = np.ascontiguousarray(wavenumber, dtype=np.float64).tobytes()
+            _, blocks, positions = groups.setdefault(key, (wavenumber, [], []))
+            blocks.append(block)
+            positions.append(np.arange(start, start + len(block)))
+            start += len(block)
+            if positions[-1][-1] - positions[0][0] >= RESAMPLE_CHUNK_SIZE:
+                flush(key)
+        for key in list(groups):
+            flush(key)
+        if start != n_spectra:
+            raise ValueError(f'There are {start} instead of {n_spectra} spectra.')
+        if isinstance(matrix, np.memmap):
+            matrix.flush()
+        return matrix
+
+
+def resample_results(
+    sections, grid, output=None, dtype=np.float64, fill_value=np.nan
+) -> np.ndarray:
+    """
+    Resamples the spectra of many measurements onto a shared grid.
+
+    Args:
+        sections (Iterable): Pairs of a section with spectra, e.g. the `Results`
+        or `MapResults` of a `Ramanspectroscopy` entry, and the archive of its
+        entry. The archive is only needed for spectra stored in HDF5.
+        grid (np.ndarray): The shared wavenumber grid.
+        output (str): The path of a `.npy` file to write the matrix to, see
+        `Resampler.resample_many`.
+
+    Returns:
+        np.ndarray: One row per spectrum, with all points of a map in order.
+    """
+    sections = list(sections)
+    n_spectra = None
+    if output is not None:
+        n_spectra = sum(section.get_n_spectra(archive) for section, archive in sections)
+    return Resampler(grid, fill_value).resample_many(
+        (section.get_spectra(archive) for section, archive in sections),
+        n_spectra=n_spectra,
+        output=output,
+        dtype=dtype,
+    )
@@ -0,0 +1,468 @@
+"""
+On-disk index of spectral embeddings for similarity search.
+
+Spectra are resampled onto a common wavenumber grid, centered and scaled to unit
+length, and projected onto their principal components. The Euclidean distance of
+two embeddings approximates the distance of the normalized spectra, i.e. it falls
+with their cosine similarity.
+
+The index directory holds the projection, the embeddings as a flat float32 file
+and the IDs of the indexed spectra, one per line. Both files are only appended
+to, so that entries can be added while the index is queried. An inverted file of
+k-means clusters speeds up approximate queries, which only compare the spectra in
+the clusters closest to the query.
+"""
+
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from .resampling import Resampler
+
+# Version of the index layout and embeddings, to be increased whenever they change
+INDEX_VERSION = '1'
+# Lower end, upper end and step of the default grid in 1/cm
+DEFAULT_GRID = (50.0, 3500.0, 2.0)
+# Number of spectra added before the projection is fitted, per component
+FIT_SPECTRA_PER_COMPONENT = 4
+# Largest number of spectra the projection and the clusters are fitted to
+MAX_FIT_SPECTRA = 20000
+# Number of spectra that are normalized together when an index is built
+NORMALIZE_CHUNK_SIZE = 4096
+# Largest number of clusters of the inverted file
+MAX_LISTS = 1024
+EMBEDDING_DTYPE = np.float32
+LIST_DTYPE = np.int32
+
+
+def common_grid(lowest=DEFAULT_GRID[0], highest=DEFAULT_GRID[1], step=DEFAULT_GRID[2]):
+    """Returns the wavenumbers of a grid with the given ends and step."""
+    return np.arange(lowest, highest + step / 2.0, step)
+
+
+def normalize_spectra(resampled):
+    """
+    Centers the resampled spectra on their mean and scales them to unit length.
+    Grid points outside of a spectrum become 0.
+    """
+    spectra = np.array(resampled, dtype=np.float64)
+    outside = ~np.isfinite(spectra)
+    spectra[outside] = 0.0
+    n_inside = spectra.shape[1] - outside.sum(axis=1, keepdims=True)
+    spectra -= spectra.sum(axis=1, keepdims=True) / np.maximum(n_inside, 1)
+    spectra[outside] = 0.0
+    norm = np.linalg.norm(spectra, axis=1, keepdims=True)
+    return spectra / np.where(norm > 0, norm, 1.0)
+
+
+def fit_projection(spectra, n_components):
+    """
+    Fits the principal components of normalized spectra.
+
+    Returns:
+        tuple: The mean spectrum and the (n_components x n_grid) components.
+    """
+    mean = spectra.mean(axis=0)
+    centered = spectra - mean
+    # The eigenvectors of the covariance, which is much smaller than the spectra
+    _, vectors = np.linalg.eigh(centered.T @ centered)
+    return mean, vectors[:, ::-1][:, :n_components].T
+
+
+def fit_lists(embeddings, n_lists, n_iterations=10, seed=0):
+    """
+    Returns the centroids of `n_lists` k-means clusters of the embeddings, fitted
+    by Lloyd's algorithm from randomly chosen embeddings.
+    """
+    rng = np.random.default_rng(seed)
+    embeddings = np.asarray(embeddings, dtype=np.float64)
+    centroids = embeddings[rng.choice(len(embeddings), n_lists, replace=False)]
+    for _ in range(n_iterations):
+        labels = nearest(embeddings, centroids, 1)[0][:, 0]
+        counts = np.bincount(labels, minlength=n_lists)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, embeddings)
+        # Empty clusters keep their centroid
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids.astype(EMBEDDING_DTYPE)
+
+
+def nearest(queries, vectors, k, squared_norms=None):
+    """
+    Returns the indices and squared distances of the `k` nearest vectors of every
+    query, closest first. The `squared_norms` of the vectors can be passed if they
+    are known.
+    """
+    if squared_norms is None:
+        squared_norms = np.einsum('ij,ij->i', vectors, vectors)
+    distances = (
+        squared_norms[None, :]
+        - 2.0 * queries @ vectors.T
+        + np.einsum('ij,ij->i', queries, queries)[:, None]
+    )
+    k = min(k, vectors.shape[0])
+    indices = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    order = np.argsort(np.take_along_axis(distances, indices, axis=1), axis=1)
+    indices = np.take_along_axis(indices, order, axis=1)
+    return indices, np.maximum(np.take_along_axis(distances, indices, axis=1), 0.0)
+
+
+class SimilarityIndex:
+    """
+    Persistent k-nearest-neighbour index of spectra.
+
+    The projection is fitted once `n_components * FIT_SPECTRA_PER_COMPONENT`
+    spectra were added, earlier spectra are kept normalized until then. Spectra
+    added with `fit=False` only wait for the projection, which is then fitted by
+    `fit_pending`. Later spectra are projected and assigned to the closest cluster
+    when they are added.
+    Adding a spectrum with an ID that is already indexed replaces its embedding.
+    `build` fits the projection and the clusters to all spectra at once.
+
+    Args:
+        directory (str): The directory of the index.
+        grid (np.ndarray): The common wavenumber grid of a new index.
+        n_components (int): The length of the embeddings of a new index.
+    """
+
+    def __init__(self, directory, grid=None, n_components=64):
+        self.directory = directory
+        self._cache = {}
+        meta = self._read_meta()
+        if meta is None:
+            grid = common_grid() if grid is None else np.asarray(grid, np.float64)
+            meta = {
+                'version': INDEX_VERSION,
+                'grid': grid.tolist(),
+                'n_components': n_components,
+                'fitted': False,
+            }
+        elif meta['version'] != INDEX_VERSION:
+            raise ValueError(
+                f'The similarity index in {directory} has version '
+                f'{meta["version"]} instead of {INDEX_VERSION}, rebuild it.'
+            )
+        self.meta = meta
+        self.grid = np.asarray(meta['grid'])
+        self.resampler = Resampler(self.grid)
+
+    def _path(self, name) -> str:
+        return os.path.join(self.directory, name)
+
+    def _read_meta(self):
+        try:
+            with open(self._path('index.json'), encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self) -> None:
+        self._save('index.json', json.dumps(self.meta).encode())
+
+    def _save(self, name, content: bytes) -> None:
+        # Write to a temporary file first, so that readers never see a partially
+        # written file
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(content)
+        os.replace(temporary_path, self._path(name))
+
+    def _save_array(self, name, array) -> None:
+        self._save(name, np.ascontiguousarray(array).tobytes())
+
+    @contextmanager
+    def _lock(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path('lock'), 'w') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            else:
+                msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+                else:
+                    msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _read_ids(self, name) -> list:
+        try:
+            with open(self._path(name), encoding='utf-8') as file:
+                return file.read().splitlines()
+        except FileNotFoundError:
+            return []
+
+    def _read_array(self, name, dtype, width=None, mode='r'):
+        """
+        Maps a flat array file, reshaped to rows of `width` values. Rows that are
+        only partially written are left out.
+        """
+        path = self._path(name)
+        row_size = np.dtype(dtype).itemsize * (width or 1)
+        n_rows = os.path.getsize(path) // row_size if os.path.exists(path) else 0
+        shape = (n_rows, width) if width else (n_rows,)
+        if not n_rows:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode=mode, shape=shape)
+
+    def _arrays(self) -> dict:
+        """
+        Returns the projection, the clusters, the embeddings and their IDs, which
+        are reloaded if the index changed.
+        """
+        stamp = []
+        for name in ('index.json', 'ids.txt'):
+            try:
+                stat = os.stat(self._path(name))
+                stamp.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                stamp.append(None)
+        if self._cache.get('stamp') != stamp:
+            meta = self._read_meta() or self.meta
+            n_components = meta['n_components']
+            ids = self._read_ids('ids.txt')
+            embeddings = self._read_array(
+                'embeddings.f32', EMBEDDING_DTYPE, n_components
+            )
+            lists = self._read_array('lists.i32', LIST_DTYPE)
+            n_rows = min(len(ids), len(embeddings), len(lists))
+            embeddings = np.asarray(embeddings[:n_rows])
+            # The rows of every cluster, as slices of `order` between `bounds`
+            order = np.argsort(lists[:n_rows], kind='stable')
+            self._cache = {
+                'stamp': stamp,
+                'meta': meta,
+                'ids': ids[:n_rows],
+                'embeddings': embeddings,
+                'squared_norms': np.einsum('ij,ij->i', embeddings, embeddings),
+                'order': order,
+            }
+            if meta['fitted']:
+                n_grid = len(meta['grid'])
+                self._cache['mean'] = np.fromfile(self._path('mean.f64'))
+                self._cache['components'] = np.fromfile(
+                    self._path('components.f64')
+                ).reshape(-1, n_grid)
+                self._cache['centroids'] = np.fromfile(
+                    self._path('centroids.f32'), dtype=EMBEDDING_DTYPE
+                ).reshape(-1, n_components)
+                self._cache['bounds'] = np.searchsorted(
+                    lists[:n_rows][order],
+                    np.arange(len(self._cache['centroids']) + 1),
+                )
+        return self._cache
+
+    def __len__(self) -> int:
+        arrays = self._arrays()
+        return len(arrays['ids']) + len(self._read_ids('pending.txt'))
+
+    def _project(self, spectra):
+        """Returns the embeddings of normalized, resampled spectra."""
+        arrays = self._arrays()
+        return ((spectra - arrays['mean']) @ arrays['components'].T).astype(
+            EMBEDDING_DTYPE
+        )
+
+    def embed(self, wavenumber, intensity):
+        """
+        Returns the embeddings of spectra that share the axis `wavenumber`.
+        """
+        if not self._arrays()['meta']['fitted']:
+            raise ValueError('The projection of the similarity index is not fitted.')
+        return self._project(
+            normalize_spectra(self.resampler.resample(wavenumber, intensity))
+        )
+
+    def _fit(self, spectra, ids) -> None:
+        """Fits the projection and the clusters and replaces all embeddings."""
+        rng = np.random.default_rng(0)
+        sample = spectra
+        if len(spectra) > MAX_FIT_SPECTRA:
+            sample = spectra[rng.choice(len(spectra), MAX_FIT_SPECTRA, replace=False)]
+        n_components = min(self.meta['n_components'], *sample.shape)
+        mean, components = fit_projection(sample.astype(np.float64), n_components)
+        # Projecting the mean separately avoids a centered copy of all spectra
+        embeddings = (
+            spectra @ components.T.astype(spectra.dtype) - mean @ components.T
+        ).astype(EMBEDDING_DTYPE)
+        n_lists = int(np.clip(np.sqrt(len(sample)), 1, MAX_LISTS))
+        centroids = fit_lists((sample - mean) @ components.T, n_lists)
+        lists, _ = nearest(embeddings, centroids, 1)
+        self.meta.update(fitted=True, n_components=n_components)
+        self._save_array('mean.f64', mean)
+        self._save_array('components.f64', components)
+        self._save_array('centroids.f32', centroids)
+        self._save_array('embeddings.f32', embeddings)
+        self._save_array('lists.i32', lists[:, 0].astype(LIST_DTYPE))
+        self._save('ids.txt', ''.join(f'{id_}\n' for id_ in ids).encode())
+        self._write_meta()
+        for name in ('pending.f64', 'pending.txt'):
+            if os.path.exists(self._path(name)):
+                os.remove(self._path(name))
+
+    def build(self, spectra) -> None:
+        """
+        Rebuilds the index from scratch.
+
+        Args:
+            spectra (Iterable): Tuples of the ID, the wavenumbers and the intensity
+            of every spectrum. Spectra that share their wavenumbers are resampled
+            together.
+        """
+        ids = []
+
+        def pairs():
+            for id_, wavenumber, intensity in spectra:
+                ids.append(id_)
+                yield wavenumber, intensity
+
+        rows = self.resampler.resample_many(pairs(), dtype=EMBEDDING_DTYPE)
+        for start in range(0, len(rows), NORMALIZE_CHUNK_SIZE):
+            chunk = slice(start, start + NORMALIZE_CHUNK_SIZE)
+            rows[chunk] = normalize_spectra(rows[chunk])
+        if not ids:
+            return
+        with self._lock():
+            self._fit(rows, ids)
+
+    def add(self, ids, wavenumber, intensity, fit=True) -> None:
+        """
+        Adds spectra that share the axis `wavenumber` to the index.
+
+        Args:
+            ids (list): The IDs of the spectra, e.g. entry IDs.
+            wavenumber (np.ndarray): The wavenumbers of the spectra.
+            intensity (np.ndarray): A spectrum or one spectrum per ID and row.
+            fit (bool): Fits the projection and the clusters once enough spectra
+                are pending. The fit holds the lock of the index, so callers that
+                must not wait, e.g. normalizers, leave it to `fit_pending`.
+        """
+        spectra = normalize_spectra(self.resampler.resample(wavenumber, intensity))
+        with self._lock():
+            self.meta = self._read_meta() or self.meta
+            if not os.path.exists(self._path('index.json')):
+                self._write_meta()
+            if self.meta['fitted']:
+                embeddings = self._project(spectra)
+                lists, _ = nearest(embeddings, self._arrays()['centroids'], 1)
+                self._append(
+                    'ids.txt',
+                    ids,
+                    {
+                        'embeddings.f32': embeddings,
+                        'lists.i32': lists[:, 0].astype(LIST_DTYPE),
+                    },
+                )
+                return
+            self._append('pending.txt', ids, {'pending.f64': spectra})
+            if fit:
+                self._fit_pending(self.meta['n_components'] * FIT_SPECTRA_PER_COMPONENT)
+
+    def fit_pending(self) -> int:
+        """
+        Fits the projection and the clusters to the spectra that were added before
+        the index was fitted.
+
+        Returns:
+            int: The number of spectra the index was fitted to, 0 if it was not
+            fitted.
+        """
+        with self._lock():
+            self.meta = self._read_meta() or self.meta
+            if self.meta['fitted']:
+                return 0
+            return self._fit_pending(1)
+
+    def _fit_pending(self, min_spectra) -> int:
+        pending_ids = self._read_ids('pending.txt')
+        if not pending_ids or len(pending_ids) < min_spectra:
+            return 0
+        pending = self._read_array('pending.f64', np.float64, len(self.grid))
+        self._fit(np.array(pending[: len(pending_ids)]), pending_ids)
+        return len(pending_ids)
+
+    def _append(self, ids_name, ids, arrays) -> None:
+        """
+        Stores the rows of `arrays` by file name for the given IDs. The rows of
+        known IDs are replaced in place, the others are appended.
+        """
+        known = {id_: index for index, id_ in enumerate(self._read_ids(ids_name))}
+        new = []
+        for position, id_ in enumerate(ids):
+            if id_ not in known:
+                known[id_] = len(known)
+                new.append(position)
+                continue
+            for name, rows in arrays.items():
+                stored = self._read_array(
+                    name, rows.dtype, rows.shape[1] if rows.ndim > 1 else None, 'r+'
+                )
+                stored[known[id_]] = rows[position]
+                stored.flush()
+        if len(new) < len(ids):
+            # Readers reload the index when the IDs change
+            os.utime(self._path(ids_name))
+        # The rows are appended before the IDs, so that readers never see an ID
+        # without its rows
+        for name, rows in arrays.items():
+            with open(self._path(name), 'ab') as file:
+                file.write(np.ascontiguousarray(rows[new]).tobytes())
+        with open(self._path(ids_name), 'a', encoding='utf-8') as file:
+            file.write(''.join(f'{ids[position]}\n' for position in new))
+
+    def query(self, wavenumber, intensity, k=10, n_probe=None) -> list:
+        """
+        Returns the `k` spectra of the index that are closest to a spectrum.
+
+        Args:
+            wavenumber (np.ndarray): The wavenumbers of the spectrum.
+            intensity (np.ndarray): The spectrum.
+            k (int): The number of neighbours.
+            n_probe (int): The number of closest clusters searched by an
+            approximate query. All spectra are compared if it is `None`.
+
+        Returns:
+            list: The IDs and distances of the neighbours, closest first.
+        """
+        arrays = self._arrays()
+        if not arrays['meta']['fitted'] or not len(arrays['ids']):
+            return []
+        query = self.embed(wavenumber, intensity)[:1]
+        if n_probe is None:
+            indices, distances = nearest(
+                query, arrays['embeddings'], k, arrays['squared_norms']
+            )
+            indices = indices[0]
+        else:
+            probes, _ = nearest(query, arrays['centroids'], n_probe)
+            bounds = arrays['bounds']
+            candidates = np.concatenate(
+                [
+                    arrays['order'][bounds[probe] : bounds[probe + 1]]
+                    for probe in probes[0]
+                ]
+            )
+            if not len(candidates):
+                return []
+            indices, distances = nearest(
+                query,
+                arrays['embeddings'][candidates],
+                k,
+                arrays['squared_norms'][candidates],
+            )
+            indices = candidates[indices[0]]
+        return [
+            (arrays['ids'][index], float(np.sqrt(distance)))
+            for index, distance in zip(indices, distances[0])
+        ]
@@ -0,0 +1,132 @@
+"""
+Stitching of multi-window (extended range) spectra.
+
+An extended range acquisition measures the spectral range in several windows that
+overlap slightly. When the windows are exported as one row, the spectral axis runs
+backwards at the start of every window that overlaps the preceding one, or jumps
+over a gap between windows. The windows are found from these breaks in the axis.
+A repeated wavenumber is not a break, its values are merged into their mean.
+The intensities of every window are matched to the preceding windows in their
+overlap and the windows are joined into one monotone spectrum. All spectra of a map
+share the axis and are stitched together, the loop only runs over the windows.
+"""
+
+import numpy as np
+
+from .resampling import Resampler
+
+# Columns of a window table
+WINDOW_COLUMNS = ('start', 'end', 'n_points', 'overlap')
+
+# Ratio of a step of the axis to the median step above which the axis jumps over a
+# gap between two windows
+GAP_FACTOR = 5.0
+# Smallest number of points of an overlap that the intensities are matched in
+MIN_OVERLAP_POINTS = 3
+
+
+def detect_windows(wavenumber) -> np.ndarray:
+    """
+    Finds the windows of a spectral axis by the steps that run against the
+    direction of the axis or are more than `GAP_FACTOR` times the median step.
+    Steps of zero, i.e. repeated wavenumbers, do not start a window.
+
+    Returns:
+        np.ndarray: The index of the first point of every window.
+    """
+    steps = np.diff(np.asarray(wavenumber, dtype=np.float64))
+    if not steps.size:
+        return np.zeros(1, dtype=np.int64)
+    steps = steps * (1.0 if np.median(steps) >= 0 else -1.0)
+    breaks = (steps < 0) | (steps > GAP_FACTOR * np.median(steps))
+    return np.concatenate([[0], np.flatnonzero(breaks) + 1])
+
+
+def merge_duplicates(wavenumber, spectra) -> tuple:
+    """
+    Sorts a window by wavenumber and merges the values of repeated wavenumbers
+    into their mean.
+
+    Returns:
+        tuple: The ascending unique axis and the (n_spectra x n_points) spectra.
+    """
+    unique, inverse, counts = np.unique(
+        wavenumber, return_inverse=True, return_counts=True
+    )
+    if unique.size == len(wavenumber):
+        order = np.argsort(wavenumber, kind='stable')
+        return wavenumber[order], spectra[:, order]
+    merged = np.zeros((len(spectra), unique.size))
+    np.add.at(merged.T, inverse, spectra.T)
+    return unique, merged / counts
+
+
+def stitch(wavenumber, intensity, starts=None) -> tuple:
+    """
+    Joins the windows of spectra into monotone spectra.
+
+    The windows are joined in the order of their lowest wavenumber. Every window is
+    scaled so that its mean intensity in the overlap with the preceding windows
+    equals theirs, and the overlap is blended linearly from the preceding windows
+    into the window. Windows without an overlap of `MIN_OVERLAP_POINTS` points are
+    joined as they are. Repeated wavenumbers of a window are merged, see
+    `merge_duplicates`.
+
+    Args:
+        wavenumber (np.ndarray): The spectral axis of all windows.
+        intensity (np.ndarray): A spectrum or one spectrum per row.
+        starts (np.ndarray): The first point of every window, see `detect_windows`
+            for the default.
+
+    Returns:
+        tuple: The stitched axis in the direction of the original axis, the
+        stitched spectra of the shape of `intensity` with the new number of points,
+        the (n_windows x 4) table of the windows, see `WINDOW_COLUMNS`, and the
+        (n_spectra x n_windows) scales of the windows, ordered by wavenumber.
+    """
+    x = np.asarray(wavenumber, dtype=np.float64)
+    spectra = np.atleast_2d(np.asarray(intensity, dtype=np.float64))
+    if starts is None:
+        starts = detect_windows(x)
+    bounds = list(zip(starts, [*starts[1:], len(x)]))
+    segments = []
+    for start, end in bounds:
+        segments.append(merge_duplicates(x[start:end], spectra[:, start:end]))
+    segments.sort(key=lambda segment: segment[0][0])
+
+    windows = np.zeros((len(segments), len(WINDOW_COLUMNS)))
+    scales = np.ones((len(spectra), len(segments)))
+    stitched_x, stitched = segments[0]
+    windows[0, :3] = stitched_x[0], stitched_x[-1], stitched_x.size
+    for index, (window_x, values) in enumerate(segments[1:], start=1):
+        windows[index, :3] = window_x[0], window_x[-1], window_x.size
+        overlap = stitched_x >= window_x[0]
+        if overlap.any():
+            windows[index, 3] = stitched_x[-1] - window_x[0]
+        # The window at the points of the overlap, NaN beyond the window
+        resampled = Resampler(stitched_x[overlap]).resample(window_x, values)
+        inside = ~np.isnan(resampled[0])
+        if inside.sum() >= MIN_OVERLAP_POINTS:
+            reference = stitched[:, overlap][:, inside].sum(axis=-1)
+            matched = resampled[:, inside].sum(axis=-1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                scale = reference / matched
+            scales[:, index] = np.where(np.isfinite(scale) & (scale > 0), scale, 1.0)
+        window = values * scales[:, index, None]
+        resampled = resampled * scales[:, index, None]
+        if overlap.any():
+            overlap_x = stitched_x[overlap]
+            span = overlap_x[-1] - window_x[0]
+            weight = (overlap_x - window_x[0]) / span if span > 0 else np.ones(1)
+            blended = (1.0 - weight) * stitched[:, overlap] + weight * resampled
+            stitched = stitched.copy()
+            stitched[:, overlap] = np.where(inside, blended, stitched[:, overlap])
+        after = window_x > stitched_x[-1]
+        stitched_x = np.concatenate([stitched_x, window_x[after]])
+        stitched = np.concatenate([stitched, window[:, after]], axis=1)
+
+    if x.size > 1 and np.median(np.diff(x)) < 0:
+        stitched_x = stitched_x[::-1]
+        stitched = stitched[:, ::-1]
+    shape = (*np.shape(intensity)[:-1], stitched_x.size)
+    return stitched_x, stitched.reshape(shape), windows, scales
@@ -1,3 +1,25 @@
+import gzip
+import io
+import json
+import re
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+# Number of values per HDF5 chunk of a 2-D dataset
+HDF5_CHUNK_VALUES = 2**17
+# Compression level of compressed archives
+GZIP_LEVEL = 6
+# Number of references kept by `resolve_reference`
+REFERENCE_CACHE_SIZE = 4096
+
+# References by upload, section definition and lab_id. The cache lives in the
+# process, so the entries of an upload that are processed by the same worker
+# share it.
+_reference_cache = OrderedDict()
+
+
 def get_reference(upload_id, entry_id):
     return f'../uploads/{upload_id}/archive/{entry_id}#/data'
 
@@ -8,18 +30,252 @@ def get_entry_id_from_file_name(file_name, archive):
     return hash(archive.metadata.upload_id, file_name)
 
 
-def create_archive(entity, archive, file_name) -> str:
-    import json
+def _is_raw_array(value) -> bool:
+    """
+    Whether a quantity value is written from its buffer. orjson writes non-finite
+    numbers as `null`, which NOMAD does not read back as numbers, so arrays with
+    them are written as lists like any other value.
+    """
+    return (
+        isinstance(value, np.ndarray)
+        and value.ndim > 0
+        and value.dtype.kind in 'biuf'
+        and (value.dtype.kind != 'f' or bool(np.isfinite(value).all()))
+    )
+
+
+def serialize_archive(entity, compression=None) -> bytes:
+    """
+    Serializes `entity` as the data section of an `.archive.json` file. The arrays
+    of the quantities are replaced by placeholders in the output of `m_to_dict`
+    and written by orjson from their buffers, without a Python object per value.
+
+    Args:
+        entity (EntryData): The section to write.
+        compression (str): `gzip` for a compressed `.archive.json.gz` file. NOMAD
+            only parses uncompressed archives, compressed archives are meant for
+            storage and transfer.
+
+    Returns:
+        bytes: The UTF-8 encoded JSON, compressed with `compression`.
+    """
+    import orjson
+
+    arrays = []
+
+    def exclude(definition, section):
+        value = section.__dict__.get(definition.name)
+        if _is_raw_array(value):
+            arrays.append((section, definition.name, value))
+            return True
+        return False
+
+    data = entity.m_to_dict(with_root_def=True, exclude=exclude)
+    # The dictionaries of the sections are found by their path from the root
+    dicts = {id(entity): data}
+
+    def section_dict(section):
+        result = dicts.get(id(section))
+        if result is None:
+            result = section_dict(section.m_parent)[section.m_parent_sub_section.name]
+            if section.m_parent_index != -1:
+                result = result[section.m_parent_index]
+            dicts[id(section)] = result
+        return result
+
+    marker = uuid.uuid4().hex
+    for index, (section, name, _) in enumerate(arrays):
+        section_dict(section)[name] = f'{marker}{index}'
+    parts = re.split(f'"{marker}([0-9]+)"', json.dumps({'data': data}))
+    chunks = [parts[0].encode()]
+    for index, text in zip(parts[1::2], parts[2::2]):
+        value = np.ascontiguousarray(arrays[int(index)][2])
+        chunks.append(orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY))
+        chunks.append(text.encode())
+    content = b''.join(chunks)
+    if compression == 'gzip':
+        content = gzip.compress(content, compresslevel=GZIP_LEVEL, mtime=0)
+    elif compression is not None:
+        raise ValueError(f'Unknown compression {compression}.')
+    return content
+
+
+def dump_archive(entity, outfile, compression=None) -> None:
+    """
+    Writes `entity` as the data section of an `.archive.json` file, see
+    `serialize_archive`.
+
+    Args:
+        entity (EntryData): The section to write.
+        outfile: A text or binary file opened for writing, binary if compressed.
+        compression (str): See `serialize_archive`.
+    """
+    content = serialize_archive(entity, compression)
+    if isinstance(outfile, io.TextIOBase):
+        outfile.write(content.decode())
+    else:
+        outfile.write(content)
+
+
+def load_archive(file_path) -> dict:
+    """Reads an `.archive.json` or a compressed `.archive.json.gz` file."""
+    opener = gzip.open if file_path.endswith('.gz') else open
+    with opener(file_path, 'rb') as infile:
+        return json.loads(infile.read())
+
 
+def create_archive(entity, archive, file_name, overwrite=False) -> str:
+    """
+    Creates the entry `file_name` for `entity` in the upload unless the file exists
+    and returns the reference to the entry. With `overwrite`, an existing file is
+    replaced and processed again.
+
+    The file is opened in exclusive mode, so that of many workers creating the same
+    entry at once exactly one writes and processes it.
+    """
     from nomad.datamodel.context import ClientContext
 
     if isinstance(archive.m_context, ClientContext):
         return None
-    if not archive.m_context.raw_path_exists(file_name):
-        entity_entry = entity.m_to_dict(with_root_def=True)
-        with archive.m_context.raw_file(file_name, 'w') as outfile:
-            json.dump({'data': entity_entry}, outfile)
+    # The entry is serialized before the file is created, so that the file is
+    # complete as soon as possible
+    content = serialize_archive(entity)
+    try:
+        with archive.m_context.raw_file(
+            file_name, 'wb' if overwrite else 'xb'
+        ) as outfile:
+            outfile.write(content)
+    except FileExistsError:
+        pass
+    else:
         archive.m_context.process_updated_raw_file(file_name)
     return get_reference(
         archive.metadata.upload_id, get_entry_id_from_file_name(file_name, archive)
     )
+
+
+def load_processed_archive(archive):
+    """
+    Returns the archive of the previous processing of the entry of `archive`, or
+    `None` if it cannot be loaded, e.g. outside of a NOMAD server. An entry that was
+    not processed before is loaded from its raw file.
+    """
+    from nomad.datamodel.context import ServerContext
+    from nomad.metainfo import MetainfoReferenceError
+
+    metadata = archive.metadata
+    if (
+        not isinstance(archive.m_context, ServerContext)
+        or metadata is None
+        or metadata.entry_id is None
+    ):
+        return None
+    try:
+        return archive.m_context.load_archive(
+            metadata.entry_id, metadata.upload_id, None
+        )
+    except (MetainfoReferenceError, KeyError, OSError):
+        return None
+
+
+def resolve_reference(section, archive, logger, create=None) -> None:
+    """
+    Normalizes an `EntityReference` that is identified by its lab_id. The reference
+    found for a lab_id is memoized per upload, so that the entries of an upload
+    only search for it once.
+
+    Args:
+        section (EntityReference): The reference section to resolve.
+        archive (EntryArchive): The archive containing the section.
+        logger (BoundLogger): A structlog logger.
+        create (Callable): Returns a reference if the lab_id is not found, e.g. to
+        a newly created entry.
+    """
+    if section.reference is not None or not section.lab_id:
+        section.normalize(archive, logger)
+        return
+    key = (archive.metadata.upload_id, section.m_def.qualified_name(), section.lab_id)
+    reference = _reference_cache.get(key)
+    if reference is not None:
+        _reference_cache.move_to_end(key)
+        section.reference = reference
+        section.normalize(archive, logger)
+        return
+    section.normalize(archive, logger)
+    if section.reference is None and create is not None:
+        section.reference = create()
+    reference = getattr(section.reference, 'm_proxy_value', None)
+    if isinstance(reference, str):
+        _reference_cache[key] = reference
+        if len(_reference_cache) > REFERENCE_CACHE_SIZE:
+            _reference_cache.popitem(last=False)
+
+
+def write_hdf5_datasets(archive, file_name, datasets, compression='gzip') -> dict:
+    """
+    Writes arrays into a chunked and compressed HDF5 file in the raw folder of the
+    upload. 2-D datasets are chunked by whole rows, so that reading one spectrum of
+    a map only decompresses the chunk holding it.
+
+    Args:
+        archive (EntryArchive): The archive of the entry writing the file.
+        file_name (str): The path of the HDF5 file relative to the upload.
+        datasets (dict): Mapping of dataset paths, e.g. `/results/intensity`, to
+            arrays.
+        compression (str): The compression filter, `None` for no compression.
+
+    Returns:
+        dict: Mapping of the dataset paths to HDF5 references `file_name#path`.
+    """
+    import h5py
+
+    with archive.m_context.raw_file(file_name, 'wb') as outfile:
+        with h5py.File(outfile, 'w') as h5file:
+            for path, array in datasets.items():
+                value = np.asarray(array)
+                chunks = True if value.size else None
+                if value.ndim > 1 and value.size:
+                    n_rows = max(
+                        1, min(len(value), HDF5_CHUNK_VALUES // value.shape[1])
+                    )
+                    chunks = (n_rows, *value.shape[1:])
+                h5file.create_dataset(
+                    path,
+                    data=value,
+                    chunks=chunks,
+                    compression=compression if chunks else None,
+                    shuffle=compression is not None and chunks is not None,
+                )
+    return {path: f'{file_name}#{path}' for path in datasets}
+
+
+def read_hdf5_dataset(archive, reference, selection=()):
+    """
+    Reads a dataset, or only a slice of it, from an HDF5 file in the upload.
+
+    Args:
+        archive (EntryArchive): The archive of the entry reading the file.
+        reference (str): The HDF5 reference `file_name#path` of the dataset.
+        selection (tuple): The slice of the dataset to read, e.g. `(5, slice(None))`
+            for the spectrum of the sixth point of a map. The whole dataset is read
+            by default.
+    """
+    import h5py
+
+    file_name, path = reference.split('#', 1)
+    with archive.m_context.raw_file(file_name, 'rb') as infile:
+        with h5py.File(infile, 'r') as h5file:
+            return h5file[path][selection]
+
+
+def read_hdf5_shape(archive, reference) -> tuple:
+    """
+    Returns the shape of a dataset in an HDF5 file in the upload without reading
+    the dataset.
+    """
+    import h5py
+
+    file_name, path = reference.split('#', 1)
+    with archive.m_context.raw_file(file_name, 'rb') as infile:
+        with h5py.File(infile, 'r') as h5file:
+            return h5file[path].shape
@@ -1,4 +1,40 @@
+import re
+
+
 def test_importing_app():
     # this will raise an exception if pydantic model validation fails for th app
     from nomad_ikz_raman.apps import myapp
 
+
+def test_raman_app_quantities():
+    from nomad_ikz_raman.apps import ramanapp
+    from nomad_ikz_raman.schema_packages.raman import SpectralDescriptors
+
+    app = ramanapp.app
+    search_quantities = [column.search_quantity for column in app.columns] + [
+        getattr(item, 'search_quantity', None) or item.x.search_quantity
+        for item in app.menu.items
+    ]
+    descriptors = [
+        match.group(1)
+        for search_quantity in search_quantities
+        if (match := re.match(r'data\.descriptors\.(\w+)#', search_quantity))
+    ]
+
+    assert descriptors
+    for name in descriptors:
+        assert SpectralDescriptors.m_def.all_quantities.get(name) is not None
+
+
+def test_raman_app_terms():
+    from nomad.config.models.ui import MenuItemTerms
+
+    from nomad_ikz_raman.apps import ramanapp
+    from nomad_ikz_raman.schema_packages.raman import SpectralDescriptors
+
+    # Quantities with a unit are indexed in SI units and are filtered by histograms
+    for item in ramanapp.app.menu.items:
+        if isinstance(item, MenuItemTerms):
+            match = re.match(r'data\.descriptors\.(\w+)#', item.search_quantity)
+            quantity = SpectralDescriptors.m_def.all_quantities[match.group(1)]
+            assert quantity.unit is None, item.title
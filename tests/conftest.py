@@ -0,0 +1,84 @@
+import os.path
+import re
+import shutil
+
+import numpy as np
+import pytest
+from nomad.client import normalize_all, parse
+from nomad.datamodel.metainfo.basesections import EntityReference
+
+from nomad_ikz_raman.schema_packages.raman import configuration
+
+
+def write_raman_map(source, target, n_rows):
+    """
+    Writes a copy of the Horiba XML export `source` whose `LSX_Matrix` holds
+    `n_rows` rows. Row `i` is the spectrum of `source` scaled by `i + 1`.
+    """
+    with open(source, encoding='utf-8') as file:
+        content = file.read()
+    row = re.search(r'<LSX_Row[^>]*>(.*?)</LSX_Row>', content, re.DOTALL)
+    intensities = np.fromstring(row.group(1), sep=' ')
+    rows = ''.join(
+        f'\t\t<LSX_Row Format="6" Index="{index}" Size="{intensities.size}">\n'
+        f'\t\t{" ".join(map(str, intensities * (index + 1)))}\n'
+        '\t\t</LSX_Row>\n'
+        for index in range(n_rows)
+    )
+    content = re.sub(
+        r'(<LSX_Matrix[^>]*>\n).*?(\t</LSX_Matrix>)',
+        lambda match: match.group(1) + rows + match.group(2),
+        content,
+        flags=re.DOTALL,
+    )
+    with open(target, 'w', encoding='utf-8') as file:
+        file.write(content)
+
+
+@pytest.fixture
+def raman_map_file(tmp_path):
+    """
+    Returns a function that writes a map with the given number of rows based on
+    `tests/data/huhu.xml` and returns its path.
+    """
+
+    def write(n_rows):
+        target = str(tmp_path / f'map_{n_rows}.xml')
+        write_raman_map(os.path.join('tests', 'data', 'huhu.xml'), target, n_rows)
+        return target
+
+    return write
+
+
+@pytest.fixture
+def no_lab_id_search(monkeypatch):
+    """
+    Skips resolving references from lab IDs, which needs the NOMAD search index.
+    """
+    monkeypatch.setattr(EntityReference, 'normalize', lambda *args: None)
+
+
+@pytest.fixture
+def raman_entry(tmp_path, monkeypatch):
+    """
+    Returns a function that parses and normalizes a `Ramanspectroscopy` entry for
+    the given data file and further quantities of the section.
+    """
+    upload_path = tmp_path / 'upload'
+    upload_path.mkdir()
+    monkeypatch.setattr(configuration, 'parse_cache_dir', str(tmp_path / 'cache'))
+
+    def process(data_file, **quantities):
+        shutil.copy(data_file, upload_path)
+        quantities['data_file'] = os.path.basename(data_file)
+        archive_file = upload_path / 'test_raman.archive.yaml'
+        archive_file.write_text(
+            'data:\n'
+            '  m_def: nomad_ikz_raman.schema_packages.raman.Ramanspectroscopy\n'
+            + ''.join(f'  {key}: {value}\n' for key, value in quantities.items())
+        )
+        entry_archive = parse(str(archive_file))[0]
+        normalize_all(entry_archive)
+        return entry_archive
+
+    return process
@@ -1,12 +1,132 @@
-import logging
+import os.path
+from types import SimpleNamespace
 
-from nomad.datamodel import EntryArchive
-from nomad_ikz_raman.parsers.myparser import MyParser
+from nomad.client import normalize_all, parse
+from nomad.config import config
+from nomad.datamodel import EntryArchive, EntryMetadata
+from nomad.datamodel.context import ClientContext
+from nomad.parsing.parsers import match_parser
+from nomad.utils import get_logger
 
+from nomad_ikz_raman.parsers import ramanparser
+from nomad_ikz_raman.parsers.ramanparser import RamanParser, configuration
+from nomad_ikz_raman.schema_packages import raman
+from nomad_ikz_raman.schema_packages.utils import dump_archive
 
-def test_parse_file():
-    parser = MyParser()
-    archive = EntryArchive()
-    parser.parse('tests/data/example.out', archive, logging.getLogger())
+# Number of leading bytes that suffice to recognize a Horiba XML export
+HEAD_SIZE = 256
 
-    assert archive.results.material.elements == ['H', 'O']
+
+def test_is_mainfile():
+    parser = config.get_plugin_entry_point('nomad_ikz_raman.parsers:ramanparser').load()
+    with open(os.path.join('tests', 'data', 'huhu.xml'), 'rb') as file:
+        head = file.read(HEAD_SIZE)
+
+    assert parser.is_mainfile('huhu.xml', 'text/xml', head, head.decode())
+    assert not parser.is_mainfile('huhu.txt', 'text/plain', head, head.decode())
+
+
+def test_match_mixed_upload(tmp_path):
+    other_files = {
+        'svg.xml': '<?xml version="1.0"?>\n<svg><text>&lt;LSX_Data&gt;</text></svg>',
+        'nested.xml': '<?xml version="1.0"?>\n<root>\n<LSX_Data>\n</LSX_Data>\n</root>',
+        'large.xml': '<?xml version="1.0"?>\n<root>\n'
+        + '<LSX_Data>0</LSX_Data>\n' * 2**20
+        + '</root>',
+    }
+    for file_name, content in other_files.items():
+        (tmp_path / file_name).write_text(content)
+
+    for file_name in other_files:
+        assert match_parser(str(tmp_path / file_name))[0] is None
+    for file_name in ['huhu.xml', '3611subs.xml']:
+        parser, _ = match_parser(os.path.join('tests', 'data', file_name))
+        assert isinstance(parser, RamanParser)
+
+
+def test_parse_without_eln_entry(monkeypatch, no_lab_id_search):
+    monkeypatch.setattr(configuration, 'create_eln_entry', False)
+    monkeypatch.setattr(raman.configuration, 'parse_cache', False)
+    parsed_files = []
+
+    def read_data_file(file_path, file_hash=None):
+        parsed_files.append(file_path)
+        return raman.parse_raman_xml(file_path)
+
+    monkeypatch.setattr(raman, 'read_data_file', read_data_file)
+    entry_archive = parse(os.path.join('tests', 'data', '3611subs.xml'))[0]
+    normalize_all(entry_archive)
+
+    assert isinstance(entry_archive.data, raman.Ramanspectroscopy)
+    assert entry_archive.data.title == '3611subs'
+    assert len(entry_archive.data.results[0].intensity) > 0
+    assert len(entry_archive.data.figures) == 1
+    assert len(parsed_files) == 1
+
+
+def test_parse_nested_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(configuration, 'create_eln_entry', True)
+    monkeypatch.setattr(configuration, 'rebuild_stale_archives', False)
+    created = {}
+    hashed_files = []
+
+    def create_archive(entity, archive, file_name, overwrite=False):
+        created[file_name] = entity
+
+    def hash_file(file_path):
+        hashed_files.append(file_path)
+        return 'hash'
+
+    monkeypatch.setattr(ramanparser, 'create_archive', create_archive)
+    monkeypatch.setattr(ramanparser, 'hash_file', hash_file)
+
+    def parse_nested_file():
+        archive = EntryArchive(
+            m_context=ClientContext(local_dir=str(tmp_path)),
+            metadata=EntryMetadata(mainfile='sub/3611subs.xml'),
+        )
+        RamanParser().parse(
+            os.path.join('tests', 'data', '3611subs.xml'), archive, get_logger(__name__)
+        )
+        return archive
+
+    archive = parse_nested_file()
+    # The entry is written where the ingest command writes it
+    assert list(created) == ['sub/3611subs.archive.json']
+    assert created['sub/3611subs.archive.json'].data_file == 'sub/3611subs.xml'
+    assert archive.metadata.entry_name == '3611subs.xml data file'
+    assert len(hashed_files) == 1
+    # The data file of an existing entry is not hashed again
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'sub' / '3611subs.archive.json').write_text('{}')
+    parse_nested_file()
+    assert len(hashed_files) == 1
+
+
+def test_entry_file_name(tmp_path):
+    archive = EntryArchive(m_context=ClientContext(local_dir=str(tmp_path)))
+
+    assert RamanParser.entry_file_name(archive, 'sub/a.b.xml') == 'sub/a.b.archive.json'
+    # An entry named by an earlier version is reused
+    (tmp_path / 'ab.archive.json').write_text('{}')
+    assert RamanParser.entry_file_name(archive, 'sub/a.b.xml') == 'ab.archive.json'
+    # unless an entry with the current name exists
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'sub' / 'a.b.archive.json').write_text('{}')
+    assert RamanParser.entry_file_name(archive, 'sub/a.b.xml') == 'sub/a.b.archive.json'
+
+
+def test_is_stale(tmp_path):
+    archive = SimpleNamespace(
+        m_context=SimpleNamespace(raw_file=lambda file_name: open(tmp_path / file_name))
+    )
+    entry = raman.Ramanspectroscopy(data_file='huhu.xml')
+    entry.processing_stamp = entry.stamp_processing('hash')
+    with open(tmp_path / 'huhu.archive.json', 'w') as file:
+        dump_archive(entry, file)
+    stamp = entry.stamp_processing('hash')
+
+    assert not RamanParser.is_stale(archive, 'huhu.archive.json', stamp)
+    assert not RamanParser.is_stale(archive, 'missing.archive.json', stamp)
+    stamp.reader_version = 'other'
+    assert RamanParser.is_stale(archive, 'huhu.archive.json', stamp)
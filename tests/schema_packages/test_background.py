@@ -0,0 +1,126 @@
+import os.path
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+from nomad.datamodel import EntryArchive
+
+from nomad_ikz_raman.schema_packages import background
+from nomad_ikz_raman.schema_packages.background import (
+    background_scales,
+    resampled_background,
+    subtract_background,
+)
+from nomad_ikz_raman.schema_packages.raman import BackgroundSettings, Ramanspectroscopy
+from nomad_ikz_raman.schema_packages.raman_horiba_xml_reader import parse_raman_xml
+
+SCALES = (0.5, 1.0, 2.0)
+
+
+def substrate(wavenumber):
+    return 50.0 + 500.0 * np.exp(-(((wavenumber - 520.7) / 4.0) ** 2))
+
+
+def layer(wavenumber):
+    return 300.0 * np.exp(-(((wavenumber - 300.0) / 8.0) ** 2))
+
+
+def test_background_scales():
+    wavenumber = np.linspace(100.0, 1000.0, 500)
+    reference = substrate(wavenumber)
+    spectra = np.stack([scale * reference for scale in SCALES])
+
+    scales = background_scales(spectra, reference, 'least_squares')
+    assert np.allclose(scales, SCALES)
+    assert np.allclose(subtract_background(spectra, reference, scales), 0.0)
+    assert np.allclose(background_scales(spectra, reference, 'exposure', 3.0), 3.0)
+    assert np.allclose(background_scales(spectra, reference, 'none'), 1.0)
+    with pytest.raises(ValueError):
+        background_scales(spectra, reference, 'unknown')
+
+
+def test_resampled_background(monkeypatch):
+    monkeypatch.setattr(background, '_background_cache', background.OrderedDict())
+    reference_x = np.linspace(100.0, 1000.0, 901)
+    grid = np.linspace(0.0, 900.0, 451)
+    calls = []
+
+    def load():
+        calls.append(1)
+        return reference_x, substrate(reference_x), 10.0
+
+    for _ in range(3):
+        resampled, exposure = resampled_background('substrate', grid, load)
+    assert len(calls) == 1
+    assert exposure == 10.0  # noqa: PLR2004
+    inside = grid >= reference_x[0]
+    assert np.allclose(resampled[inside], substrate(grid[inside]))
+    assert np.isnan(resampled[~inside]).all()
+    # An axis that differs is resampled again
+    resampled_background('substrate', grid[1:], load)
+    assert len(calls) == 2  # noqa: PLR2004
+    assert resampled_background('missing', grid, lambda: None) is None
+
+
+def test_subtract_background_entry(monkeypatch):
+    monkeypatch.setattr(background, '_background_cache', background.OrderedDict())
+    raman_dict = parse_raman_xml(os.path.join('tests', 'data', '3611subs.xml'))
+    reference_x = np.linspace(100.0, 1000.0, 3601)
+    raman_dict.update(
+        wavenumbers=reference_x,
+        intensities=substrate(reference_x),
+        map_intensities=None,
+    )
+    reference = Ramanspectroscopy(data_file='3611subs.xml')
+    reference.fill_from_raman_dict(raman_dict)
+
+    # A shifted axis and twice the exposure of the reference
+    wavenumber = np.linspace(150.0, 950.0, 700)
+    spectra = np.stack([layer(wavenumber) + 2.0 * substrate(wavenumber)] * 2)
+    raman_dict.update(
+        wavenumbers=wavenumber,
+        intensities=spectra[0],
+        map_intensities=spectra,
+        map_row_indices=np.arange(2),
+        map_coordinates=np.zeros((2, 3)),
+        AcquisitionTime=2.0 * raman_dict['AcquisitionTime'],
+    )
+    for data_file in ['sample_1.xml', 'sample_2.xml']:
+        entry = Ramanspectroscopy(
+            data_file=data_file,
+            background_settings=BackgroundSettings(reference=reference),
+        )
+        entry.fill_from_raman_dict(raman_dict)
+        assert entry.results[0].background_scale == pytest.approx(2.0)
+        assert np.allclose(entry.results[0].intensity, layer(wavenumber), atol=1.0)
+        assert np.allclose(entry.map_results.background_scales, 2.0)
+        assert np.allclose(entry.map_results.intensity, entry.results[0].intensity)
+    # The reference was resampled once for both samples
+    assert len(background._background_cache) == 1
+    # Processing the reference again changes the measurements that depend on it
+    stamp = entry.stamp_processing('hash')
+    raman_dict.update(
+        wavenumbers=reference_x,
+        intensities=2.0 * substrate(reference_x),
+        map_intensities=None,
+    )
+    reference.fill_from_raman_dict(raman_dict)
+    assert not entry.stamp_processing('hash').matches(stamp)
+    entry.fill_from_raman_dict(raman_dict)
+    assert len(background._background_cache) == 2  # noqa: PLR2004
+
+
+def test_missing_background():
+    reference = Ramanspectroscopy(data_file='substrate.xml')
+    settings = BackgroundSettings(reference=reference)
+    entry = Ramanspectroscopy(data_file='sample.xml', background_settings=settings)
+    logger = Mock()
+
+    # A reference without results is not subtracted and not versioned
+    assert settings.load(None) is None
+    assert settings.reference_key() == 'substrate.xml@None'
+    assert not entry.check_background(logger)
+    assert logger.warning.call_count == 1
+    # The spectra of a reference are read through the archive of its entry
+    archive = EntryArchive(m_context=Mock(), data=reference)
+    assert BackgroundSettings.reference_archive(reference) is archive
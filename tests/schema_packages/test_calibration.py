@@ -0,0 +1,141 @@
+import os.path
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+
+from nomad_ikz_raman.schema_packages import raman
+from nomad_ikz_raman.schema_packages.calibration import (
+    SILICON_LINE,
+    CalibrationStore,
+    apply_calibration,
+    fit_calibration,
+    reference_lines,
+)
+from nomad_ikz_raman.schema_packages.raman import (
+    CalibrationSettings,
+    Ramanspectroscopy,
+)
+from nomad_ikz_raman.schema_packages.raman_horiba_xml_reader import parse_raman_xml
+
+OFFSET = 3.0
+LASER = 532.0
+
+
+def peaks(wavenumber, positions):
+    return 100.0 + sum(
+        1000.0 / (1.0 + ((wavenumber - position) / 2.0) ** 2) for position in positions
+    )
+
+
+def test_fit_silicon():
+    wavenumber = np.linspace(300.0, 700.0, 800)
+    intensity = peaks(wavenumber, [SILICON_LINE - OFFSET])
+
+    coefficients, lines, measured = fit_calibration(
+        wavenumber, intensity, reference_lines('silicon')
+    )
+    assert coefficients == pytest.approx([OFFSET], abs=0.01)
+    assert measured == pytest.approx(lines - OFFSET, abs=0.01)
+    assert apply_calibration([SILICON_LINE - OFFSET], coefficients) == pytest.approx(
+        [SILICON_LINE], abs=0.01
+    )
+    with pytest.raises(ValueError):
+        fit_calibration(wavenumber, np.ones_like(wavenumber), [SILICON_LINE])
+
+
+def test_fit_neon():
+    lines = reference_lines('neon', LASER)
+    wavenumber = np.linspace(1500.0, 3000.0, 3000)
+    lines = lines[(lines > wavenumber[0]) & (lines < wavenumber[-1])]
+    # The axis is stretched by 0.2 % around its start
+    measured = wavenumber[0] + (lines - wavenumber[0]) / 1.002
+
+    coefficients, matched, _ = fit_calibration(
+        wavenumber, peaks(wavenumber, measured), lines, degree=1
+    )
+    assert len(matched) > 1
+    assert apply_calibration(measured, coefficients) == pytest.approx(lines, abs=0.05)
+    with pytest.raises(ValueError):
+        reference_lines('neon')
+
+
+def test_store(tmp_path):
+    store = CalibrationStore(str(tmp_path))
+    measured_at = datetime(2024, 7, 4, 11, 48)
+    store.put('key', {'measured_at': measured_at, 'coefficients': [OFFSET]})
+
+    found = store.find('key', measured_at + timedelta(hours=2), timedelta(hours=24))
+    assert found == {'measured_at': measured_at, 'coefficients': [OFFSET]}
+    assert (
+        store.find('key', measured_at + timedelta(days=2), timedelta(hours=24)) is None
+    )
+    assert store.find('other', measured_at, timedelta(hours=24)) is None
+
+    later = measured_at + timedelta(hours=10)
+    store.put('key', {'measured_at': later, 'coefficients': [0.0]})
+    assert store.find('key', later, timedelta(hours=24))['coefficients'] == [0.0]
+
+
+def test_calibrate_entry(tmp_path, monkeypatch):
+    monkeypatch.setattr(raman.configuration, 'calibration_dir', str(tmp_path))
+    raman_dict = parse_raman_xml(os.path.join('tests', 'data', '3611subs.xml'))
+    wavenumber = np.linspace(300.0, 700.0, 800)
+    raman_dict.update(
+        wavenumbers=wavenumber,
+        intensities=peaks(wavenumber, [SILICON_LINE - OFFSET]),
+        map_intensities=None,
+    )
+    reference = Ramanspectroscopy(
+        data_file='silicon.xml', calibration_settings=CalibrationSettings()
+    )
+    reference.fill_from_raman_dict(raman_dict)
+    assert reference.wavenumber_calibration.coefficients == pytest.approx(
+        [OFFSET], abs=0.01
+    )
+
+    # A later measurement with the same instrument is corrected without a fit
+    raman_dict['Date'] += timedelta(hours=1)
+    raman_dict['intensities'] = peaks(wavenumber, [400.0])
+    entry = Ramanspectroscopy(data_file='3611subs.xml')
+    entry.fill_from_raman_dict(raman_dict)
+    calibration = entry.wavenumber_calibration
+    assert calibration.reference_data_file == 'silicon.xml'
+    assert np.allclose(
+        entry.results[0].wavenumber.magnitude, wavenumber + OFFSET, atol=0.01
+    )
+    # The applied calibration changes the processing stamp of the measurement
+    stamp = entry.stamp_processing('hash')
+    monkeypatch.setattr(raman.configuration, 'calibration_validity_hours', 0.5)
+    assert not entry.stamp_processing('hash').matches(stamp)
+
+
+def test_missing_calibration(tmp_path, monkeypatch):
+    monkeypatch.setattr(raman.configuration, 'calibration_dir', None)
+    raman_dict = parse_raman_xml(os.path.join('tests', 'data', '3611subs.xml'))
+    wavenumber = np.linspace(300.0, 700.0, 800)
+    raman_dict.update(
+        wavenumbers=wavenumber,
+        intensities=peaks(wavenumber, [SILICON_LINE - OFFSET]),
+        map_intensities=None,
+    )
+    logger = Mock()
+    reference = Ramanspectroscopy(
+        data_file='silicon.xml', calibration_settings=CalibrationSettings()
+    )
+    # Without a calibration directory, nothing is stored or applied
+    reference.fill_from_raman_dict(raman_dict)
+    reference.check_calibration(logger)
+    assert reference.wavenumber_calibration is None
+    assert logger.warning.call_count == 1
+
+    monkeypatch.setattr(raman.configuration, 'calibration_dir', str(tmp_path))
+    reference.fill_from_raman_dict(raman_dict)
+    # A measurement outside of the validity of the stored calibration
+    raman_dict['Date'] += timedelta(days=2)
+    entry = Ramanspectroscopy(data_file='3611subs.xml')
+    entry.fill_from_raman_dict(raman_dict)
+    entry.check_calibration(logger)
+    assert entry.wavenumber_calibration is None
+    assert logger.info.call_args.kwargs['n_calibrations'] == 1
@@ -0,0 +1,31 @@
+import os.path
+
+import numpy as np
+
+from nomad_ikz_raman.schema_packages import parse_cache
+from nomad_ikz_raman.schema_packages.parse_cache import ParseCache
+
+
+def test_parse(tmp_path, monkeypatch):
+    data_file = os.path.join('tests', 'data', 'huhu.xml')
+    cache = ParseCache(str(tmp_path), 2**30)
+    parsed = cache.parse(data_file)
+
+    def fail(*args):
+        raise AssertionError('The data file was parsed again.')
+
+    monkeypatch.setattr(parse_cache, 'parse_raman_xml', fail)
+    cached = cache.parse(data_file)
+
+    assert cached.keys() == parsed.keys()
+    assert cached['Date'] == parsed['Date']
+    assert cached['Grating'] == parsed['Grating']
+    assert np.isnan(cached['DetectorGain'])
+    assert np.array_equal(cached['intensities'], parsed['intensities'])
+
+
+def test_evict(tmp_path):
+    cache = ParseCache(str(tmp_path), 0)
+    cache.parse(os.path.join('tests', 'data', 'huhu.xml'))
+
+    assert not list(tmp_path.glob('*.npz'))
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from nomad_ikz_raman.benchmark import SYNTHETIC_PEAKS, synthetic_spectra
+from nomad_ikz_raman.schema_packages.peaks import (
+    detect_peaks,
+    fit_signature,
+    fit_spectra,
+    fit_spectrum,
+)
+
+N_VALUES = 1015
+N_SPECTRA = 4
+# Smallest prominence that detects the weak, broad synthetic peak
+MIN_PROMINENCE = 0.03
+# Largest deviation of a fitted position from the true one in 1/cm, which includes
+# the random shift of the synthetic spectra
+POSITION_TOLERANCE = 2.0
+# Largest relative deviation of a fitted FWHM from the true one
+FWHM_TOLERANCE = 0.3
+
+
+@pytest.fixture
+def spectra():
+    return synthetic_spectra(N_VALUES, N_SPECTRA)
+
+
+def test_detect_peaks(spectra):
+    wavenumber, intensity = spectra
+    peaks = detect_peaks(wavenumber, intensity[0], min_prominence=MIN_PROMINENCE)
+
+    assert len(peaks) == len(SYNTHETIC_PEAKS)
+    # The detected maxima of the noisy spectrum lie within the peaks
+    for position, (true_position, half_width, _) in zip(peaks[:, 0], SYNTHETIC_PEAKS):
+        assert abs(position - true_position) < half_width
+
+
+def test_detect_peaks_flat():
+    wavenumber = np.linspace(100.0, 1000.0, N_VALUES)
+
+    assert detect_peaks(wavenumber, np.ones(N_VALUES)).shape == (0, 4)
+
+
+@pytest.mark.parametrize('profile', ['lorentzian', 'voigt'])
+def test_fit_spectrum(spectra, profile):
+    wavenumber, intensity = spectra
+    peaks = fit_spectrum(wavenumber, intensity[0], profile, MIN_PROMINENCE)
+
+    assert len(peaks) == len(SYNTHETIC_PEAKS)
+    # The synthetic peaks are given by their half width
+    for (position, fwhm, _, _), (true_position, half_width, _) in zip(
+        peaks, SYNTHETIC_PEAKS
+    ):
+        assert abs(position - true_position) < POSITION_TOLERANCE
+        assert abs(fwhm - 2 * half_width) < FWHM_TOLERANCE * 2 * half_width
+
+
+def test_fit_spectra_workers(spectra):
+    wavenumber, intensity = spectra
+    spectrum_index, table = fit_spectra(
+        wavenumber, intensity, min_prominence=MIN_PROMINENCE
+    )
+    pool_index, pool_table = fit_spectra(
+        wavenumber, intensity, min_prominence=MIN_PROMINENCE, workers=2
+    )
+
+    assert spectrum_index.tolist() == sorted(
+        list(range(N_SPECTRA)) * len(SYNTHETIC_PEAKS)
+    )
+    assert np.array_equal(spectrum_index, pool_index)
+    assert np.allclose(table, pool_table)
+
+
+def test_fit_signature(spectra):
+    wavenumber, intensity = spectra
+    signature = fit_signature(wavenumber, intensity, profile='lorentzian')
+
+    assert signature == fit_signature(wavenumber, intensity, profile='lorentzian')
+    assert signature != fit_signature(wavenumber, intensity, profile='voigt')
+    assert signature != fit_signature(wavenumber, intensity[:1], profile='lorentzian')
@@ -0,0 +1,36 @@
+import numpy as np
+
+from nomad_ikz_raman.schema_packages.plotting import (
+    minmax_downsample,
+    spectrum_figure,
+)
+
+N_POINTS = 10001
+MAX_POINTS = 100
+SPIKE = 1234
+
+
+def test_minmax_downsample():
+    x = np.arange(N_POINTS, dtype=float)
+    y = np.sin(x / 100)
+    y[SPIKE] = 10.0
+    y[SPIKE + 1] = -10.0
+
+    x_down, y_down = minmax_downsample(x, y, MAX_POINTS)
+    assert x_down.size <= MAX_POINTS
+    assert np.all(np.diff(x_down) >= 0)
+    assert y_down.max() == y.max()
+    assert y_down.min() == y.min()
+    assert np.array_equal(y[x_down.astype(int)], y_down)
+
+    x_short, _ = minmax_downsample(x[:MAX_POINTS], y[:MAX_POINTS], MAX_POINTS)
+    assert x_short.size == MAX_POINTS
+
+
+def test_spectrum_figure():
+    x = np.arange(N_POINTS, dtype=float)
+    figure = spectrum_figure(x, x**2, max_points=MAX_POINTS)
+
+    assert len(figure['data'][0]['x']) <= MAX_POINTS
+    assert figure['data'][0]['y'][-1] == x[-1] ** 2
+    assert figure['layout']['xaxis']['title']['text'] == 'Wavenumber [1/cm]'
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from nomad_ikz_raman.benchmark import synthetic_spectra
+from nomad_ikz_raman.schema_packages.preprocessing import (
+    als_baseline,
+    despike,
+    normalize,
+    polynomial_baseline,
+    preprocess,
+    solve_pentadiagonal,
+    spike_mask,
+)
+
+N_VALUES = 1015
+N_SPECTRA = 20
+SPIKE = 250
+# Largest deviation of an estimated baseline from the true one, relative to the
+# height of the strongest peak
+BASELINE_TOLERANCE = 0.05
+
+
+@pytest.fixture
+def spectra():
+    wavenumber, intensity = synthetic_spectra(N_VALUES, N_SPECTRA)
+    baseline = 1e-3 * (wavenumber - 400.0) ** 2
+    return wavenumber, intensity + baseline, baseline
+
+
+def test_solve_pentadiagonal():
+    rng = np.random.default_rng(0)
+    diagonal = rng.uniform(5.0, 6.0, (N_VALUES, N_SPECTRA))
+    first = rng.uniform(-1.0, 1.0, N_VALUES - 1)
+    second = rng.uniform(-0.5, 0.5, N_VALUES - 2)
+    rhs = rng.normal(size=(N_VALUES, N_SPECTRA))
+
+    solution = solve_pentadiagonal(diagonal, first, second, rhs)
+    off_diagonals = (
+        np.diag(first, 1)
+        + np.diag(first, -1)
+        + np.diag(second, 2)
+        + np.diag(second, -2)
+    )
+    for column in range(N_SPECTRA):
+        matrix = np.diag(diagonal[:, column]) + off_diagonals
+        assert np.allclose(matrix @ solution[:, column], rhs[:, column])
+
+
+def test_despike(spectra):
+    _, intensity, _ = spectra
+    spiked = intensity.copy()
+    spiked[3, SPIKE] += 1e4
+    spiked[7, SPIKE : SPIKE + 2] += 1e3
+
+    mask = spike_mask(spiked)
+    assert mask[3, SPIKE]
+    assert mask[7, SPIKE : SPIKE + 2].all()
+    assert not spike_mask(intensity).any()
+    despiked = despike(spiked)
+    assert abs(despiked[3, SPIKE] - intensity[3, SPIKE]) < intensity[3].std()
+    assert np.array_equal(despiked[0], spiked[0])
+
+
+@pytest.mark.parametrize('method', ['als', 'polynomial'])
+def test_baseline(spectra, method):
+    wavenumber, intensity, baseline = spectra
+
+    if method == 'als':
+        estimate = als_baseline(intensity, smoothness=1e6)
+    else:
+        estimate = polynomial_baseline(wavenumber, intensity, degree=2)
+    assert estimate.shape == intensity.shape
+    deviation = np.abs(estimate - baseline - estimate.mean() + baseline.mean())
+    assert np.median(deviation) < BASELINE_TOLERANCE * intensity.max()
+    # Spectra are processed independently of each other
+    assert np.allclose(als_baseline(intensity[5]), als_baseline(intensity)[5])
+
+
+def test_normalize(spectra):
+    wavenumber, intensity, _ = spectra
+
+    assert np.allclose(np.abs(normalize(wavenumber, intensity, 'max')).max(axis=1), 1)
+    snv = normalize(wavenumber, intensity, 'snv')
+    assert np.allclose(snv.mean(axis=1), 0)
+    assert np.allclose(snv.std(axis=1), 1)
+    area = normalize(wavenumber, intensity, 'area')
+    # The trapezoidal rule, np.trapezoid is only available in NumPy 2
+    integral = ((area[:, 1:] + area[:, :-1]) / 2.0 * np.diff(wavenumber)).sum(axis=1)
+    assert np.allclose(integral, 1)
+
+
+def test_preprocess(spectra):
+    wavenumber, intensity, _ = spectra
+
+    processed = preprocess(wavenumber, intensity, normalization='max')
+    assert processed.shape == intensity.shape
+    assert np.allclose(processed.max(axis=1), 1)
+    assert np.allclose(
+        preprocess(wavenumber, intensity[0]), preprocess(wavenumber, intensity)[0]
+    )
@@ -0,0 +1,84 @@
+import os.path
+
+import numpy as np
+import pytest
+
+from nomad_ikz_raman.schema_packages import raman
+from nomad_ikz_raman.schema_packages.quality import (
+    QUALITY_COLUMNS,
+    quality_flags,
+    quality_metrics,
+)
+from nomad_ikz_raman.schema_packages.raman import Ramanspectroscopy
+from nomad_ikz_raman.schema_packages.raman_horiba_xml_reader import parse_raman_xml
+
+N_VALUES = 1000
+NOISE = 2.0
+HEIGHT = 1000.0
+
+
+def spectra():
+    """A clean, a saturated, a spiked and a noisy spectrum."""
+    rng = np.random.default_rng(0)
+    wavenumber = np.linspace(100.0, 1000.0, N_VALUES)
+    band = 100.0 + HEIGHT * np.exp(-(((wavenumber - 520.7) / 10.0) ** 2))
+    noise = rng.normal(0.0, NOISE, (4, N_VALUES))
+    intensity = band + noise
+    intensity[1] = np.minimum(intensity[1], 600.0)
+    intensity[2, 200] += 500.0
+    intensity[3] = 100.0 + 50.0 * noise[3]
+    return wavenumber, intensity
+
+
+def test_quality_metrics():
+    _, intensity = spectra()
+    metrics = quality_metrics(intensity)
+
+    assert metrics.shape == (len(intensity), len(QUALITY_COLUMNS))
+    snr, saturation, spikes, dynamic_range, noise = metrics.T
+    assert noise[0] == pytest.approx(NOISE, rel=0.1)
+    assert snr[0] == pytest.approx(HEIGHT / NOISE, rel=0.1)
+    assert dynamic_range[0] > snr[0]
+    assert saturation[0] == 0.0
+    assert saturation[1] > 0.0
+    assert spikes.tolist() == [0, 0, 1, 0]
+    assert quality_flags(metrics).tolist() == [
+        [False, False, False],
+        [True, False, False],
+        [False, False, True],
+        [False, True, False],
+    ]
+    # A single spectrum gives a single row of metrics
+    assert np.allclose(quality_metrics(intensity[0]), metrics[0])
+    # With a saturation level, only the values at the level are saturated
+    levels = quality_metrics(intensity, saturation_level=600.0)[:, 1]
+    assert levels[1] == saturation[1]
+    assert levels[0] > 0.0
+
+
+def test_quality_entry(monkeypatch):
+    monkeypatch.setattr(raman.configuration, 'saturation_level', None)
+    wavenumber, intensity = spectra()
+    raman_dict = parse_raman_xml(os.path.join('tests', 'data', '3611subs.xml'))
+    raman_dict.update(
+        wavenumbers=wavenumber,
+        intensities=intensity[0],
+        map_intensities=intensity,
+        map_row_indices=np.arange(len(intensity)),
+        map_coordinates=np.zeros((len(intensity), 3)),
+    )
+    entry = Ramanspectroscopy(data_file='3611subs.xml')
+    entry.fill_from_raman_dict(raman_dict)
+
+    quality = entry.results[0].quality
+    assert quality.flags == []
+    assert quality.noise_floor == pytest.approx(NOISE, rel=0.1)
+    map_quality = entry.map_results.quality
+    assert np.allclose(map_quality.snr, quality_metrics(intensity)[:, 0])
+    assert map_quality.total_spike_count == 1
+    assert map_quality.n_flagged == 3  # noqa: PLR2004
+    assert sorted(map_quality.flags) == ['low_snr', 'saturated', 'spikes']
+
+    entry.set_descriptors(wavenumber, intensity[0])
+    assert entry.descriptors.snr == map_quality.median_snr
+    assert entry.descriptors.spike_count == 1
@@ -0,0 +1,205 @@
+import logging
+import os.path
+
+import numpy as np
+from nomad.client import normalize_all, parse
+
+from nomad_ikz_raman.schema_packages import raman as raman_module
+from nomad_ikz_raman.schema_packages.raman import configuration
+from nomad_ikz_raman.schema_packages.raman_horiba_xml_reader import parse_raman_xml
+from nomad_ikz_raman.schema_packages.similarity import SimilarityIndex
+from nomad_ikz_raman.schema_packages.utils import dump_archive
+
+N_MAP_ROWS = 3
+PLOT_MAX_POINTS = 100
+
+
+def test_spectrum(raman_entry, no_lab_id_search, monkeypatch):
+    monkeypatch.setattr(configuration, 'plot_max_points', PLOT_MAX_POINTS)
+    entry_archive = raman_entry(os.path.join('tests', 'data', '3611subs.xml'))
+    raman = entry_archive.data
+
+    assert raman.title == '3611subs'
+    assert raman.results[0].intensity.shape == raman.results[0].wavenumber.shape
+    assert raman.map_results is None
+    trace = raman.figures[0].figure['data'][0]
+    assert len(trace['x']) <= PLOT_MAX_POINTS
+    assert max(trace['y']) == raman.results[0].intensity.max()
+    # Without a peak fit, the main peak is the highest intensity
+    assert raman.descriptors.main_peak_position.magnitude == (
+        raman.results[0].wavenumber[raman.results[0].intensity.argmax()].magnitude
+    )
+
+
+def test_map(raman_map_file, raman_entry, no_lab_id_search):
+    entry_archive = raman_entry(raman_map_file(N_MAP_ROWS))
+    raman = entry_archive.data
+    spectrum = raman.results[0].intensity
+
+    assert raman.map_results.n_points == N_MAP_ROWS
+    assert raman.map_results.intensity.shape == (N_MAP_ROWS, spectrum.size)
+    assert np.allclose(raman.map_results.intensity[-1], spectrum * N_MAP_ROWS)
+    assert raman.map_results.row_index.tolist() == list(range(N_MAP_ROWS))
+
+
+def test_preprocessing(raman_map_file, raman_entry, no_lab_id_search):
+    entry_archive = raman_entry(
+        raman_map_file(N_MAP_ROWS),
+        preprocessing_settings='{normalization: max}',
+        hdf5_storage='true',
+    )
+    raman = entry_archive.data
+    _, processed = raman.results[0].processed.get_spectra(entry_archive)
+    _, processed_map = raman.map_results.processed.get_spectra(entry_archive)
+
+    assert processed.shape == raman.results[0].get_spectra(entry_archive)[1].shape
+    assert processed.max() == 1
+    assert processed_map.shape == (N_MAP_ROWS, processed.size)
+    # The rows of the map are the same spectrum scaled
+    assert np.allclose(processed_map, processed)
+    assert len(raman.figures) == 2  # noqa: PLR2004
+
+
+def test_hdf5_storage(raman_map_file, raman_entry, no_lab_id_search):
+    entry_archive = raman_entry(raman_map_file(N_MAP_ROWS), hdf5_storage='true')
+    raman = entry_archive.data
+    wavenumber, spectrum = raman.results[0].get_spectra(entry_archive)
+    _, last_spectrum = raman.map_results.get_spectra(entry_archive, (-1, slice(None)))
+
+    assert raman.results[0].intensity is None
+    assert raman.map_results.intensity is None
+    assert raman.map_results.intensity_hdf5 == f'map_{N_MAP_ROWS}.h5#/map/intensity'
+    assert raman.results[0].intensity_max == spectrum.max()
+    assert wavenumber.shape == spectrum.shape
+    assert np.allclose(last_spectrum, spectrum * N_MAP_ROWS)
+
+
+def test_peak_fit(raman_map_file, raman_entry, no_lab_id_search, monkeypatch):
+    data_file = raman_map_file(N_MAP_ROWS)
+    entry_archive = raman_entry(data_file, peak_fit_settings='{max_peaks: 3}')
+    raman = entry_archive.data
+    peaks = raman.results[0].peaks
+    map_peaks = raman.map_results.peaks
+
+    assert 0 < peaks.n_peaks <= 3  # noqa: PLR2004
+    assert peaks.spectrum_index.tolist() == [0] * peaks.n_peaks
+    assert peaks.main_peak_position in peaks.position
+    assert map_peaks.n_peaks == N_MAP_ROWS * peaks.n_peaks
+    # The rows of the map are the same spectrum scaled
+    assert np.isclose(
+        map_peaks.main_peak_position.magnitude, peaks.main_peak_position.magnitude
+    )
+
+    # Unchanged spectra are not fitted again
+    def fail(*args, **kwargs):
+        raise AssertionError('The peaks were fitted again')
+
+    monkeypatch.setattr(raman_module, 'fit_spectra', fail)
+    raman.fill_from_raman_dict(parse_raman_xml(data_file), None)
+    assert raman.map_results.peaks.fit_signature == map_peaks.fit_signature
+    assert np.array_equal(
+        raman.map_results.peaks.position.magnitude, map_peaks.position.magnitude
+    )
+
+
+def test_descriptors(raman_map_file, raman_entry, no_lab_id_search):
+    entry_archive = raman_entry(
+        raman_map_file(N_MAP_ROWS), peak_fit_settings='{max_peaks: 3}'
+    )
+    raman = entry_archive.data
+    descriptors = raman.descriptors
+    settings = raman.measurement_settings
+
+    assert descriptors.n_spectra == N_MAP_ROWS
+    assert descriptors.laser_wavelength == settings.laser
+    assert descriptors.grating == settings.grating
+    assert descriptors.sample_lab_id == raman.samples[0].lab_id
+    assert descriptors.wavenumber_min == raman.results[0].wavenumber_min
+    assert descriptors.main_peak_position == (
+        raman.map_results.peaks.main_peak_position
+    )
+
+
+def test_similarity_index(tmp_path, raman_entry, no_lab_id_search, monkeypatch):
+    monkeypatch.setattr(configuration, 'similarity_index_dir', str(tmp_path / 'index'))
+    entry_archive = raman_entry(os.path.join('tests', 'data', '3611subs.xml'))
+
+    index = SimilarityIndex(str(tmp_path / 'index'))
+    assert len(index) == 1
+    # Normalizing the entry again replaces its spectrum
+    entry_archive.data.normalize(entry_archive, logging.getLogger())
+    assert len(index) == 1
+
+
+def test_reprocessing(tmp_path, raman_entry, no_lab_id_search, monkeypatch):
+    entry_archive = raman_entry(os.path.join('tests', 'data', '3611subs.xml'))
+    stamp = entry_archive.data.processing_stamp
+    archive_file = tmp_path / 'upload' / 'processed.archive.json'
+    with open(archive_file, 'w') as file:
+        dump_archive(entry_archive.data, file)
+    parsed_files = []
+    read_data_file = raman_module.read_data_file
+
+    def count_reads(file_path, file_hash=None):
+        parsed_files.append(file_path)
+        return read_data_file(file_path, file_hash)
+
+    monkeypatch.setattr(raman_module, 'read_data_file', count_reads)
+
+    def reprocess():
+        entry_archive = parse(str(archive_file))[0]
+        normalize_all(entry_archive)
+        return entry_archive.data
+
+    # An unchanged entry is not processed again
+    raman = reprocess()
+    assert not parsed_files
+    assert raman.processing_stamp.matches(stamp)
+    assert raman.figures
+    monkeypatch.setattr(configuration, 'force_reprocessing', True)
+    reprocess()
+    assert len(parsed_files) == 1
+    monkeypatch.setattr(configuration, 'force_reprocessing', False)
+    # A changed data file is processed again
+    data_file = tmp_path / 'upload' / '3611subs.xml'
+    data_file.write_bytes(data_file.read_bytes() + b'\n')
+    raman = reprocess()
+    assert len(parsed_files) == 2  # noqa: PLR2004
+    assert raman.processing_stamp.data_file_hash != stamp.data_file_hash
+
+
+def test_reprocessing_eln_entry(tmp_path, raman_entry, no_lab_id_search, monkeypatch):
+    processed = raman_entry(os.path.join('tests', 'data', '3611subs.xml'))
+    # The entry that the parser creates holds the stamp but no results
+    entry = raman_module.Ramanspectroscopy(data_file='3611subs.xml')
+    stamp = processed.data.processing_stamp
+    intensity = processed.data.results[0].intensity
+    entry.processing_stamp = stamp.m_copy()
+    archive_file = tmp_path / 'upload' / '3611subs.archive.json'
+    with open(archive_file, 'w') as file:
+        dump_archive(entry, file)
+    parsed_files = []
+    read_data_file = raman_module.read_data_file
+
+    def count_reads(file_path, file_hash=None):
+        parsed_files.append(file_path)
+        return read_data_file(file_path, file_hash)
+
+    monkeypatch.setattr(raman_module, 'read_data_file', count_reads)
+
+    def reprocess(previous):
+        monkeypatch.setattr(raman_module, 'load_processed_archive', lambda _: previous)
+        entry_archive = parse(str(archive_file))[0]
+        normalize_all(entry_archive)
+        return entry_archive.data
+
+    # The results are restored from the previous processing of the entry
+    raman = reprocess(processed)
+    assert not parsed_files
+    assert raman.title == '3611subs'
+    assert np.allclose(raman.results[0].intensity, intensity)
+    assert raman.figures
+    # Without a previous processing, the data file is processed
+    raman = reprocess(None)
+    assert len(parsed_files) == 1
+    assert raman.processing_stamp.matches(stamp)
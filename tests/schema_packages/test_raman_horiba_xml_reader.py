@@ -0,0 +1,148 @@
+import os.path
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pytest
+
+from nomad_ikz_raman.benchmark import synthetic_lsx_data
+from nomad_ikz_raman.schema_packages.raman_horiba_xml_reader import (
+    VALUE_ID,
+    decode_lsx_array,
+    index_lsx_tree,
+    iter_intensity_rows,
+    map_coordinates,
+    parse_raman_metadata,
+    parse_raman_xml,
+    resolve_lsx_path,
+)
+
+N_POINTS = 1013
+GRATING = 1800
+STAGE_X = -3103.5
+N_MAP_ROWS = 3
+
+
+def test_index_lsx_tree():
+    root = ET.parse(os.path.join('tests', 'data', 'huhu.xml')).getroot()
+    index = index_lsx_tree(root)
+
+    for path in [('0x6D746164', VALUE_ID), ('0x7CECDBD7', '*', VALUE_ID)]:
+        xpath = './/' + '/'.join(
+            'LSX' if lsx_id == '*' else f"LSX[@ID='{lsx_id}']" for lsx_id in path
+        )
+        assert resolve_lsx_path(index, path) is root.find(xpath)
+
+
+def test_parse_raman_xml():
+    raman_dict = parse_raman_xml(os.path.join('tests', 'data', '3611subs.xml'))
+
+    assert raman_dict['Title'] == '3611subs'
+    assert raman_dict['AcquisitionDate'] == '05.03.2024 14:20:02'
+    assert raman_dict['Windows'] == '2'
+    assert raman_dict['Grating'] == GRATING
+    assert raman_dict['InstrumentID'] == '-825368879'
+    assert raman_dict['X'] == STAGE_X
+    assert raman_dict['wavenumbers'].shape == (N_POINTS,)
+    assert raman_dict['intensities'].shape == (N_POINTS,)
+    assert raman_dict['intensities'].dtype == np.float64
+
+
+def test_parse_raman_metadata(tmp_path):
+    file_path = os.path.join('tests', 'data', '3611subs.xml')
+    raman_dict = parse_raman_xml(file_path)
+    # The spectra of a truncated file are not read
+    with open(file_path, 'rb') as file:
+        content = file.read()
+    truncated_path = tmp_path / 'truncated.xml'
+    truncated_path.write_bytes(content[: content.index(b'<LSX_Row') + 100])
+
+    metadata = parse_raman_metadata(str(truncated_path))
+    assert metadata.pop('n_points') == N_POINTS
+    assert metadata == {
+        key: value
+        for key, value in raman_dict.items()
+        if key not in ('wavenumbers', 'intensities')
+    }
+
+
+def test_decode_lsx_array():
+    row = ET.fromstring(
+        '<LSX_Row Format="6" Index="0" Size="3">\n 1 2.5\n\t3e2 </LSX_Row>'
+    )
+    values = decode_lsx_array(row, np.float32)
+
+    assert values.dtype == np.float32
+    assert values.tolist() == [1.0, 2.5, 300.0]
+
+    row.set('Size', '4')
+    with pytest.raises(ValueError, match='declares 4 values'):
+        decode_lsx_array(row)
+
+
+def test_iter_intensity_rows(raman_map_file):
+    file_path = raman_map_file(N_MAP_ROWS)
+    first = parse_raman_xml(file_path)['intensities']
+    rows = list(iter_intensity_rows(file_path))
+
+    assert [index for index, _ in rows] == list(range(N_MAP_ROWS))
+    for index, intensities in rows:
+        assert np.allclose(intensities, first * (index + 1))
+
+
+def test_parse_raman_map(raman_map_file, tmp_path):
+    file_path = raman_map_file(N_MAP_ROWS)
+    raman_dict = parse_raman_xml(file_path)
+    # The same map with the rows in reverse document order
+    tree = ET.parse(file_path)
+    matrix = tree.getroot().find('LSX_Matrix')
+    rows = list(matrix)
+    for row in rows:
+        matrix.remove(row)
+    matrix.extend(reversed(rows))
+    reversed_path = str(tmp_path / 'reversed.xml')
+    tree.write(reversed_path)
+    reversed_dict = parse_raman_xml(reversed_path)
+
+    assert raman_dict['map_intensities'].shape == (
+        N_MAP_ROWS,
+        raman_dict['wavenumbers'].size,
+    )
+    assert reversed_dict['map_row_indices'].tolist() == list(range(N_MAP_ROWS))
+    assert np.array_equal(
+        reversed_dict['map_intensities'], raman_dict['map_intensities']
+    )
+    assert np.array_equal(
+        reversed_dict['intensities'], raman_dict['map_intensities'][0]
+    )
+
+
+def test_parse_incomplete_map(tmp_path):
+    full_path = tmp_path / 'full.xml'
+    full_path.write_text(synthetic_lsx_data(16, 6))
+    full = parse_raman_xml(str(full_path))
+    # The same map without its last two points
+    tree = ET.parse(full_path)
+    matrix = tree.getroot().find('LSX_Matrix')
+    for row in list(matrix)[-2:]:
+        matrix.remove(row)
+    incomplete_path = str(tmp_path / 'incomplete.xml')
+    tree.write(incomplete_path)
+    incomplete = parse_raman_xml(incomplete_path)
+
+    assert incomplete['map_row_indices'].tolist() == [0, 1, 2, 3]
+    assert np.array_equal(incomplete['map_coordinates'], full['map_coordinates'][:4])
+    assert len(np.unique(incomplete['map_coordinates'], axis=0)) == 4  # noqa: PLR2004
+
+    list(matrix)[0].set('Index', '-1')
+    tree.write(incomplete_path)
+    with pytest.raises(ValueError, match='negative Index'):
+        parse_raman_xml(incomplete_path)
+
+
+def test_map_coordinates():
+    axes = {'X': np.array([0.0, 1.0, 2.0]), 'Y': np.array([10.0, 20.0])}
+    coordinates = map_coordinates(axes, {'Z': 5.0}, 6)
+
+    assert coordinates[:, 0].tolist() == [0.0, 1.0, 2.0] * 2
+    assert coordinates[:, 1].tolist() == [10.0] * 3 + [20.0] * 3
+    assert coordinates[:, 2].tolist() == [5.0] * 6
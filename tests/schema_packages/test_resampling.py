@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from nomad_ikz_raman.schema_packages.raman import MapResults, Results
+from nomad_ikz_raman.schema_packages.resampling import Resampler, resample_results
+
+N_VALUES = 50
+N_ROWS = 3
+
+
+@pytest.fixture
+def grid():
+    return np.arange(90.0, 210.0, 2.5)
+
+
+def axis(shift=0.0):
+    return np.linspace(100.0, 200.0, N_VALUES) + shift
+
+
+def expected(grid, wavenumber, intensity):
+    return np.array(
+        [
+            np.interp(grid, wavenumber, row, left=np.nan, right=np.nan)
+            for row in np.atleast_2d(intensity)
+        ]
+    )
+
+
+def test_resample(grid):
+    wavenumber = axis()
+    intensity = np.random.default_rng(0).normal(size=(N_ROWS, N_VALUES))
+    resampler = Resampler(grid)
+
+    resampled = resampler.resample(wavenumber[::-1], intensity[:, ::-1])
+
+    assert np.allclose(resampled, expected(grid, wavenumber, intensity), equal_nan=True)
+    # The weights of an axis are computed once
+    assert resampler.weights(wavenumber) is resampler.weights(wavenumber.copy())
+
+
+def test_resample_many(grid, tmp_path):
+    rng = np.random.default_rng(0)
+    spectra = [
+        (axis(), rng.normal(size=N_VALUES)),
+        (axis(0.3), rng.normal(size=(N_ROWS, N_VALUES))),
+        (axis(), rng.normal(size=N_VALUES)),
+    ]
+    rows = np.concatenate([expected(grid, *spectrum) for spectrum in spectra])
+    resampler = Resampler(grid, fill_value=0.0)
+
+    matrix = resampler.resample_many(spectra)
+    output = str(tmp_path / 'matrix.npy')
+    mapped = resampler.resample_many(
+        spectra, n_spectra=len(rows), output=output, dtype=np.float32
+    )
+
+    assert np.allclose(matrix, np.nan_to_num(rows))
+    assert isinstance(mapped, np.memmap)
+    assert np.allclose(np.load(output), np.nan_to_num(rows), atol=1e-6)
+    with pytest.raises(ValueError):
+        resampler.resample_many(spectra, n_spectra=len(rows) + 1)
+
+
+def test_resample_results(grid):
+    rng = np.random.default_rng(0)
+    spectrum = Results()
+    spectrum.set_spectra(axis(), rng.normal(size=N_VALUES))
+    spectrum_map = MapResults(n_points=N_ROWS)
+    spectrum_map.set_spectra(axis(0.3), rng.normal(size=(N_ROWS, N_VALUES)))
+
+    matrix = resample_results([(spectrum, None), (spectrum_map, None)], grid)
+
+    assert matrix.shape == (1 + N_ROWS, len(grid))
+    assert np.allclose(
+        matrix[1:],
+        expected(grid, axis(0.3), spectrum_map.intensity),
+        equal_nan=True,
+    )
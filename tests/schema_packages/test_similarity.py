@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from nomad_ikz_raman.benchmark import synthetic_spectra
+from nomad_ikz_raman.schema_packages.similarity import (
+    FIT_SPECTRA_PER_COMPONENT,
+    SimilarityIndex,
+    normalize_spectra,
+)
+
+N_VALUES = 1015
+N_SPECTRA = 200
+N_COMPONENTS = 8
+K = 5
+
+
+@pytest.fixture
+def spectra():
+    """Synthetic spectra with an extra peak at a random position each."""
+    wavenumber, intensity = synthetic_spectra(N_VALUES, N_SPECTRA)
+    rng = np.random.default_rng(1)
+    positions = rng.uniform(150.0, 950.0, (N_SPECTRA, 1))
+    intensity += 3000.0 / (1.0 + ((wavenumber - positions) / 5.0) ** 2)
+    return wavenumber, intensity
+
+
+def test_normalize_spectra():
+    resampled = np.array([[np.nan, 1.0, 2.0, 3.0], [2.0, 2.0, 2.0, 2.0]])
+    spectra = normalize_spectra(resampled)
+
+    assert np.allclose(spectra[0], [0.0, -1.0, 0.0, 1.0] / np.sqrt(2.0))
+    assert np.allclose(spectra[1], 0.0)
+
+
+def test_build_and_query(tmp_path, spectra):
+    wavenumber, intensity = spectra
+    index = SimilarityIndex(str(tmp_path), n_components=N_COMPONENTS)
+    index.build((str(row), wavenumber, intensity[row]) for row in range(N_SPECTRA))
+    index = SimilarityIndex(str(tmp_path))
+    query = intensity[7] + np.random.default_rng(2).normal(0.0, 5.0, N_VALUES)
+
+    exact = index.query(wavenumber, query, k=K)
+    approximate = index.query(wavenumber, query, k=K, n_probe=4)
+
+    assert len(index) == N_SPECTRA
+    assert [spectrum_id for spectrum_id, _ in exact][0] == '7'
+    assert [distance for _, distance in exact] == sorted(d for _, d in exact)
+    assert approximate[0] == exact[0]
+
+
+def test_add(tmp_path, spectra):
+    wavenumber, intensity = spectra
+    index = SimilarityIndex(str(tmp_path), n_components=N_COMPONENTS)
+    n_fit = N_COMPONENTS * FIT_SPECTRA_PER_COMPONENT
+    ids = [str(row) for row in range(N_SPECTRA)]
+
+    index.add(ids[: n_fit - 1], wavenumber, intensity[: n_fit - 1])
+    # The projection is only fitted once enough spectra were added
+    assert index.query(wavenumber, intensity[0]) == []
+    for row in range(n_fit - 1, N_SPECTRA):
+        index.add([ids[row]], wavenumber, intensity[row])
+    # Adding a known ID replaces its spectrum
+    index.add(['3'], wavenumber, intensity[100])
+
+    assert len(index) == N_SPECTRA
+    assert index.query(wavenumber, intensity[150], k=1)[0][0] == '150'
+    neighbours = dict(index.query(wavenumber, intensity[100], k=2))
+    assert neighbours.keys() == {'3', '100'}
+    assert neighbours['3'] == pytest.approx(0.0, abs=1e-6)
+
+
+def test_fit_pending(tmp_path, spectra):
+    wavenumber, intensity = spectra
+    index = SimilarityIndex(str(tmp_path), n_components=N_COMPONENTS)
+    ids = [str(row) for row in range(N_SPECTRA)]
+
+    for row in range(N_SPECTRA):
+        index.add([ids[row]], wavenumber, intensity[row], fit=False)
+    # Without fitting, the spectra only wait for the projection
+    assert index.query(wavenumber, intensity[0]) == []
+    assert len(index) == N_SPECTRA
+
+    assert index.fit_pending() == N_SPECTRA
+    assert index.fit_pending() == 0
+    assert index.query(wavenumber, intensity[150], k=1)[0][0] == '150'
@@ -0,0 +1,119 @@
+import os.path
+
+import numpy as np
+import pytest
+
+from nomad_ikz_raman.schema_packages.raman import Ramanspectroscopy
+from nomad_ikz_raman.schema_packages.raman_horiba_xml_reader import parse_raman_xml
+from nomad_ikz_raman.schema_packages.stitching import detect_windows, stitch
+
+N_VALUES = 400
+SCALES = (1.3, 0.8, 1.0)
+OVERLAP = 20.0
+
+
+def spectrum(wavenumber):
+    return 100.0 + 1000.0 * np.exp(-(((wavenumber - 520.7) / 5.0) ** 2))
+
+
+def windows():
+    """Two overlapping windows, the second scaled by `SCALES` per spectrum."""
+    first = np.linspace(100.0, 560.0, N_VALUES)
+    second = np.linspace(560.0 - OVERLAP, 1000.0, N_VALUES)
+    wavenumber = np.concatenate([first, second])
+    intensity = np.stack(
+        [
+            np.concatenate([spectrum(first), spectrum(second) * scale])
+            for scale in SCALES
+        ]
+    )
+    return wavenumber, intensity
+
+
+def test_detect_windows():
+    wavenumber, _ = windows()
+
+    assert detect_windows(wavenumber).tolist() == [0, N_VALUES]
+    assert detect_windows(wavenumber[::-1]).tolist() == [0, N_VALUES]
+    assert detect_windows(np.linspace(100.0, 1000.0, N_VALUES)).tolist() == [0]
+
+
+@pytest.mark.parametrize('descending', [False, True])
+def test_stitch(descending):
+    wavenumber, intensity = windows()
+    if descending:
+        wavenumber, intensity = wavenumber[::-1], intensity[:, ::-1]
+
+    stitched_x, stitched, table, scales = stitch(wavenumber, intensity)
+    steps = np.diff(stitched_x)
+    assert np.all(steps < 0) if descending else np.all(steps > 0)
+    assert stitched.shape == (len(SCALES), stitched_x.size)
+    assert np.allclose(stitched, spectrum(stitched_x))
+    assert np.allclose(scales[:, 1], 1.0 / np.array(SCALES))
+    assert np.allclose(table[:, 3], [0.0, OVERLAP])
+    # A single spectrum keeps its shape
+    assert stitch(wavenumber, intensity[0])[1].shape == stitched_x.shape
+
+
+def test_stitch_entry():
+    wavenumber, intensity = windows()
+    raman_dict = parse_raman_xml(os.path.join('tests', 'data', '3611subs.xml'))
+    raman_dict.update(
+        wavenumbers=wavenumber,
+        intensities=intensity[0],
+        map_intensities=intensity,
+        map_row_indices=np.arange(len(SCALES)),
+        map_coordinates=np.zeros((len(SCALES), 3)),
+    )
+    entry = Ramanspectroscopy(data_file='3611subs.xml')
+    entry.fill_from_raman_dict(raman_dict)
+
+    results = entry.results[0]
+    assert [window.n_points for window in results.windows] == [N_VALUES] * 2
+    assert results.windows[1].scale == pytest.approx(1.0 / SCALES[0])
+    assert np.all(np.diff(results.wavenumber.magnitude) > 0)
+    assert entry.map_results.window_scales.shape == (len(SCALES), 2)
+    assert np.allclose(entry.map_results.intensity, results.intensity)
+
+
+def test_duplicate_point():
+    wavenumber = np.linspace(100.0, 1000.0, N_VALUES)
+    wavenumber = np.insert(wavenumber, 3, wavenumber[3])
+    intensity = spectrum(wavenumber)
+
+    # A repeated wavenumber does not start a window
+    assert detect_windows(wavenumber).tolist() == [0]
+    raman_dict = parse_raman_xml(os.path.join('tests', 'data', '3611subs.xml'))
+    raman_dict.update(
+        wavenumbers=wavenumber, intensities=intensity, map_intensities=None
+    )
+    for declared in ['', '1']:
+        raman_dict['Windows'] = declared
+        entry = Ramanspectroscopy(data_file='3611subs.xml')
+        entry.fill_from_raman_dict(raman_dict)
+        assert not entry.results[0].windows
+        assert len(entry.results[0].intensity) == N_VALUES + 1
+
+    # In a multi-window spectrum, the values of a repeated wavenumber are merged
+    wavenumber, intensity = windows()
+    wavenumber = np.insert(wavenumber, 3, wavenumber[3])
+    intensity = np.insert(intensity, 3, intensity[:, 3], axis=1)
+    stitched_x, stitched, table, _ = stitch(wavenumber, intensity)
+    assert np.all(np.diff(stitched_x) > 0)
+    assert table[0, 2] == N_VALUES
+    assert np.allclose(stitched, spectrum(stitched_x))
+
+
+def test_declared_windows():
+    wavenumber, intensity = windows()
+    raman_dict = parse_raman_xml(os.path.join('tests', 'data', '3611subs.xml'))
+    raman_dict.update(
+        wavenumbers=wavenumber, intensities=intensity[0], map_intensities=None
+    )
+
+    # Detected windows that the data file does not declare are not stitched
+    for declared, n_windows in [('2', 2), ('', 2), ('1', 0), ('3', 0)]:
+        raman_dict['Windows'] = declared
+        entry = Ramanspectroscopy(data_file='3611subs.xml')
+        entry.fill_from_raman_dict(raman_dict)
+        assert len(entry.results[0].windows) == n_windows
@@ -0,0 +1,155 @@
+import json
+import logging
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from nomad.datamodel.metainfo.basesections import EntityReference
+
+from nomad_ikz_raman.schema_packages import utils
+from nomad_ikz_raman.schema_packages.raman import (
+    MapResults,
+    RamanSpectrometer,
+    RamanSpectrometerReference,
+    Ramanspectroscopy,
+    Results,
+    Sample,
+)
+from nomad_ikz_raman.schema_packages.utils import (
+    create_archive,
+    dump_archive,
+    load_archive,
+    resolve_reference,
+    serialize_archive,
+)
+
+N_ENTRIES = 3
+
+
+class UploadContext:
+    """A context writing the raw files of an upload to a local directory."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.processed = []
+
+    def raw_file(self, file_name, mode='r'):
+        return open(self.directory / file_name, mode)
+
+    def process_updated_raw_file(self, file_name):
+        self.processed.append(file_name)
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return SimpleNamespace(
+        m_context=UploadContext(tmp_path),
+        metadata=SimpleNamespace(upload_id='upload'),
+    )
+
+
+@pytest.fixture
+def searches(monkeypatch):
+    """
+    Counts the searches of `EntityReference.normalize`, which finds the lab_id
+    `known` in the entry `known-entry`.
+    """
+    monkeypatch.setattr(utils, '_reference_cache', utils.OrderedDict())
+    lab_ids = []
+
+    def normalize(self, archive, logger):
+        if self.reference is None and self.lab_id is not None:
+            lab_ids.append(self.lab_id)
+            if self.lab_id == 'known':
+                self.reference = '../uploads/upload/archive/known-entry#data'
+
+    monkeypatch.setattr(EntityReference, 'normalize', normalize)
+    return lab_ids
+
+
+def test_create_archive(archive):
+    for _ in range(N_ENTRIES):
+        reference = create_archive(
+            RamanSpectrometer(lab_id='LabRAM'), archive, 'lab_ram.archive.json'
+        )
+
+    assert archive.m_context.processed == ['lab_ram.archive.json']
+    assert reference.startswith('../uploads/upload/archive/')
+    with open(archive.m_context.directory / 'lab_ram.archive.json') as file:
+        assert json.load(file)['data']['lab_id'] == 'LabRAM'
+
+    create_archive(
+        RamanSpectrometer(lab_id='LabRAM 2'),
+        archive,
+        'lab_ram.archive.json',
+        overwrite=True,
+    )
+    assert archive.m_context.processed == ['lab_ram.archive.json'] * 2
+    with open(archive.m_context.directory / 'lab_ram.archive.json') as file:
+        assert json.load(file)['data']['lab_id'] == 'LabRAM 2'
+
+
+@pytest.fixture
+def entry():
+    rng = np.random.default_rng(0)
+    wavenumber = np.linspace(100.0, 1000.0, 50)
+    entry = Ramanspectroscopy(name='entry')
+    entry.results.append(
+        Results(wavenumber=wavenumber, intensity=rng.normal(size=wavenumber.size))
+    )
+    intensity = rng.normal(size=(N_ENTRIES, wavenumber.size))
+    intensity[0, 0] = np.nan
+    entry.map_results = MapResults(
+        n_points=N_ENTRIES,
+        wavenumber=wavenumber,
+        intensity=intensity,
+        row_index=np.arange(N_ENTRIES),
+    )
+    return entry
+
+
+def test_serialize_archive(entry, tmp_path):
+    expected = json.loads(json.dumps({'data': entry.m_to_dict(with_root_def=True)}))
+
+    content = json.loads(serialize_archive(entry))
+    assert np.isnan(content['data']['map_results']['intensity'][0][0])
+    assert json.dumps(content, sort_keys=True) == json.dumps(expected, sort_keys=True)
+
+    file_path = tmp_path / 'entry.archive.json.gz'
+    with open(file_path, 'wb') as file:
+        dump_archive(entry, file, compression='gzip')
+    assert load_archive(str(file_path)) == content
+    with pytest.raises(ValueError):
+        serialize_archive(entry, compression='zip')
+
+
+def test_resolve_reference(archive, searches):
+    logger = logging.getLogger()
+    samples = [Sample(lab_id='known') for _ in range(N_ENTRIES)]
+    for sample in samples:
+        resolve_reference(sample, archive, logger)
+
+    assert searches == ['known']
+    assert all(
+        sample.reference.m_proxy_value == samples[0].reference.m_proxy_value
+        for sample in samples
+    )
+
+
+def test_resolve_reference_create(archive, searches):
+    logger = logging.getLogger()
+    instruments = [RamanSpectrometerReference(lab_id='new') for _ in range(N_ENTRIES)]
+    for instrument in instruments:
+        resolve_reference(
+            instrument,
+            archive,
+            logger,
+            create=lambda: create_archive(
+                RamanSpectrometer(lab_id='new'), archive, 'lab_ram_new.archive.json'
+            ),
+        )
+
+    # The instrument is searched and created once, later entries reuse it
+    assert searches == ['new']
+    assert archive.m_context.processed == ['lab_ram_new.archive.json']
+    assert instruments[-1].reference.m_proxy_value.startswith('../uploads/upload/')
@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from nomad_ikz_raman.benchmark import (
+    OPTIONAL_FIELDS,
+    run_benchmarks,
+    synthetic_lsx_data,
+)
+from nomad_ikz_raman.schema_packages.raman_horiba_xml_reader import parse_raman_xml
+
+N_POINTS = 64
+N_ROWS = 6
+STAGES = ['parse_raman_xml', 'extractors', 'preprocess', 'normalize', 'serialize']
+SERIALIZATION_SIZES = [100, 1000]
+SERIALIZATION_METHODS = ['lists', 'arrays', 'gzip']
+
+
+@pytest.mark.parametrize('n_rows', [1, N_ROWS])
+def test_synthetic_lsx_data(tmp_path, n_rows):
+    file_path = tmp_path / 'synthetic.xml'
+    file_path.write_text(
+        synthetic_lsx_data(N_POINTS, n_rows, n_extra_parameters=10), encoding='utf-8'
+    )
+
+    raman_dict = parse_raman_xml(str(file_path))
+    assert raman_dict['Title'] == 'synthetic'
+    assert raman_dict['InstrumentID'] == '-825368879'
+    assert raman_dict['wavenumbers'].shape == (N_POINTS,)
+    assert raman_dict['intensities'].shape == (N_POINTS,)
+    if n_rows > 1:
+        assert raman_dict['map_intensities'].shape == (n_rows, N_POINTS)
+        assert len(set(map(tuple, raman_dict['map_coordinates']))) == n_rows
+
+
+def test_synthetic_lsx_data_missing_fields(tmp_path):
+    file_path = tmp_path / 'synthetic.xml'
+    file_path.write_text(
+        synthetic_lsx_data(N_POINTS, missing_fields=OPTIONAL_FIELDS), encoding='utf-8'
+    )
+
+    raman_dict = parse_raman_xml(str(file_path))
+    assert raman_dict['Sample'] == ''
+    assert raman_dict['AcquisitionDate'] == ''
+
+
+def test_run_benchmarks(tmp_path):
+    output = tmp_path / 'benchmark.json'
+    cases = [{'name': 'map', 'n_points': N_POINTS, 'n_rows': N_ROWS}]
+
+    run_benchmarks(
+        cases, repeat=1, output=str(output), serialization_sizes=SERIALIZATION_SIZES
+    )
+    with open(output) as file:
+        results = json.load(file)
+    assert results['reader_version']
+    assert results['cases'][0]['name'] == 'map'
+    assert list(results['cases'][0]['stages']) == STAGES
+    for measurement in results['cases'][0]['stages'].values():
+        assert measurement['wall_time_min'] > 0
+        assert measurement['peak_memory'] > 0
+    sizes = results['serialization']
+    assert [size['n_points'] for size in sizes] == SERIALIZATION_SIZES
+    for size in sizes:
+        assert list(size['methods']) == SERIALIZATION_METHODS
+        assert size['methods']['gzip']['size'] < size['methods']['arrays']['size']
@@ -0,0 +1,103 @@
+import csv
+import json
+import os
+import shutil
+
+from nomad_ikz_raman.cli import ingest, inventory, main
+from nomad_ikz_raman.schema_packages.raman_horiba_xml_reader import parse_raman_xml
+from nomad_ikz_raman.schema_packages.similarity import SimilarityIndex
+
+# Number of Horiba XML exports in the test data
+N_DATA_FILES = 2
+
+
+def write_upload(directory):
+    os.makedirs(directory / 'sub')
+    shutil.copy(os.path.join('tests', 'data', 'huhu.xml'), directory)
+    shutil.copy(os.path.join('tests', 'data', '3611subs.xml'), directory / 'sub')
+    (directory / 'other.xml').write_text('<?xml version="1.0"?>\n<svg/>')
+
+
+def test_ingest(tmp_path):
+    write_upload(tmp_path)
+
+    assert main(['ingest', str(tmp_path), '--workers', '2']) == 0
+    with open(tmp_path / 'sub' / '3611subs.archive.json') as file:
+        data = json.load(file)['data']
+    assert data['m_def'].endswith('Ramanspectroscopy')
+    assert data['data_file'] == 'sub/3611subs.xml'
+    assert data['title'] == '3611subs'
+    assert len(data['results'][0]['intensity']) > 0
+    assert not (tmp_path / 'other.archive.json').exists()
+
+    report = ingest(str(tmp_path), workers=1)
+    assert report['files'] == N_DATA_FILES
+    assert report['skipped'] == N_DATA_FILES
+    # Only the entry of a changed data file is written again
+    data_file = tmp_path / 'huhu.xml'
+    data_file.write_bytes(data_file.read_bytes() + b'\n')
+    report = ingest(str(tmp_path), workers=1)
+    assert report['written'] == 1
+    assert report['skipped'] == N_DATA_FILES - 1
+
+
+def test_ingest_hdf5(tmp_path):
+    write_upload(tmp_path / 'upload')
+
+    report = ingest(
+        str(tmp_path / 'upload'), output=str(tmp_path / 'out'), workers=1, hdf5=True
+    )
+    assert report['written'] == N_DATA_FILES
+    with open(tmp_path / 'out' / 'huhu.archive.json') as file:
+        results = json.load(file)['data']['results'][0]
+    assert results['intensity_hdf5'] == 'huhu.h5#/results/intensity'
+    assert 'intensity' not in results
+    assert (tmp_path / 'out' / 'huhu.h5').exists()
+
+
+def test_inventory(tmp_path):
+    write_upload(tmp_path / 'upload')
+
+    report = inventory(str(tmp_path / 'upload'), workers=2)
+    assert not report['errors']
+    assert [entry['data_file'] for entry in report['entries']] == [
+        'huhu.xml',
+        'sub/3611subs.xml',
+    ]
+
+    output = tmp_path / 'inventory.csv'
+    assert main(['inventory', str(tmp_path / 'upload'), '--output', str(output)]) == 0
+    with open(output, newline='') as file:
+        rows = list(csv.DictReader(file))
+    assert rows[1]['Title'] == '3611subs'
+    assert int(rows[1]['n_points']) > 0
+
+
+def test_similar(tmp_path, capsys):
+    write_upload(tmp_path / 'upload')
+
+    assert main(['index', str(tmp_path / 'upload'), str(tmp_path / 'index')]) == 0
+    capsys.readouterr()
+    data_file = os.path.join('tests', 'data', '3611subs.xml')
+    assert main(['similar', str(tmp_path / 'index'), data_file, '-k', '1']) == 0
+    distance, spectrum_id = capsys.readouterr().out.split()
+    assert spectrum_id == 'sub/3611subs.xml'
+    assert float(distance) == 0
+
+
+def test_fit(tmp_path, capsys):
+    index = SimilarityIndex(str(tmp_path), n_components=2)
+    for name in ['huhu.xml', '3611subs.xml']:
+        raman_dict = parse_raman_xml(os.path.join('tests', 'data', name))
+        index.add(
+            [name], raman_dict['wavenumbers'], raman_dict['intensities'], fit=False
+        )
+
+    assert main(['fit', str(tmp_path)]) == 0
+    assert capsys.readouterr().out.strip() == f'{tmp_path} fitted to 2 spectra'
+    assert (
+        SimilarityIndex(str(tmp_path)).query(
+            raman_dict['wavenumbers'], raman_dict['intensities'], k=1
+        )[0][0]
+        == '3611subs.xml'
+    )
@@ -0,0 +1,31 @@
+from nomad_ikz_raman.benchmark import NOMAD_MODULES, PLUGIN_MODULES, import_times
+
+# Plotting libraries that NOMAD does not import and that the plugin imports on
+# first use only. pandas, scipy and h5py are imported by NOMAD itself.
+DEFERRED_MODULES = ('plotly', 'matplotlib')
+# Largest import time of the plugin modules relative to that of the NOMAD modules
+# they build on, both measured in the same run
+IMPORT_TIME_FRACTION = 0.25
+
+
+def self_time(times) -> float:
+    return sum(time['self'] for time in times.values())
+
+
+def test_plugin_import_time():
+    baseline = import_times(NOMAD_MODULES, preload=())
+    times = import_times()
+
+    assert set(PLUGIN_MODULES) <= set(times)
+    assert not {module.split('.')[0] for module in times} & set(DEFERRED_MODULES)
+    assert self_time(times) < IMPORT_TIME_FRACTION * self_time(baseline)
+
+
+def test_entry_points_import():
+    times = import_times(
+        ['nomad_ikz_raman.parsers', 'nomad_ikz_raman.schema_packages'],
+        preload=['nomad.config'],
+    )
+
+    assert 'nomad_ikz_raman.parsers' in times
+    assert not set(PLUGIN_MODULES) & set(times)